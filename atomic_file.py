@@ -0,0 +1,67 @@
+"""
+Ghi file nguyên tử (atomic): ghi ra file tạm cùng thư mục, fsync rồi
+os.replace thay file đích.
+
+Nếu chương trình bị crash hoặc ghi lỗi giữa chừng, file đích cũ vẫn giữ
+nguyên; file tạm dở dang bị xóa (hoặc còn lại dưới dạng `.<tên>.*.tmp`,
+không bao giờ thay thế file macro tốt).
+"""
+
+import os
+from contextlib import contextmanager
+
+_TEMP_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+
+
+def _fsync_folder(folder):
+    """fsync thư mục để việc đổi tên được ghi xuống đĩa (bỏ qua trên Windows)"""
+    if os.name == 'nt':
+        return
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _create_temp(folder, name):
+    """
+    Tạo file tạm mới `.<tên>.<ngẫu nhiên>.tmp`, trả về (fd, đường dẫn).
+    Tạo với quyền 0o666 như open() thường nên hệ điều hành tự áp umask.
+    """
+    while True:
+        path = os.path.join(folder, f".{name}.{os.urandom(6).hex()}.tmp")
+        try:
+            return os.open(path, _TEMP_FLAGS, 0o666), path
+        except FileExistsError:
+            continue
+
+
+@contextmanager
+def atomic_write(filename, mode='wb', encoding=None):
+    """
+    Context manager trả về file tạm để ghi; khi thoát khối `with` không lỗi
+    thì file tạm được fsync và thay thế `filename`, nếu có lỗi thì bị xóa.
+    """
+    folder = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = _create_temp(folder, os.path.basename(filename))
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # Overwriting keeps the existing file's permissions
+        try:
+            os.chmod(tmp_path, os.stat(filename).st_mode & 0o777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_folder(folder)
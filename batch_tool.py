@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Xử lý hàng loạt macro trong thư mục: chuyển format, ghi lại (re-encode),
+rút gọn và kiểm tra, chạy song song trên nhiều process.
+
+Mỗi file là một tác vụ độc lập gửi vào ProcessPoolExecutor; kết quả được
+in ngay khi từng file xong (không chờ cả lô), cuối cùng in tổng số file,
+số sự kiện và tốc độ xử lý. File kết quả đã mới hơn file nguồn thì bỏ qua;
+khi ghi lại tại chỗ, file chỉ được bỏ qua nếu đã đúng version và đúng cách
+mã hóa được yêu cầu (--compact, -c). Dùng --force để làm lại tất cả.
+
+Sử dụng:
+    python batch_tool.py convert SCRIPT --to mrb -o SCRIPT_mrb
+    python batch_tool.py convert "SCRIPT/*.json" --to mrz -c lzma
+    python batch_tool.py reencode SCRIPT --compact       # ghi lại tại chỗ
+    python batch_tool.py simplify SCRIPT -e 2 -o SIMPLIFIED
+    python batch_tool.py validate SCRIPT -j 8
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from event_store import EVENT_TYPES, NO_STRING, STRING_ARG_CODES
+from json_backend import BACKEND_NAMES
+from macro_codec import COMPRESSED_EXTENSION, COMPRESSED_VERSION, COMPRESSIONS, CompressedMacroReader
+from macro_io import (
+    BINARY_EXTENSION, BINARY_VERSION, MACRO_VERSION,
+    build_macro_data, read_macro, read_macro_header, write_macro
+)
+from simplify import simplify_events
+
+MACRO_EXTENSIONS = ('.json', BINARY_EXTENSION, COMPRESSED_EXTENSION)
+TARGET_EXTENSIONS = {'json': '.json', 'mrb': BINARY_EXTENSION, 'mrz': COMPRESSED_EXTENSION}
+SIMPLIFIED_SUFFIX = '_simplified'
+
+
+def current_version(filename):
+    """Version mà writer hiện tại ghi cho file có đuôi này"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == BINARY_EXTENSION:
+        return BINARY_VERSION
+    if extension == COMPRESSED_EXTENSION:
+        return COMPRESSED_VERSION
+    return MACRO_VERSION
+
+
+def find_macros(inputs):
+    """Danh sách file macro từ các thư mục, file hoặc mẫu glob (không trùng lặp)"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            with os.scandir(item) as it:
+                names = sorted(entry.path for entry in it if entry.is_file())
+        else:
+            names = sorted(glob.glob(item)) or [item]
+        for name in names:
+            base = os.path.basename(name)
+            if not base.startswith('.') and base.lower().endswith(MACRO_EXTENSIONS):
+                files.append(name)
+    return list(dict.fromkeys(files))
+
+
+def is_up_to_date(input_file, output_file):
+    """True nếu file kết quả đã tồn tại và không cũ hơn file nguồn"""
+    try:
+        return os.stat(output_file).st_mtime_ns >= os.stat(input_file).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def matches_encoding(filename, options):
+    """
+    True nếu file đã được ghi theo version hiện tại với đúng tùy chọn mã hóa
+    trong `options` (`compact` cho JSON, `compression` cho .mrz), tức là ghi
+    lại tại chỗ sẽ không thay đổi gì
+    """
+    try:
+        header = read_macro_header(filename)
+        if header.get('version') != current_version(filename) or 'recording_info' not in header:
+            return False
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == COMPRESSED_EXTENSION:
+            with CompressedMacroReader(filename) as reader:
+                return reader.compression == options['compression']
+        if extension == BINARY_EXTENSION:
+            return True
+        with open(filename, 'rb') as f:
+            # Indented output always starts with "{\n", compact output never does
+            return (f.read(2) != b'{\n') == options['compact']
+    except Exception:
+        return False
+
+
+def _upgrade(data):
+    """Dựng lại header v2 cho file format cũ (không có recording_info)"""
+    if 'recording_info' in data:
+        return data
+    events = data['events']
+    return build_macro_data(events, smooth_factor=data.get('smooth_factor', 1.0))
+
+
+def validate_events(data):
+    """Kiểm tra tính hợp lệ của macro đã đọc. Trả về list mô tả lỗi (rỗng = hợp lệ)."""
+    events = data['events']
+    problems = []
+
+    expected = data.get('recording_info', {}).get('total_events')
+    if expected is not None and expected != len(events):
+        problems.append(f"header ghi {expected} sự kiện nhưng file có {len(events)}")
+
+    string_count = len(events.strings)
+    last_ts = None
+    for i, (code, ts, arg1) in enumerate(zip(events.types, events.timestamps, events.arg1)):
+        if code >= len(EVENT_TYPES):
+            problems.append(f"sự kiện {i}: loại không hợp lệ {code}")
+        elif code in STRING_ARG_CODES and arg1 != NO_STRING and not 0 <= arg1 < string_count:
+            problems.append(f"sự kiện {i}: id chuỗi không hợp lệ {arg1}")
+        if last_ts is not None and ts < last_ts:
+            problems.append(f"sự kiện {i}: timestamp giảm ({ts} < {last_ts})")
+        last_ts = ts
+        if len(problems) >= 10:
+            problems.append("...")
+            break
+    return problems
+
+
+def process_file(task):
+    """
+    Chạy một tác vụ (trong process con). `task` = (lệnh, file nguồn, file
+    kết quả, tùy chọn). Trả về dict kết quả, không raise.
+    """
+    command, input_file, output_file, options = task
+    result = {'file': input_file, 'output': output_file, 'status': 'ok', 'events': 0,
+              'bytes_in': 0, 'bytes_out': 0, 'message': ''}
+    start = time.perf_counter()
+    try:
+        result['bytes_in'] = os.path.getsize(input_file)
+        data = read_macro(input_file)
+        events = data['events']
+        result['events'] = len(events)
+
+        if command == 'validate':
+            problems = validate_events(data)
+            if problems:
+                result['status'] = 'invalid'
+                result['message'] = '; '.join(problems)
+        else:
+            if command == 'simplify':
+                simplified = simplify_events(events, options['epsilon'])
+                info = data.get('recording_info', {})
+                data = build_macro_data(
+                    simplified,
+                    start_time=info.get('start_time'),
+                    end_time=info.get('end_time'),
+                    actual_duration=info.get('actual_duration'),
+                    smooth_factor=data.get('timing_stats', {}).get('smooth_factor', 1.0),
+                    replay_options=data.get('replay_options')
+                )
+                result['message'] = f"{len(events)} → {len(simplified)} sự kiện"
+            else:
+                data = _upgrade(data)
+            write_macro(output_file, data, options['compression'], options['compact'])
+            result['bytes_out'] = os.path.getsize(output_file)
+    except Exception as e:
+        result['status'] = 'error'
+        result['message'] = str(e)
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+def _output_path(command, input_file, args):
+    folder = args.output_dir or os.path.dirname(input_file)
+    stem, extension = os.path.splitext(os.path.basename(input_file))
+    if command == 'convert':
+        extension = TARGET_EXTENSIONS[args.to]
+    elif command == 'simplify':
+        stem += SIMPLIFIED_SUFFIX
+    return os.path.join(folder, stem + extension)
+
+
+def plan_tasks(command, files, args):
+    """Tạo danh sách tác vụ và danh sách file bỏ qua vì đã cập nhật"""
+    options = {
+        'compression': getattr(args, 'compression', 'zlib'),
+        'compact': getattr(args, 'compact', False),
+        'epsilon': getattr(args, 'epsilon', 2.0),
+    }
+    tasks, skipped = [], []
+    for input_file in files:
+        if command == 'validate':
+            tasks.append((command, input_file, None, options))
+            continue
+        if command == 'simplify' and os.path.splitext(input_file)[0].endswith(SIMPLIFIED_SUFFIX):
+            continue
+
+        output_file = _output_path(command, input_file, args)
+        if not args.force:
+            same_file = os.path.abspath(output_file) == os.path.abspath(input_file)
+            if same_file:
+                # Rewriting in place: mtimes say nothing, compare what is on disk
+                up_to_date = matches_encoding(input_file, options)
+            else:
+                up_to_date = is_up_to_date(input_file, output_file)
+            if up_to_date:
+                skipped.append(input_file)
+                continue
+        tasks.append((command, input_file, output_file, options))
+    return tasks, skipped
+
+
+def _print_result(result, index, total):
+    name = os.path.basename(result['file'])
+    ms = result['elapsed'] * 1000
+    if result['status'] == 'ok':
+        detail = f" → {os.path.basename(result['output'])} ({result['bytes_out']:,} byte)" if result['output'] else ""
+        extra = f" [{result['message']}]" if result['message'] else ""
+        print(f"✅ [{index}/{total}] {name}: {result['events']} sự kiện{detail}{extra} {ms:.0f}ms")
+    elif result['status'] == 'invalid':
+        print(f"⚠️ [{index}/{total}] {name}: không hợp lệ — {result['message']}")
+    else:
+        print(f"❌ [{index}/{total}] {name}: {result['message']}")
+
+
+def run_tasks(tasks, jobs):
+    """Chạy tác vụ song song, in kết quả theo thứ tự hoàn thành. Trả về list kết quả."""
+    results = []
+    total = len(tasks)
+    if jobs == 1 or total <= 1:
+        for task in tasks:
+            results.append(process_file(task))
+            _print_result(results[-1], len(results), total)
+        return results
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(process_file, task) for task in tasks]
+        for future in as_completed(futures):
+            results.append(future.result())
+            _print_result(results[-1], len(results), total)
+    return results
+
+
+def print_summary(results, skipped, elapsed, jobs):
+    ok = sum(1 for result in results if result['status'] == 'ok')
+    invalid = sum(1 for result in results if result['status'] == 'invalid')
+    failed = sum(1 for result in results if result['status'] == 'error')
+    events = sum(result['events'] for result in results)
+    bytes_in = sum(result['bytes_in'] for result in results)
+    bytes_out = sum(result['bytes_out'] for result in results)
+
+    print("─" * 60)
+    print(f"📊 {len(results)} file xử lý trong {elapsed:.2f}s ({jobs} process): "
+          f"{ok} OK, {invalid} không hợp lệ, {failed} lỗi, {len(skipped)} bỏ qua (đã cập nhật)")
+    if elapsed > 0 and results:
+        print(f"⚡ {len(results) / elapsed:.1f} file/s, {events / elapsed:,.0f} sự kiện/s, "
+              f"{bytes_in / elapsed / 1024 / 1024:.1f} MB/s đọc")
+    if bytes_out:
+        print(f"💾 Kích thước: {bytes_in:,} → {bytes_out:,} byte")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xử lý hàng loạt file macro song song")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(sub, writes=True):
+        sub.add_argument('inputs', nargs='+', help="Thư mục, file hoặc mẫu glob (vd: \"SCRIPT/*.json\")")
+        sub.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                         help="Số process (mặc định: số CPU)")
+        if writes:
+            sub.add_argument('-o', '--output-dir', help="Thư mục kết quả (mặc định: cùng thư mục file nguồn)")
+            sub.add_argument('-c', '--compression', choices=COMPRESSIONS, default='zlib',
+                             help="Kiểu nén cho file .mrz (mặc định: zlib)")
+            sub.add_argument('--compact', action='store_true', help="Ghi JSON liền một dòng")
+            sub.add_argument('--json-backend', choices=BACKEND_NAMES, help="Backend JSON dùng trong các process")
+            sub.add_argument('-f', '--force', action='store_true', help="Làm lại cả file đã cập nhật")
+
+    convert = subparsers.add_parser('convert', help="Chuyển format (json, mrb, mrz)")
+    add_common(convert)
+    convert.add_argument('--to', choices=list(TARGET_EXTENSIONS), required=True, help="Format đích")
+
+    reencode = subparsers.add_parser('reencode', help="Ghi lại file theo format hiện tại (nâng cấp file cũ)")
+    add_common(reencode)
+
+    simplify = subparsers.add_parser('simplify', help="Rút gọn đường đi chuột (RDP)")
+    add_common(simplify)
+    simplify.add_argument('-e', '--epsilon', type=float, default=2.0, help="Sai số tối đa (pixel, mặc định 2)")
+
+    validate = subparsers.add_parser('validate', help="Kiểm tra file macro đọc được và hợp lệ")
+    add_common(validate, writes=False)
+
+    args = parser.parse_args()
+
+    files = find_macros(args.inputs)
+    if not files:
+        print("❌ Không tìm thấy file macro nào")
+        return 1
+
+    if getattr(args, 'json_backend', None):
+        # Worker processes pick their backend from the environment
+        os.environ['MACRO_JSON_BACKEND'] = args.json_backend
+    if getattr(args, 'output_dir', None):
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    jobs = max(1, args.jobs)
+    start = time.perf_counter()
+    tasks, skipped = plan_tasks(args.command, files, args)
+    print(f"🚀 {args.command}: {len(tasks)} file cần xử lý, {len(skipped)} đã cập nhật")
+    results = run_tasks(tasks, jobs)
+    print_summary(results, skipped, time.perf_counter() - start, jobs)
+
+    return 0 if all(result['status'] == 'ok' for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark chi phí điều phối mỗi sự kiện khi phát lại: cách cũ (dựng
+dict sự kiện rồi thông dịch bằng chuỗi if, như `execute_event` trước đây)
+so với replay plan đã biên dịch (replay_plan.py).
+
+Backend là đối tượng rỗng (không di chuột/gõ phím thật, không sleep) nên
+chỉ đo phần overhead của Python; chạy được trên máy không có màn hình.
+Trước khi đo, script kiểm tra hai cách gọi backend giống hệt nhau.
+
+Sử dụng:
+    python benchmark_dispatch.py
+    python benchmark_dispatch.py --sizes 100000 --repeat 5
+"""
+
+import argparse
+import sys
+import time
+
+from benchmark_io import synthetic_events
+from input_backends import NullBackend, RecordingBackend
+from replay_plan import compile_plan
+
+
+class LegacyInterpreter:
+    """Bản sao cách thông dịch dict sự kiện trước khi có replay plan"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._ctrl_pressed = False
+        self._shift_pressed = False
+        self._alt_pressed = False
+
+    def execute_event(self, event):
+        backend = self.backend
+        if event['type'] == 'mouse_move':
+            backend.moveTo(event['x'], event['y'])
+        elif event['type'] == 'mouse_click':
+            if event['pressed']:
+                button = 'left' if 'left' in event['button'].lower() else 'right'
+                backend.click(event['x'], event['y'], button=button)
+        elif event['type'] == 'mouse_scroll':
+            backend.scroll(event['dy'], x=event['x'], y=event['y'])
+        elif event['type'] == 'key_press':
+            key = event['key']
+            if key == 'v' and hasattr(self, '_ctrl_pressed') and self._ctrl_pressed:
+                return True
+            if key and key.startswith('Key.'):
+                if key in ['Key.ctrl_l', 'Key.ctrl_r']:
+                    self._ctrl_pressed = True
+                    return True
+                elif key in ['Key.shift', 'Key.shift_l', 'Key.shift_r']:
+                    self._shift_pressed = True
+                    return True
+                elif key in ['Key.alt_l', 'Key.alt_r']:
+                    self._alt_pressed = True
+                    return True
+                special_keys = {
+                    'Key.space': 'space',
+                    'Key.enter': 'enter',
+                    'Key.tab': 'tab',
+                    'Key.backspace': 'backspace',
+                    'Key.delete': 'delete',
+                    'Key.esc': 'esc'
+                }
+                mapped_key = special_keys.get(key, key.replace('Key.', ''))
+                if mapped_key:
+                    backend.press(mapped_key)
+            elif key:
+                ctrl_pressed = getattr(self, '_ctrl_pressed', False)
+                shift_pressed = getattr(self, '_shift_pressed', False)
+                alt_pressed = getattr(self, '_alt_pressed', False)
+                if ctrl_pressed and key in ('v', 'c', 'x', 'a', 'z', 'y'):
+                    backend.hotkey('ctrl', key)
+                elif shift_pressed:
+                    backend.hotkey('shift', key)
+                elif alt_pressed:
+                    backend.hotkey('alt', key)
+                else:
+                    backend.press(key)
+        elif event['type'] == 'key_release':
+            key = event['key']
+            if key in ['Key.ctrl_l', 'Key.ctrl_r']:
+                self._ctrl_pressed = False
+            elif key in ['Key.shift', 'Key.shift_l', 'Key.shift_r']:
+                self._shift_pressed = False
+            elif key in ['Key.alt_l', 'Key.alt_r']:
+                self._alt_pressed = False
+        return True
+
+
+def legacy_replay(events, backend):
+    """Vòng lặp cũ: dựng dict cho từng sự kiện rồi thông dịch"""
+    execute_event = LegacyInterpreter(backend).execute_event
+    completed = 0
+    for i in range(len(events)):
+        if execute_event(events.event_at(i)):
+            completed += 1
+    return completed
+
+
+def plan_replay(plan):
+    """Vòng lặp mới: gọi thẳng hàm đã gắn sẵn của replay plan"""
+    completed = 0
+    for timestamp_ns, func, args in plan.steps:
+        if func is not None:
+            func(*args)
+        completed += 1
+    return completed
+
+
+def _with_modifiers(events):
+    """Thêm vài tổ hợp Ctrl/Shift để kiểm tra cả nhánh modifier"""
+    from event_store import EVENT_KEY_PRESS, EVENT_KEY_RELEASE
+    ts = events.timestamps[-1] if len(events) else 0
+    for modifier, key in (('Key.ctrl_l', 'c'), ('Key.ctrl_l', 'v'), ('Key.ctrl_l', 'q'),
+                          ('Key.shift', 'a'), ('Key.alt_l', 'x')):
+        for code, name in ((EVENT_KEY_PRESS, modifier), (EVENT_KEY_PRESS, key),
+                           (EVENT_KEY_RELEASE, key), (EVENT_KEY_RELEASE, modifier)):
+            ts += 1_000_000
+            events.append_key(code, ts, name)
+    return events
+
+
+def check_equivalent(events):
+    legacy, compiled = RecordingBackend(), RecordingBackend()
+    legacy_replay(events, legacy)
+    plan_replay(compile_plan(events, compiled))
+    if legacy.calls != compiled.calls:
+        raise RuntimeError("Replay plan gọi backend khác với cách thông dịch cũ")
+    return len(legacy.calls)
+
+
+def _best(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(sizes, repeat):
+    print(f"{'events':>9} {'cũ (ns/sk)':>12} {'plan (ns/sk)':>13} {'nhanh hơn':>10} {'biên dịch':>11}")
+    print("─" * 60)
+    backend = NullBackend()
+    for count in sizes:
+        events = _with_modifiers(synthetic_events(count))
+        calls = check_equivalent(events)
+
+        legacy = _best(lambda: legacy_replay(events, backend), repeat)
+        compile_time = _best(lambda: compile_plan(events, backend), repeat)
+        plan = compile_plan(events, backend)
+        dispatch = _best(lambda: plan_replay(plan), repeat)
+
+        n = len(events)
+        print(f"{n:>9,} {legacy / n * 1e9:>12.0f} {dispatch / n * 1e9:>13.0f} "
+              f"{legacy / dispatch:>9.1f}x {compile_time * 1000:>9.1f}ms   ({calls:,} lệnh, khớp)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark overhead điều phối sự kiện khi phát lại")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help="Số sự kiện của các macro tổng hợp")
+    parser.add_argument('--repeat', type=int, default=3, help="Số lần đo, lấy lần nhanh nhất")
+    args = parser.parse_args()
+
+    run(args.sizes, args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark kích thước file và thời gian ghi/tải của các format macro
+(JSON v2, nhị phân v3 .mrb, nén delta/varint .mrz) trên macro tổng hợp.
+
+Sử dụng:
+    python benchmark_io.py                          # 1k, 10k, 100k, 1M sự kiện
+    python benchmark_io.py --sizes 1000 50000 --formats json mrz-zlib
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from event_store import EventStore, EVENT_KEY_PRESS, EVENT_KEY_RELEASE
+from macro_io import build_macro_data, open_macro_stream, read_macro, write_macro
+
+# name -> (extension, compression)
+FORMATS = {
+    'json': ('.json', None),
+    'mrb': ('.mrb', None),
+    'mrz-none': ('.mrz', 'none'),
+    'mrz-zlib': ('.mrz', 'zlib'),
+    'mrz-lzma': ('.mrz', 'lzma'),
+}
+
+_KEYS = tuple('abcdefghijklmnopqrstuvwxyz') + ('Key.space', 'Key.enter', 'Key.backspace')
+
+
+def synthetic_events(count, seed=0):
+    """
+    Tạo EventStore giả lập một phiên ghi: chuột di chuyển liên tục (~125Hz,
+    vài pixel mỗi bước), thỉnh thoảng click, cuộn hoặc gõ phím.
+    """
+    rng = random.Random(seed)
+    events = EventStore()
+    timestamp = 0
+    x, y = 960, 540
+    vx, vy = 0, 0
+
+    while len(events) < count:
+        timestamp += rng.randint(6_000_000, 10_000_000)
+        roll = rng.random()
+        if roll < 0.01:
+            events.append_click(timestamp, x, y, 'Button.left', True)
+            timestamp += rng.randint(50_000_000, 120_000_000)
+            events.append_click(timestamp, x, y, 'Button.left', False)
+        elif roll < 0.015:
+            events.append_scroll(timestamp, x, y, 0, rng.choice((-1, 1)))
+        elif roll < 0.03:
+            key = rng.choice(_KEYS)
+            events.append_key(EVENT_KEY_PRESS, timestamp, key)
+            timestamp += rng.randint(40_000_000, 90_000_000)
+            events.append_key(EVENT_KEY_RELEASE, timestamp, key)
+        else:
+            vx = max(-12, min(12, vx + rng.randint(-2, 2)))
+            vy = max(-12, min(12, vy + rng.randint(-2, 2)))
+            x = max(0, min(1919, x + vx))
+            y = max(0, min(1079, y + vy))
+            events.append_move(timestamp, x, y)
+
+    return events.take(range(count)) if len(events) > count else events
+
+
+def _time(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def first_event_latency(filename):
+    """Thời gian từ lúc mở file tới khi có sự kiện đầu tiên để phát"""
+    start = time.perf_counter()
+    _, events = open_macro_stream(filename)
+    next(events, None)
+    elapsed = time.perf_counter() - start
+    if hasattr(events, 'close'):
+        events.close()
+    return elapsed
+
+
+def run(sizes, formats, folder):
+    print(f"{'events':>9} {'format':<9} {'size':>13} {'ratio':>7} {'write':>9} {'load':>9} {'first evt':>10}")
+    print("─" * 72)
+    for count in sizes:
+        events = synthetic_events(count)
+        data = build_macro_data(events)
+        json_size = None
+
+        for name in formats:
+            extension, compression = FORMATS[name]
+            filename = os.path.join(folder, f"bench_{count}{extension}")
+
+            write_time, _ = _time(lambda: write_macro(filename, data, compression or 'zlib'))
+            size = os.path.getsize(filename)
+            if name == 'json':
+                json_size = size
+            load_time, loaded = _time(lambda: read_macro(filename))
+            if len(loaded['events']) != count:
+                raise RuntimeError(f"{name}: đọc được {len(loaded['events'])}/{count} sự kiện")
+            del loaded
+            latency = first_event_latency(filename)
+            os.remove(filename)
+
+            ratio = f"{json_size / size:.1f}x" if json_size else "-"
+            print(f"{count:>9,} {name:<9} {size:>13,} {ratio:>7} "
+                  f"{write_time * 1000:>7.0f}ms {load_time * 1000:>7.0f}ms {latency * 1000:>8.1f}ms")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark các format file macro")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000],
+                        help="Số sự kiện của các macro tổng hợp")
+    parser.add_argument('--formats', nargs='+', choices=list(FORMATS), default=list(FORMATS),
+                        help="Các format cần đo (json đứng đầu để tính tỉ lệ nén)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="macro_bench_") as folder:
+        run(args.sizes, args.formats, folder)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark các backend JSON (orjson, msgspec, ujson, json) khi lưu/tải macro
+JSON v2, ở chế độ thụt lề và compact, trên cùng các macro tổng hợp.
+
+Cột "parse" chỉ tính thời gian backend parse file; cột "load" là toàn bộ
+read_macro (parse + dựng EventStore).
+
+Sử dụng:
+    python benchmark_json.py
+    python benchmark_json.py --sizes 10000 1000000 --repeat 1
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmark_io import synthetic_events
+from json_backend import available_backends, set_backend
+from macro_io import build_macro_data, read_macro, write_macro
+
+
+def _best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _rate(count, seconds):
+    return f"{count / seconds / 1000:>8.0f}k/s" if seconds > 0 else f"{'-':>10}"
+
+
+def run(sizes, backends, repeat, folder):
+    print(f"{'events':>9} {'backend':<8} {'mode':<7} {'size':>12} {'save':>10} {'parse':>10} {'load':>10}")
+    print("─" * 72)
+    for count in sizes:
+        data = build_macro_data(synthetic_events(count))
+        filename = os.path.join(folder, f"bench_{count}.json")
+
+        for name in backends:
+            backend = set_backend(name)
+            for compact in (False, True):
+                save = _best_time(lambda: write_macro(filename, data, compact=compact), repeat)
+                size = os.path.getsize(filename)
+                with open(filename, 'rb') as f:
+                    raw = f.read()
+                parse = _best_time(lambda: backend.loads(raw), repeat)
+                load = _best_time(lambda: read_macro(filename), repeat)
+                print(f"{count:>9,} {name:<8} {'compact' if compact else 'indent':<7} {size:>12,} "
+                      f"{_rate(count, save)} {_rate(count, parse)} {_rate(count, load)}")
+        os.remove(filename)
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend JSON cho file macro")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help="Số sự kiện của các macro tổng hợp")
+    parser.add_argument('--backends', nargs='+', help="Backend cần đo (mặc định: tất cả đã cài)")
+    parser.add_argument('--repeat', type=int, default=3, help="Số lần đo, lấy lần nhanh nhất")
+    args = parser.parse_args()
+
+    installed = available_backends()
+    backends = args.backends or installed
+    missing = [name for name in backends if name not in installed]
+    if missing:
+        print(f"❌ Backend chưa cài: {', '.join(missing)} (đã cài: {', '.join(installed)})")
+        return 1
+
+    print(f"🧪 Backend đã cài: {', '.join(installed)} — tốc độ tính theo sự kiện/giây\n")
+    with tempfile.TemporaryDirectory(prefix="macro_json_bench_") as folder:
+        run(args.sizes, backends, args.repeat, folder)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
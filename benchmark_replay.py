@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark độ trung thực thời gian khi phát lại macro.
+
+Phát macro bằng đúng vòng phát lại của MacroRecorder (replay plan +
+DeadlineScheduler + run_plan) nhưng với backend rỗng: mỗi lệnh chuột/phím
+chỉ ghi lại thời điểm được phát, không di chuột hay gõ phím thật, nên chạy
+được trên máy Linux không có màn hình. Với mỗi tốc độ, in độ trễ so với lịch
+(TB/p50/p95/p99/max), độ trôi tổng, số sự kiện/giây và histogram jitter
+(sai lệch khoảng cách giữa hai lệnh liên tiếp so với bản ghi); với
+--max-move-rate, in thêm số lệnh mouse_move được gộp.
+
+Sử dụng:
+    python benchmark_replay.py                              # macro tổng hợp
+    python benchmark_replay.py SCRIPT/t1.json --speeds 1 2 4
+    python benchmark_replay.py SCRIPT/t1.json --spin-budget 0 --call-cost 0.0005
+    python benchmark_replay.py --call-cost 0.002 --max-move-rate 0     # gộp move khi trễ
+"""
+
+import argparse
+import sys
+import time
+
+from benchmark_io import synthetic_events
+from event_store import NS_PER_SECOND
+from input_backends import RecordingBackend
+from macro_io import read_macro
+from precise_timer import DEFAULT_SPIN_BUDGET, DelayStats, PreciseTimer
+from replay_plan import compile_plan
+from replay_scheduler import DeadlineScheduler, MoveCoalescer, run_plan
+
+# Cận trên (µs) của các ô histogram jitter; ô cuối là "lớn hơn"
+JITTER_BUCKETS_US = (50, 100, 250, 500, 1_000, 2_000, 5_000, 10_000)
+
+
+class EmissionBackend(RecordingBackend):
+    """
+    Backend ghi lại thời điểm phát từng lệnh (`times`, perf_counter_ns); mỗi
+    lệnh có thể chiếm thêm `call_cost` giây để giả lập chi phí của backend thật.
+    """
+
+    def __init__(self, call_cost=0.0):
+        super().__init__()
+        self.call_cost_ns = round(call_cost * NS_PER_SECOND)
+
+    def _record(self, call):
+        super()._record(call)
+        if self.call_cost_ns:
+            end = self.times[-1] + self.call_cost_ns
+            while time.perf_counter_ns() < end:
+                pass
+
+
+def replay_once(events, speed, min_delay=0.01, smooth_factor=1.0, spin_budget=DEFAULT_SPIN_BUDGET, call_cost=0.0,
+                max_move_rate=None):
+    """Phát macro một lần với backend rỗng; trả về dict kết quả đo"""
+    backend = EmissionBackend(call_cost)
+    plan = compile_plan(events, backend)
+    scale = smooth_factor / speed
+    scheduler = DeadlineScheduler(scale, min_delay * scale, PreciseTimer(spin_budget))
+
+    steps = plan.steps
+    coalescer = None
+    if max_move_rate is not None:
+        coalescer = MoveCoalescer(backend.moveTo, max_move_rate)
+        emitted_steps = []
+
+        def track(steps):
+            for step in steps:
+                emitted_steps.append(step)
+                yield step
+        steps = track(coalescer.filter(plan.steps, scheduler))
+
+    completed = run_plan(steps, scheduler, lambda: True)
+    report = scheduler.report()
+
+    # Emitted calls correspond, in order, to the steps (left after coalescing) that have a function
+    if coalescer is not None:
+        completed += coalescer.coalesced
+        steps = emitted_steps
+    deadlines = [scheduler.deadline(ts) for ts, func, _ in steps if func is not None]
+    lateness = DelayStats()
+    jitter = DelayStats()
+    previous = None
+    for deadline, emitted in zip(deadlines, backend.times):
+        lateness.add(max(0, emitted - deadline))
+        if previous is not None:
+            jitter.add(abs((emitted - previous[1]) - (deadline - previous[0])))
+        previous = (deadline, emitted)
+
+    return {
+        'speed': speed,
+        'completed': completed,
+        'emitted': len(backend.times),
+        'elapsed': report['elapsed'],
+        'scheduled': report['scheduled'],
+        'drift': report['elapsed'] - report['scheduled'],
+        'lateness': lateness,
+        'jitter': jitter,
+        'timer': report['timer'],
+        'coalesced': coalescer.coalesced if coalescer is not None else 0
+    }
+
+
+def jitter_histogram(jitter):
+    """Số mẫu jitter trong từng ô của JITTER_BUCKETS_US"""
+    counts = [0] * (len(JITTER_BUCKETS_US) + 1)
+    for sample in jitter.samples:
+        sample_us = sample / 1e3
+        for index, limit in enumerate(JITTER_BUCKETS_US):
+            if sample_us < limit:
+                counts[index] += 1
+                break
+        else:
+            counts[-1] += 1
+    return counts
+
+
+def print_results(results):
+    print(f"{'tốc độ':>7} {'lệnh':>7} {'thực (s)':>9} {'lịch (s)':>9} {'trôi (ms)':>10} "
+          f"{'sk/s':>8} {'trễ TB':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>8}  (ms)")
+    print("─" * 100)
+    for result in results:
+        lateness = result['lateness']
+        rate = result['emitted'] / result['elapsed'] if result['elapsed'] > 0 else 0
+        print(f"{result['speed']:>6g}x {result['emitted']:>7} {result['elapsed']:>9.3f} {result['scheduled']:>9.3f} "
+              f"{result['drift'] * 1000:>10.2f} {rate:>8.0f} {lateness.mean_ns / 1e6:>8.3f} "
+              f"{lateness.percentile(50) / 1e6:>7.3f} {lateness.percentile(95) / 1e6:>7.3f} "
+              f"{lateness.percentile(99) / 1e6:>7.3f} {lateness.max_ns / 1e6:>8.3f}"
+              + (f"  (gộp {result['coalesced']} move)" if result['coalesced'] else ""))
+
+    print("\n📊 Histogram jitter (|khoảng cách thực - khoảng cách theo lịch| giữa hai lệnh):")
+    labels = [f"< {limit}µs" if limit < 1000 else f"< {limit // 1000}ms" for limit in JITTER_BUCKETS_US]
+    labels.append(f">= {JITTER_BUCKETS_US[-1] // 1000}ms")
+    histograms = [jitter_histogram(result['jitter']) for result in results]
+    print(f"{'':>10}" + "".join(f"{result['speed']:>14g}x" for result in results))
+    for index, label in enumerate(labels):
+        row = ""
+        for result, counts in zip(results, histograms):
+            total = len(result['jitter']) or 1
+            share = counts[index] / total
+            row += f" {'█' * round(share * 8):<8}{share:>6.1%}"
+        print(f"{label:>10}{row}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark độ trung thực thời gian khi phát lại (không cần màn hình)")
+    parser.add_argument('macro', nargs='?', help="File macro (.json/.mrb/.mrz); bỏ trống = macro tổng hợp")
+    parser.add_argument('--synthetic', type=int, default=500, help="Số sự kiện của macro tổng hợp (mặc định 500)")
+    parser.add_argument('--speeds', type=float, nargs='+', default=[1.0, 2.0, 4.0], help="Các tốc độ cần đo")
+    parser.add_argument('--min-delay', type=float, default=0.01, help="Khoảng cách tối thiểu giữa hai lệnh ở 1x (giây)")
+    parser.add_argument('--spin-budget', type=float, default=DEFAULT_SPIN_BUDGET,
+                        help="Spin budget của timer (giây, 0 = chỉ sleep)")
+    parser.add_argument('--call-cost', type=float, default=0.0, help="Chi phí giả lập mỗi lệnh (giây)")
+    parser.add_argument('--max-move-rate', type=float, default=None,
+                        help="Gộp mouse_move: 0 = chỉ khi trễ lịch, N = tối đa N move/giây (mặc định tắt)")
+    args = parser.parse_args()
+
+    if args.macro:
+        try:
+            events = read_macro(args.macro)['events']
+        except FileNotFoundError:
+            print(f"❌ Không tìm thấy file: {args.macro}")
+            return 1
+        name = args.macro
+    else:
+        events = synthetic_events(args.synthetic)
+        name = f"macro tổng hợp {args.synthetic} sự kiện"
+
+    print(f"🧪 {name}: {len(events)} sự kiện, {events.stats.duration:.2f}s ở 1x; "
+          f"min_delay {args.min_delay * 1000:g}ms, spin {args.spin_budget * 1000:g}ms, "
+          f"chi phí lệnh {args.call_cost * 1000:g}ms\n")
+
+    results = []
+    for speed in args.speeds:
+        results.append(replay_once(events, speed, args.min_delay, spin_budget=args.spin_budget,
+                                   call_cost=args.call_cost, max_move_rate=args.max_move_rate))
+    print_results(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
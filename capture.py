@@ -0,0 +1,283 @@
+"""
+Capture stage cho MacroRecorder.
+
+Callback của pynput chạy trên thread hook của hệ điều hành, nên chỉ được
+phép ghi một bản ghi kích thước cố định vào ring buffer cấp phát sẵn.
+Một thread tiêu thụ riêng sẽ đổ các bản ghi vào kho sự kiện, in log,...
+để hook thread không bao giờ bị chặn bởi stdout hay GUI.
+"""
+
+import heapq
+import threading
+import time
+from operator import itemgetter
+
+_by_timestamp = itemgetter(0)
+
+
+class CaptureRing:
+    """
+    Ring buffer một producer / một consumer với các slot cấp phát sẵn.
+
+    Producer (thread hook của pynput) chỉ ghi vào slot tại `_tail` rồi tăng
+    `_tail`; consumer đọc từ `_head` đến `_tail` rồi tăng `_head`. Mỗi chỉ số
+    chỉ do một thread ghi nên không cần lock. Khi buffer đầy, bản ghi mới bị
+    bỏ và được đếm vào `dropped`.
+    """
+
+    def __init__(self, capacity=8192):
+        # Làm tròn lên lũy thừa của 2 để dùng mask thay cho phép chia lấy dư
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.capacity = size
+        self._mask = size - 1
+
+        self._ts = [0] * size
+        self._codes = [0] * size
+        self._x = [0] * size
+        self._y = [0] * size
+        self._a = [None] * size
+        self._b = [None] * size
+
+        self._head = 0
+        self._tail = 0
+
+        # Counters (producer side)
+        self.pushed = 0
+        self.dropped = 0
+        self.latency_total_ns = 0
+        self.latency_max_ns = 0
+
+    def push(self, code, x, y, a=None, b=None):
+        """Ghi một bản ghi từ hook thread, trả về False nếu buffer đầy"""
+        # Monotonic nanosecond clock doubles as the event timestamp
+        timestamp = time.perf_counter_ns()
+
+        tail = self._tail
+        if tail - self._head >= self.capacity:
+            self.dropped += 1
+            return False
+
+        i = tail & self._mask
+        self._ts[i] = timestamp
+        self._codes[i] = code
+        self._x[i] = x
+        self._y[i] = y
+        self._a[i] = a
+        self._b[i] = b
+        # Publish slot cho consumer
+        self._tail = tail + 1
+
+        self.pushed += 1
+        latency = time.perf_counter_ns() - timestamp
+        self.latency_total_ns += latency
+        if latency > self.latency_max_ns:
+            self.latency_max_ns = latency
+        return True
+
+    def depth(self):
+        """Số bản ghi đang chờ consumer"""
+        return self._tail - self._head
+
+    def drain(self):
+        """Lấy tất cả bản ghi đã publish (chỉ gọi từ consumer thread)"""
+        head = self._head
+        tail = self._tail
+        if head == tail:
+            return []
+
+        mask = self._mask
+        records = []
+        for seq in range(head, tail):
+            i = seq & mask
+            records.append((self._ts[i], self._codes[i], self._x[i], self._y[i], self._a[i], self._b[i]))
+            # Release object references held by the slot
+            self._a[i] = None
+            self._b[i] = None
+        self._head = tail
+        return records
+
+
+class CaptureStage:
+    """
+    Hai ring buffer (chuột, bàn phím) + thread tiêu thụ.
+
+    Mỗi listener của pynput chạy trên một thread riêng nên mỗi listener có
+    ring riêng (đúng mô hình một producer). Consumer trộn hai ring theo
+    timestamp rồi giao cho `sink(records)`.
+
+    Timestamp của bản ghi là `time.perf_counter_ns()` (đơn điệu, nano giây).
+    Một bản ghi có thể được đóng timestamp trước nhưng publish sau bản ghi
+    của ring kia, nên consumer giữ lại các bản ghi mới hơn `reorder_window`
+    giây để trộn đúng thứ tự trước khi giao cho sink.
+    """
+
+    def __init__(self, sink, capacity=8192, drain_interval=0.005, reorder_window=0.05):
+        self.mouse = CaptureRing(capacity)
+        self.keyboard = CaptureRing(capacity)
+        self.drain_interval = drain_interval
+        self.reorder_window_ns = int(reorder_window * 1_000_000_000)
+        self.max_depth = 0
+        self.drained = 0
+        self.late = 0
+
+        self._sink = sink
+        self._pending = []
+        self._last_timestamp = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Bắt đầu thread tiêu thụ"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="capture-consumer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Dừng thread tiêu thụ sau khi đã đổ hết buffer"""
+        self._stop_event.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        # Final drain in case the thread never started or exited early
+        self.drain()
+
+    def _run(self):
+        while not self._stop_event.wait(self.drain_interval):
+            self.drain(final=False)
+        self.drain()
+
+    def drain(self, final=True):
+        """Đổ bản ghi từ cả hai ring vào sink, trả về số bản ghi đã giao"""
+        depth = self.mouse.depth() + self.keyboard.depth()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+        # Cutoff is taken before reading the rings so anything published
+        # afterwards is newer than it (modulo the reorder window)
+        cutoff = time.perf_counter_ns() - self.reorder_window_ns
+        batches = [batch for batch in (self._pending, self.mouse.drain(), self.keyboard.drain()) if batch]
+        if not batches:
+            return 0
+        if len(batches) == 1:
+            records = batches[0]
+        else:
+            records = list(heapq.merge(*batches, key=_by_timestamp))
+
+        if final:
+            ready, self._pending = records, []
+        else:
+            # Only the newest few records are held back, so scan from the end
+            split = len(records)
+            while split and records[split - 1][0] > cutoff:
+                split -= 1
+            ready, self._pending = records[:split], records[split:]
+
+        if not ready:
+            return 0
+
+        # A record published later than the reorder window is clamped so the
+        # event store stays sorted by time
+        last = self._last_timestamp
+        if last is not None and ready[0][0] < last:
+            fixed = []
+            for record in ready:
+                if record[0] < last:
+                    self.late += 1
+                    record = (last,) + record[1:]
+                last = record[0]
+                fixed.append(record)
+            ready = fixed
+        self._last_timestamp = ready[-1][0]
+
+        self.drained += len(ready)
+        self._sink(ready)
+        return len(ready)
+
+    def stats(self):
+        """Thống kê capture: độ sâu buffer, số bản ghi bị bỏ, độ trễ callback"""
+        pushed = self.mouse.pushed + self.keyboard.pushed
+        latency_total = self.mouse.latency_total_ns + self.keyboard.latency_total_ns
+        return {
+            'pushed': pushed,
+            'drained': self.drained,
+            'dropped': self.mouse.dropped + self.keyboard.dropped,
+            'late': self.late,
+            'depth': self.mouse.depth() + self.keyboard.depth(),
+            'max_depth': self.max_depth,
+            'capacity': self.mouse.capacity + self.keyboard.capacity,
+            'avg_callback_us': (latency_total / pushed / 1000) if pushed else 0,
+            'max_callback_us': max(self.mouse.latency_max_ns, self.keyboard.latency_max_ns) / 1000
+        }
+
+
+class MoveDecimator:
+    """
+    Bộ lọc mouse_move lúc ghi (chạy trên consumer thread).
+
+    Một mouse_move chỉ được giữ khi con trỏ đã đi ít nhất `min_distance`
+    pixel và đã qua ít nhất `min_interval_ns` kể từ mouse_move được giữ gần
+    nhất. Mouse_move bị bỏ gần nhất được giữ tạm để có thể ghi lại ngay
+    trước click/scroll (vị trí chính xác trước khi click), và mouse_move đầu
+    tiên sau click/scroll luôn được giữ.
+    """
+
+    def __init__(self, min_distance=0, min_interval_ns=0, keep_near_clicks=True):
+        self.min_distance = min_distance
+        self.min_interval_ns = min_interval_ns
+        self.keep_near_clicks = keep_near_clicks
+
+        self.seen = 0
+        self.kept = 0
+
+        self._min_distance_sq = min_distance * min_distance
+        self._last = None
+        self._held = None
+        self._force_next = True
+
+    @property
+    def active(self):
+        return self.min_distance > 0 or self.min_interval_ns > 0
+
+    @property
+    def dropped(self):
+        return self.seen - self.kept
+
+    def accept(self, timestamp_ns, x, y):
+        """True nếu mouse_move này cần được ghi"""
+        self.seen += 1
+        last = self._last
+        if not self._force_next and last is not None:
+            last_ts, last_x, last_y = last
+            dx = x - last_x
+            dy = y - last_y
+            if (dx * dx + dy * dy < self._min_distance_sq
+                    or timestamp_ns - last_ts < self.min_interval_ns):
+                self._held = (timestamp_ns, x, y)
+                return False
+
+        self._force_next = False
+        self._held = None
+        self._last = (timestamp_ns, x, y)
+        self.kept += 1
+        return True
+
+    def before_click(self):
+        """
+        Gọi trước khi ghi click/scroll. Trả về mouse_move đang giữ tạm
+        (timestamp_ns, x, y) cần ghi trước sự kiện đó, hoặc None.
+        """
+        if not self.keep_near_clicks:
+            return None
+        self._force_next = True
+        return self.flush()
+
+    def flush(self):
+        """Trả về mouse_move đang giữ tạm (vị trí cuối cùng), hoặc None"""
+        held = self._held
+        if held is not None:
+            self._held = None
+            self._last = held
+            self.kept += 1
+        return held
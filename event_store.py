@@ -0,0 +1,489 @@
+"""
+Kho sự kiện dạng cột cho MacroRecorder.
+
+Thay vì giữ mỗi sự kiện là một dict Python (lặp lại các key 'type',
+'timestamp', 'x', 'y'... cho từng sự kiện), EventStore giữ từng trường trong
+một mảng `array` có kiểu cố định. Các chuỗi (tên phím, nút chuột) được
+intern vào một bảng chuỗi và chỉ lưu id.
+
+EventStore vẫn hoạt động như một sequence các dict để code cũ
+(`replay_macro`, `print_stats`, `save_macro`, GUI...) không phải thay đổi:
+`store[i]`, `store[-1]['timestamp']`, `len(store)`, `for event in store`.
+"""
+
+from array import array
+
+# Mã loại sự kiện (dùng chung với capture stage)
+EVENT_MOUSE_MOVE = 0
+EVENT_MOUSE_CLICK = 1
+EVENT_MOUSE_SCROLL = 2
+EVENT_KEY_PRESS = 3
+EVENT_KEY_RELEASE = 4
+
+EVENT_TYPES = ('mouse_move', 'mouse_click', 'mouse_scroll', 'key_press', 'key_release')
+TYPE_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+
+# Id dùng cho chuỗi None (ví dụ key.char = None)
+NO_STRING = -1
+
+# Loại sự kiện có arg1 là id trong bảng chuỗi (nút chuột, tên phím)
+STRING_ARG_CODES = (EVENT_MOUSE_CLICK, EVENT_KEY_PRESS, EVENT_KEY_RELEASE)
+
+NS_PER_SECOND = 1_000_000_000
+
+# (tên cột, typecode của array) theo thứ tự lưu trong file nhị phân:
+# cột 8 byte trước để các cột giữ alignment tự nhiên
+COLUMN_LAYOUT = (
+    ('timestamps', 'q'),
+    ('xs', 'i'),
+    ('ys', 'i'),
+    ('arg1', 'i'),
+    ('arg2', 'i'),
+    ('types', 'B'),
+)
+
+
+class RunningStats:
+    """
+    Thống kê cộng dồn, cập nhật O(1) mỗi khi thêm sự kiện: số sự kiện theo
+    loại, min/max/trung bình/phương sai của delay giữa các sự kiện (Welford,
+    đơn vị ns) và khung bao (bounding box) vị trí con trỏ.
+    """
+
+    def __init__(self):
+        self.counts = [0] * len(EVENT_TYPES)
+        self.total = 0
+        self.last_timestamp = 0
+
+        self.delay_count = 0
+        self.delay_mean = 0.0
+        self.delay_m2 = 0.0
+        self.delay_min = None
+        self.delay_max = None
+
+        self.min_x = self.min_y = None
+        self.max_x = self.max_y = None
+
+    def add(self, code, timestamp_ns, x, y):
+        self.counts[code] += 1
+        if self.total:
+            delay = timestamp_ns - self.last_timestamp
+            self.delay_count += 1
+            diff = delay - self.delay_mean
+            self.delay_mean += diff / self.delay_count
+            self.delay_m2 += diff * (delay - self.delay_mean)
+            if self.delay_min is None or delay < self.delay_min:
+                self.delay_min = delay
+            if self.delay_max is None or delay > self.delay_max:
+                self.delay_max = delay
+        self.total += 1
+        self.last_timestamp = timestamp_ns
+
+        # Key events carry no pointer position
+        if code <= EVENT_MOUSE_SCROLL:
+            if self.min_x is None:
+                self.min_x = self.max_x = x
+                self.min_y = self.max_y = y
+            else:
+                if x < self.min_x:
+                    self.min_x = x
+                elif x > self.max_x:
+                    self.max_x = x
+                if y < self.min_y:
+                    self.min_y = y
+                elif y > self.max_y:
+                    self.max_y = y
+
+    def add_many(self, types, timestamps, xs, ys):
+        """Như gọi add() cho từng sự kiện, nhưng nhanh hơn cho một lô lớn"""
+        counts = self.counts
+        total = self.total
+        last = self.last_timestamp
+        delay_count = self.delay_count
+        mean = self.delay_mean
+        m2 = self.delay_m2
+        delay_min = self.delay_min
+        delay_max = self.delay_max
+        min_x, min_y, max_x, max_y = self.min_x, self.min_y, self.max_x, self.max_y
+
+        for code, timestamp_ns, x, y in zip(types, timestamps, xs, ys):
+            counts[code] += 1
+            if total:
+                delay = timestamp_ns - last
+                delay_count += 1
+                diff = delay - mean
+                mean += diff / delay_count
+                m2 += diff * (delay - mean)
+                if delay_min is None or delay < delay_min:
+                    delay_min = delay
+                if delay_max is None or delay > delay_max:
+                    delay_max = delay
+            total += 1
+            last = timestamp_ns
+
+            if code <= EVENT_MOUSE_SCROLL:
+                if min_x is None:
+                    min_x = max_x = x
+                    min_y = max_y = y
+                else:
+                    if x < min_x:
+                        min_x = x
+                    elif x > max_x:
+                        max_x = x
+                    if y < min_y:
+                        min_y = y
+                    elif y > max_y:
+                        max_y = y
+
+        self.total = total
+        self.last_timestamp = last
+        self.delay_count = delay_count
+        self.delay_mean = mean
+        self.delay_m2 = m2
+        self.delay_min = delay_min
+        self.delay_max = delay_max
+        self.min_x, self.min_y, self.max_x, self.max_y = min_x, min_y, max_x, max_y
+
+    def copy(self):
+        stats = RunningStats()
+        stats.__dict__.update(self.__dict__)
+        stats.counts = list(self.counts)
+        return stats
+
+    def to_dict(self):
+        """Trạng thái đầy đủ (để lưu vào header file nhị phân)"""
+        return dict(self.__dict__, counts=list(self.counts))
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls()
+        for name, value in state.items():
+            if name in stats.__dict__:
+                setattr(stats, name, value)
+        stats.counts = list(stats.counts)
+        return stats
+
+    # Giá trị tính sẵn (giây) cho header macro / GUI
+
+    @property
+    def duration(self):
+        return self.last_timestamp / NS_PER_SECOND
+
+    @property
+    def average_delay(self):
+        return self.delay_mean / NS_PER_SECOND
+
+    @property
+    def min_delay(self):
+        return (self.delay_min or 0) / NS_PER_SECOND
+
+    @property
+    def max_delay(self):
+        return (self.delay_max or 0) / NS_PER_SECOND
+
+    @property
+    def delay_stddev(self):
+        if self.delay_count < 2:
+            return 0.0
+        return (self.delay_m2 / (self.delay_count - 1)) ** 0.5 / NS_PER_SECOND
+
+    def event_counts(self):
+        """Số sự kiện theo tên loại (chỉ các loại có xuất hiện)"""
+        return {EVENT_TYPES[code]: count for code, count in enumerate(self.counts) if count}
+
+    def count(self, event_type):
+        return self.counts[TYPE_CODES[event_type]]
+
+    def pointer_bounds(self):
+        """Khung bao vị trí con trỏ {min_x, min_y, max_x, max_y} hoặc None"""
+        if self.min_x is None:
+            return None
+        return {'min_x': self.min_x, 'min_y': self.min_y, 'max_x': self.max_x, 'max_y': self.max_y}
+
+
+class EventStore:
+    """
+    Kho sự kiện dạng cột.
+
+    Các cột:
+        timestamps: int64, nano giây (perf_counter_ns) tính từ lúc bắt đầu ghi
+        types:      uint8, mã loại sự kiện (xem EVENT_TYPES)
+        xs, ys:     int32, tọa độ con trỏ
+        arg1:       int32, id nút chuột (click), dx (scroll), id phím (key)
+        arg2:       int32, pressed 0/1 (click), dy (scroll)
+
+    `stats` (RunningStats) được cập nhật mỗi lần thêm sự kiện nên các thống
+    kê của macro luôn đọc được trong O(1).
+    """
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.types = array('B')
+        self.xs = array('i')
+        self.ys = array('i')
+        self.arg1 = array('i')
+        self.arg2 = array('i')
+
+        self.strings = []
+        self._string_ids = {}
+        self.stats = RunningStats()
+        self.frozen = False
+        # File mmap mà các cột đang trỏ vào (xem macro_io.read_binary_macro)
+        self.mapping = None
+
+    @classmethod
+    def from_events(cls, events):
+        """Tạo EventStore từ list các dict sự kiện (hoặc EventStore khác)"""
+        if isinstance(events, EventStore):
+            return events.copy()
+
+        store = cls()
+        store.extend(events)
+        return store
+
+    @classmethod
+    def from_columns(cls, columns, strings, stats=None):
+        """
+        Tạo EventStore từ các cột có sẵn (array hoặc memoryview, ví dụ từ
+        file mmap) mà không copy dữ liệu. Nếu không có `stats` thì tính lại.
+        """
+        store = cls()
+        for name, _ in COLUMN_LAYOUT:
+            setattr(store, name, columns[name])
+        store.strings = list(strings)
+        store._string_ids = {value: i for i, value in enumerate(store.strings)}
+
+        if stats is None:
+            stats = RunningStats()
+            stats.add_many(store.types, store.timestamps, store.xs, store.ys)
+        store.stats = stats
+        return store
+
+    @property
+    def read_only(self):
+        """True nếu các cột là view chỉ đọc (file mmap hoặc đã freeze) thay vì array"""
+        return not isinstance(self.types, array)
+
+    def freeze(self):
+        """
+        Chuyển các cột thành memoryview chỉ đọc để có thể chia sẻ an toàn
+        giữa nhiều nơi (không copy dữ liệu). Dùng `copy()` để có bản sửa được.
+        """
+        for name, _ in COLUMN_LAYOUT:
+            setattr(self, name, memoryview(getattr(self, name)).toreadonly())
+        self.strings = tuple(self.strings)
+        self.frozen = True
+        return self
+
+    def release(self):
+        """
+        Tách store khỏi file mmap: copy các cột ra array riêng rồi đóng mmap,
+        để file có thể được ghi đè hoặc xóa (Windows không cho thay file đang
+        được map). Store vẫn dùng được như cũ; không làm gì nếu không map file.
+        """
+        mapping = self.mapping
+        if mapping is None:
+            return self
+        for name, typecode in COLUMN_LAYOUT:
+            view = getattr(self, name)
+            column = array(typecode)
+            column.frombytes(memoryview(view).cast('B'))
+            setattr(self, name, memoryview(column).toreadonly() if self.frozen else column)
+            view.release()
+        self.mapping = None
+        mapping.close()
+        return self
+
+    # ------------------------------------------------------------------
+    # String table
+    # ------------------------------------------------------------------
+
+    def intern(self, value):
+        """Trả về id của chuỗi trong bảng chuỗi (thêm mới nếu chưa có)"""
+        if value is None:
+            return NO_STRING
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(value)
+            self._string_ids[value] = string_id
+        return string_id
+
+    def string(self, string_id):
+        """Lấy chuỗi theo id"""
+        if string_id == NO_STRING:
+            return None
+        return self.strings[string_id]
+
+    # ------------------------------------------------------------------
+    # Append
+    # ------------------------------------------------------------------
+
+    def append_raw(self, code, timestamp_ns, x=0, y=0, arg1=0, arg2=0):
+        """Thêm một sự kiện đã mã hóa sẵn"""
+        self.timestamps.append(timestamp_ns)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.arg1.append(arg1)
+        self.arg2.append(arg2)
+        self.stats.add(code, timestamp_ns, x, y)
+        # types is appended last so len() never exposes a half-written row
+        self.types.append(code)
+
+    def append_move(self, timestamp_ns, x, y):
+        self.append_raw(EVENT_MOUSE_MOVE, timestamp_ns, x, y)
+
+    def append_click(self, timestamp_ns, x, y, button, pressed):
+        self.append_raw(EVENT_MOUSE_CLICK, timestamp_ns, x, y, self.intern(button), 1 if pressed else 0)
+
+    def append_scroll(self, timestamp_ns, x, y, dx, dy):
+        self.append_raw(EVENT_MOUSE_SCROLL, timestamp_ns, x, y, dx, dy)
+
+    def append_key(self, code, timestamp_ns, key):
+        self.append_raw(code, timestamp_ns, 0, 0, self.intern(key))
+
+    def _encode(self, event):
+        """Dict sự kiện (format JSON v2) -> (code, timestamp_ns, x, y, arg1, arg2)"""
+        code = TYPE_CODES.get(event['type'])
+        if code is None:
+            raise ValueError(f"Loại sự kiện không hỗ trợ: {event['type']}")
+
+        # Format v2 lưu giây dạng float; chuyển sang nano giây nguyên
+        timestamp_ns = event.get('timestamp_ns')
+        if timestamp_ns is None:
+            timestamp_ns = round(event['timestamp'] * NS_PER_SECOND)
+
+        if code == EVENT_MOUSE_MOVE:
+            return code, timestamp_ns, int(event['x']), int(event['y']), 0, 0
+        if code == EVENT_MOUSE_CLICK:
+            return (code, timestamp_ns, int(event['x']), int(event['y']),
+                    self.intern(event['button']), 1 if event['pressed'] else 0)
+        if code == EVENT_MOUSE_SCROLL:
+            return (code, timestamp_ns, int(event['x']), int(event['y']),
+                    int(event['dx']), int(event['dy']))
+        return code, timestamp_ns, 0, 0, self.intern(event['key']), 0
+
+    def append(self, event):
+        """Thêm một sự kiện dạng dict (format JSON v2)"""
+        self.append_raw(*self._encode(event))
+
+    def extend(self, events):
+        """Thêm nhiều dict sự kiện một lúc (mã hóa cả lô rồi mới nối vào các cột)"""
+        encode = self._encode
+        rows = [encode(event) for event in events]
+        if not rows:
+            return
+        types, timestamps, xs, ys, arg1, arg2 = zip(*rows)
+
+        self.timestamps.extend(timestamps)
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        self.arg1.extend(arg1)
+        self.arg2.extend(arg2)
+        self.stats.add_many(types, timestamps, xs, ys)
+        # types is extended last so len() never exposes half-written rows
+        self.types.extend(types)
+
+    def clear(self):
+        """Xóa toàn bộ sự kiện (giữ bảng chuỗi)"""
+        if self.frozen:
+            raise TypeError("EventStore đã freeze (đang được chia sẻ), hãy dùng copy()")
+        # Fresh arrays so a store loaded from a mapped file becomes writable
+        for name, typecode in COLUMN_LAYOUT:
+            setattr(self, name, array(typecode))
+        self.stats = RunningStats()
+
+    # ------------------------------------------------------------------
+    # Sequence view
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.types)
+
+    def __iter__(self):
+        for i in range(len(self.types)):
+            yield self.event_at(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(range(*index.indices(len(self))))
+
+        size = len(self.types)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("EventStore index out of range")
+        return self.event_at(index)
+
+    def event_at(self, i):
+        """Tạo dict sự kiện (format JSON v2) cho phần tử thứ i"""
+        code = self.types[i]
+        timestamp = self.timestamps[i] / NS_PER_SECOND
+
+        if code == EVENT_MOUSE_MOVE:
+            return {
+                'type': 'mouse_move',
+                'timestamp': timestamp,
+                'x': self.xs[i],
+                'y': self.ys[i]
+            }
+        if code == EVENT_MOUSE_CLICK:
+            return {
+                'type': 'mouse_click',
+                'timestamp': timestamp,
+                'x': self.xs[i],
+                'y': self.ys[i],
+                'button': self.string(self.arg1[i]),
+                'pressed': bool(self.arg2[i])
+            }
+        if code == EVENT_MOUSE_SCROLL:
+            return {
+                'type': 'mouse_scroll',
+                'timestamp': timestamp,
+                'x': self.xs[i],
+                'y': self.ys[i],
+                'dx': self.arg1[i],
+                'dy': self.arg2[i]
+            }
+        return {
+            'type': EVENT_TYPES[code],
+            'timestamp': timestamp,
+            'key': self.string(self.arg1[i])
+        }
+
+    def to_list(self):
+        """Chuyển thành list các dict (dùng khi ghi JSON)"""
+        return [self.event_at(i) for i in range(len(self.types))]
+
+    # ------------------------------------------------------------------
+    # Copy / selection
+    # ------------------------------------------------------------------
+
+    def _columns(self):
+        return (self.timestamps, self.xs, self.ys, self.arg1, self.arg2, self.types)
+
+    def copy(self):
+        """Bản sao độc lập (copy mảng, không tạo dict)"""
+        store = EventStore()
+        for name, typecode in COLUMN_LAYOUT:
+            column = array(typecode)
+            column.frombytes(memoryview(getattr(self, name)).cast('B'))
+            setattr(store, name, column)
+        store.strings = list(self.strings)
+        store._string_ids = dict(self._string_ids)
+        store.stats = self.stats.copy()
+        return store
+
+    def take(self, indices):
+        """EventStore mới chỉ gồm các sự kiện tại `indices` (dùng chung bảng chuỗi)"""
+        store = EventStore()
+        store.strings = list(self.strings)
+        store._string_ids = dict(self._string_ids)
+        for i in indices:
+            store.append_raw(self.types[i], self.timestamps[i], self.xs[i], self.ys[i],
+                             self.arg1[i], self.arg2[i])
+        return store
+
+    def nbytes(self):
+        """Dung lượng ước tính của các cột (byte)"""
+        return sum(len(column) * column.itemsize for column in self._columns())
@@ -10,12 +10,18 @@ import threading
 import time
 import os
 from macro_recorder import MacroRecorder
+from macro_catalog import MacroCatalog, format_duration
+from macro_cache import get_macro
 try:
     from version import __version__, APP_NAME
 except ImportError:
     __version__ = "1.0.0"
     APP_NAME = "Macro Recorder Tool"
 
+MACRO_FILETYPES = [("Macro files", "*.json *.mrb *.mrz"), ("JSON files", "*.json"),
+                   ("Binary macro (v3)", "*.mrb"), ("Compressed macro", "*.mrz"),
+                   ("All files", "*.*")]
+
 class MacroRecorderGUI:
     def __init__(self, root):
         self.root = root
@@ -38,6 +44,9 @@ class MacroRecorderGUI:
         self.macro_a_filename = ""
         self.macro_b_filename = ""
         
+        # Thư mục mặc định của thư viện macro
+        self.library_folder = "SCRIPT"
+        
         # Tạo giao diện
         self.create_widgets()
         
@@ -104,6 +113,9 @@ class MacroRecorderGUI:
                                         command=self.stop_replay, width=8, state='disabled')
         self.stop_replay_btn.grid(row=0, column=3, padx=1)
         
+        ttk.Button(macro_frame, text="📚 Macro Library", 
+                  command=self.show_macro_library, width=20).grid(row=4, column=0, columnspan=2, pady=(5, 0))
+        
         # Smoothness control
         smooth_frame = ttk.Frame(macro_frame)
         smooth_frame.grid(row=3, column=0, columnspan=2, pady=(5, 0))
@@ -124,6 +136,26 @@ class MacroRecorderGUI:
             
         self.smooth_var.trace('w', update_smooth_label)
         
+        # Capture-time mouse_move filter
+        ttk.Label(smooth_frame, text="Lọc move (px):").grid(row=1, column=0, padx=(0, 5), pady=(5, 0))
+        self.move_filter_var = tk.IntVar(value=0)
+        ttk.Spinbox(smooth_frame, from_=0, to=50, textvariable=self.move_filter_var,
+                    width=6).grid(row=1, column=1, sticky=tk.W, padx=5, pady=(5, 0))
+        
+        def update_move_filter(*args):
+            try:
+                self.recorder.move_min_distance = max(0, self.move_filter_var.get())
+            except tk.TclError:
+                pass  # Spinbox đang được sửa dở
+            
+        self.move_filter_var.trace('w', update_move_filter)
+        
+        # Append-only journal while recording
+        self.journal_var = tk.BooleanVar(value=self.recorder.journal_enabled)
+        ttk.Checkbutton(smooth_frame, text="📓 Journal", variable=self.journal_var,
+                        command=lambda: self.recorder.set_journal_enabled(self.journal_var.get())
+                        ).grid(row=1, column=2, sticky=tk.W, pady=(5, 0))
+        
         # === SCREENSHOT CONTROLS ===
         screenshot_frame = ttk.LabelFrame(main_frame, text="📸 Screenshot Controls", padding="10")
         screenshot_frame.grid(row=1, column=2, columnspan=2, sticky=tk.W+tk.E, padx=(5, 0))
@@ -397,9 +429,9 @@ class MacroRecorderGUI:
             self.macro_info_label.config(text="No macro loaded", foreground="gray")
             return
         
-        # Calculate basic info
+        # Basic info from the store's running stats (O(1))
         event_count = len(self.recorder.events)
-        duration = self.recorder.events[-1]['timestamp'] if self.recorder.events else 0
+        duration = self.recorder.events.stats.duration
         
         # Create info text
         info_text = f"📝 {event_count} events | ⏱️ {duration:.1f}s"
@@ -447,14 +479,8 @@ class MacroRecorderGUI:
     
     def handle_f9_save_prompt(self):
         """Xử lý F9 với dialog lưu file"""
-        # Dừng recording trước
-        self.recorder.recording = False
-        self.recorder.end_time = time.time()
-        
-        if self.recorder.mouse_listener:
-            self.recorder.mouse_listener.stop()
-        if self.recorder.keyboard_listener:
-            self.recorder.keyboard_listener.stop()
+        # Dừng recording trước (đổ hết capture buffer vào events)
+        self.recorder.stop_capture()
         
         # Cập nhật UI
         self.recording = False
@@ -465,8 +491,8 @@ class MacroRecorderGUI:
         self.update_macro_info()
         
         # Hiện recording summary
-        if self.recorder.events and self.recorder.start_time and self.recorder.end_time:
-            duration = self.recorder.end_time - self.recorder.start_time
+        duration = self.recorder.recording_duration()
+        if self.recorder.events and duration:
             self.log(f"📊 {duration:.1f}s, {len(self.recorder.events)} events")
             self.log(f"📈 {len(self.recorder.events)/duration:.1f}/s")
         
@@ -486,18 +512,29 @@ class MacroRecorderGUI:
             
         filename = filedialog.asksaveasfilename(
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            filetypes=MACRO_FILETYPES,
             title="Lưu macro"
         )
         
         if filename:
-            self.recorder.save_macro(filename)
-            self.log(f"💾 Lưu: {os.path.basename(filename)}")
+            # Ghi ở thread nền, UI không bị đứng khi macro lớn
+            self.log(f"💾 Đang lưu: {os.path.basename(filename)}...")
+            self.recorder.save_macro(filename, background=True,
+                                     callback=lambda job: self.root.after(0, self.on_macro_saved, job))
+    
+    def on_macro_saved(self, job):
+        """Kết quả lưu nền (chạy trên thread Tk)"""
+        name = os.path.basename(job.filename)
+        if job.error:
+            self.log(f"❌ Lưu {name} thất bại: {job.error}")
+            messagebox.showerror("Lỗi", f"Không lưu được macro {name}:\n{job.error}")
+        else:
+            self.log(f"💾 Đã lưu: {name} ({job.elapsed * 1000:.0f}ms)")
             
     def load_macro(self):
         """Load macro from file"""
         filename = filedialog.askopenfilename(
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            filetypes=MACRO_FILETYPES,
             title="Tải macro"
         )
         
@@ -522,7 +559,7 @@ class MacroRecorderGUI:
         speed_text = {1.0: "bình thường", 2.0: "2x", 0.5: "0.5x"}
         self.log(f"▶️ Phát lại macro với tốc độ {speed_text.get(speed, str(speed))}...")
         self.log("⏳ 3 giây để chuẩn bị...")
-        self.log("🛑 Nhấn ESC hoặc click nút Stop để dừng")
+        self.log("🛑 Nhấn ESC hoặc click nút Stop để dừng, F8 để tạm dừng/tiếp tục")
         self.update_status(f"Preparing replay ({speed_text.get(speed, str(speed))})", "orange")
         
         def countdown_and_replay():
@@ -615,6 +652,89 @@ class MacroRecorderGUI:
         ttk.Button(button_frame, text="OK", command=do_cleanup).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Cancel", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
         
+    def show_macro_library(self):
+        """Show the macro library (header-only catalog of a folder)"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("📚 Macro Library")
+        dialog.geometry("760x400")
+        dialog.transient(self.root)
+        
+        top_frame = ttk.Frame(dialog, padding="5")
+        top_frame.pack(fill='x')
+        ttk.Label(top_frame, text="📁 Folder:").pack(side=tk.LEFT)
+        folder_var = tk.StringVar(value=self.library_folder)
+        ttk.Entry(top_frame, textvariable=folder_var, width=50).pack(side=tk.LEFT, padx=5, fill='x', expand=True)
+        
+        columns = ('name', 'events', 'duration', 'created', 'size')
+        headings = {'name': "File", 'events': "Events", 'duration': "Duration",
+                    'created': "Created", 'size': "Size (KB)"}
+        tree = ttk.Treeview(dialog, columns=columns, show='headings')
+        for column in columns:
+            tree.heading(column, text=headings[column], command=lambda c=column: sort_by(c))
+            tree.column(column, width=260 if column == 'name' else 110,
+                        anchor=tk.W if column in ('name', 'created') else tk.E)
+        scrollbar = ttk.Scrollbar(dialog, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        
+        status_label = ttk.Label(dialog, text="", foreground="gray")
+        state = {'catalog': None, 'sort': 'name', 'reverse': False}
+        
+        def fill():
+            tree.delete(*tree.get_children())
+            for entry in state['catalog'].list_entries(state['sort'], state['reverse']):
+                if 'error' in entry:
+                    values = (entry['name'], "⚠️", "-", "-", f"{entry['size'] / 1024:.1f}")
+                else:
+                    values = (entry['name'],
+                              entry['total_events'] if entry['total_events'] is not None else "-",
+                              format_duration(entry['actual_duration']),
+                              (entry['created_at'] or "-")[:16].replace('T', ' '),
+                              f"{entry['size'] / 1024:.1f}")
+                tree.insert('', tk.END, iid=entry['name'], values=values)
+        
+        def refresh():
+            folder = folder_var.get().strip()
+            if not os.path.isdir(folder):
+                status_label.config(text=f"❌ Không tìm thấy thư mục: {folder}", foreground="red")
+                return
+            self.library_folder = folder
+            state['catalog'] = MacroCatalog(folder)
+            updated, removed = state['catalog'].refresh()
+            fill()
+            status_label.config(text=f"📚 {len(state['catalog'].entries)} macro (đọc lại {updated}, bỏ {removed})",
+                                foreground="gray")
+        
+        def sort_by(column):
+            state['reverse'] = not state['reverse'] if state['sort'] == column else False
+            state['sort'] = column
+            if state['catalog']:
+                fill()
+        
+        def load_selected(event=None):
+            selection = tree.selection()
+            if not selection or not state['catalog']:
+                return
+            path = state['catalog'].path(selection[0])
+            if self.recorder.load_macro(path):
+                self.log(f"📂 Tải: {selection[0]}")
+            else:
+                self.log(f"❌ Lỗi tải: {selection[0]}")
+            self.update_macro_info()
+        
+        ttk.Button(top_frame, text="🔄 Refresh", command=refresh).pack(side=tk.LEFT)
+        
+        bottom_frame = ttk.Frame(dialog, padding="5")
+        bottom_frame.pack(side=tk.BOTTOM, fill='x')
+        status_label.pack(in_=bottom_frame, side=tk.LEFT)
+        ttk.Button(bottom_frame, text="Close", command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(bottom_frame, text="📂 Load", command=load_selected).pack(side=tk.RIGHT)
+        
+        scrollbar.pack(side=tk.RIGHT, fill='y')
+        tree.pack(expand=True, fill='both')
+        tree.bind('<Double-1>', load_selected)
+        
+        refresh()
+        
     def show_stats(self):
         """Show macro statistics"""
         self.log("📊 Thống kê macro:")
@@ -654,6 +774,11 @@ class MacroRecorderGUI:
 • Ví dụ: A×3 → B×1 → A×3 → B×1... (lặp theo chu kỳ)
 • Nhấn ESC để dừng phát lại xen kẽ
 
+📚 THƯ VIỆN MACRO:
+• Click "Macro Library" để xem các macro trong một thư mục (mặc định SCRIPT/)
+• Click tiêu đề cột để sắp xếp, double-click để tải macro
+• Thông tin được cache, chỉ file mới/đã sửa mới được đọc lại
+
 📊 THÔNG TIN MACRO:
 • Hiển thị số sự kiện, thời lượng, tần suất
 • Click "Stats" để xem thống kê chi tiết
@@ -717,42 +842,44 @@ class MacroRecorderGUI:
     def load_macro_a(self):
         """Load macro A for alternating playback"""
         filename = filedialog.askopenfilename(
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            filetypes=MACRO_FILETYPES,
             title="Tải Macro A"
         )
         
         if filename:
-            # Create temporary recorder to load the macro
-            temp_recorder = MacroRecorder()
-            if temp_recorder.load_macro(filename):
-                self.macro_a_events = temp_recorder.events.copy()
-                self.macro_a_filename = os.path.basename(filename)
-                self.macro_a_label.config(text=f"{self.macro_a_filename} ({len(self.macro_a_events)} events)", 
-                                        foreground="green")
-                self.log(f"📂 A: {os.path.basename(filename)}")
-                self.update_alternating_info()
-            else:
-                self.log(f"❌ Lỗi A: {os.path.basename(filename)}")
+            # Shared read-only macro from the process-wide cache (no re-parse, no copy)
+            try:
+                macro = get_macro(filename)
+            except Exception as e:
+                self.log(f"❌ Lỗi A: {os.path.basename(filename)} ({e})")
+                return
+            self.macro_a_events = macro.events
+            self.macro_a_filename = os.path.basename(filename)
+            self.macro_a_label.config(text=f"{self.macro_a_filename} ({len(self.macro_a_events)} events)", 
+                                    foreground="green")
+            self.log(f"📂 A: {os.path.basename(filename)}")
+            self.update_alternating_info()
                 
     def load_macro_b(self):
         """Load macro B for alternating playback"""
         filename = filedialog.askopenfilename(
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            filetypes=MACRO_FILETYPES,
             title="Tải Macro B"
         )
         
         if filename:
-            # Create temporary recorder to load the macro
-            temp_recorder = MacroRecorder()
-            if temp_recorder.load_macro(filename):
-                self.macro_b_events = temp_recorder.events.copy()
-                self.macro_b_filename = os.path.basename(filename)
-                self.macro_b_label.config(text=f"{self.macro_b_filename} ({len(self.macro_b_events)} events)", 
-                                        foreground="green")
-                self.log(f"📂 B: {os.path.basename(filename)}")
-                self.update_alternating_info()
-            else:
-                self.log(f"❌ Lỗi B: {os.path.basename(filename)}")
+            # Shared read-only macro from the process-wide cache (no re-parse, no copy)
+            try:
+                macro = get_macro(filename)
+            except Exception as e:
+                self.log(f"❌ Lỗi B: {os.path.basename(filename)} ({e})")
+                return
+            self.macro_b_events = macro.events
+            self.macro_b_filename = os.path.basename(filename)
+            self.macro_b_label.config(text=f"{self.macro_b_filename} ({len(self.macro_b_events)} events)", 
+                                    foreground="green")
+            self.log(f"📂 B: {os.path.basename(filename)}")
+            self.update_alternating_info()
     
     def update_alternating_info(self):
         """Update alternating replay info display"""
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Backend phát sự kiện chuột/bàn phím cho replay.
+
+Mọi backend có cùng giao diện (theo tên hàm của pyautogui):
+    moveTo(x, y), click(x, y, button), scroll(clicks, x, y), press(key),
+    hotkey(*keys), write(text)
+Tên phím là tên phím pyautogui/pynput ('enter', 'space', 'f5', 'a'...).
+
+Các backend:
+    pyautogui   mặc định; gọi với _pause=False nên không bị pyautogui.PAUSE
+                chặn sau mỗi lệnh
+    pynput      mouse/keyboard Controller của pynput
+    xtest       Linux/X11 qua extension XTest (python-xlib), độ trễ thấp nhất
+    recording   không phát gì, ghi lại lệnh + thời điểm (test, benchmark)
+    null        không làm gì (đo overhead)
+
+Chọn backend bằng biến môi trường MACRO_INPUT_BACKEND hoặc
+`MacroRecorder.set_input_backend()`. So sánh độ trễ mỗi lệnh trên máy này:
+    python input_backends.py
+"""
+
+import argparse
+import os
+import sys
+import time
+from array import array
+from functools import partial
+
+BACKEND_NAMES = ('pyautogui', 'pynput', 'xtest', 'recording', 'null')
+DEFAULT_BACKEND = 'pyautogui'
+
+
+class NullBackend:
+    """Backend không làm gì"""
+
+    name = 'null'
+
+    def moveTo(self, x, y):
+        pass
+
+    def click(self, x, y, button='left'):
+        pass
+
+    def scroll(self, clicks, x=None, y=None):
+        pass
+
+    def press(self, key):
+        pass
+
+    def hotkey(self, *keys):
+        pass
+
+    def write(self, text):
+        pass
+
+
+class RecordingBackend:
+    """
+    Backend ghi lại các lệnh trong bộ nhớ: `calls` là list tuple (tên lệnh,
+    tham số...), `times` là thời điểm gọi (perf_counter_ns) tương ứng.
+    """
+
+    name = 'recording'
+
+    def __init__(self):
+        self.calls = []
+        self.times = array('q')
+
+    def _record(self, call):
+        self.times.append(time.perf_counter_ns())
+        self.calls.append(call)
+
+    def moveTo(self, x, y):
+        self._record(('moveTo', x, y))
+
+    def click(self, x, y, button='left'):
+        self._record(('click', x, y, button))
+
+    def scroll(self, clicks, x=None, y=None):
+        self._record(('scroll', clicks, x, y))
+
+    def press(self, key):
+        self._record(('press', key))
+
+    def hotkey(self, *keys):
+        self._record(('hotkey',) + keys)
+
+    def write(self, text):
+        self._record(('write', text))
+
+
+class PyAutoGuiBackend:
+    """pyautogui, không dùng khoảng nghỉ PAUSE sau mỗi lệnh"""
+
+    name = 'pyautogui'
+
+    def __init__(self):
+        import pyautogui
+        self.pyautogui = pyautogui
+        self.moveTo = partial(pyautogui.moveTo, _pause=False)
+        self.click = partial(pyautogui.click, _pause=False)
+        self.scroll = partial(pyautogui.scroll, _pause=False)
+        self.press = partial(pyautogui.press, _pause=False)
+        self.hotkey = partial(pyautogui.hotkey, _pause=False)
+        self.write = partial(pyautogui.write, _pause=False)
+
+
+class PynputBackend:
+    """mouse/keyboard Controller của pynput"""
+
+    name = 'pynput'
+
+    def __init__(self):
+        from pynput.keyboard import Controller as KeyboardController, Key
+        from pynput.mouse import Button, Controller as MouseController
+        self.mouse = MouseController()
+        self.keyboard = KeyboardController()
+        self._Key = Key
+        self._buttons = {'left': Button.left, 'right': Button.right, 'middle': Button.middle}
+        self._keys = {}
+
+    def _key(self, name):
+        key = self._keys.get(name)
+        if key is None:
+            # pyautogui spells a few keys differently from pynput
+            attr = {'return': 'enter', 'pageup': 'page_up', 'pagedown': 'page_down',
+                    'win': 'cmd', 'capslock': 'caps_lock'}.get(name, name)
+            key = self._keys[name] = getattr(self._Key, attr, None) or name
+        return key
+
+    def moveTo(self, x, y):
+        self.mouse.position = (x, y)
+
+    def click(self, x, y, button='left'):
+        self.mouse.position = (x, y)
+        self.mouse.click(self._buttons.get(button, self._buttons['left']))
+
+    def scroll(self, clicks, x=None, y=None):
+        if x is not None and y is not None:
+            self.mouse.position = (x, y)
+        self.mouse.scroll(0, clicks)
+
+    def press(self, key):
+        self.keyboard.tap(self._key(key))
+
+    def hotkey(self, *keys):
+        keys = [self._key(key) for key in keys]
+        for key in keys:
+            self.keyboard.press(key)
+        for key in reversed(keys):
+            self.keyboard.release(key)
+
+    def write(self, text):
+        self.keyboard.type(text)
+
+
+# Tên phím pyautogui/pynput -> tên keysym X11 (phím khác: dùng nguyên tên)
+_X_KEYSYMS = {
+    'enter': 'Return', 'return': 'Return', 'esc': 'Escape', 'backspace': 'BackSpace',
+    'delete': 'Delete', 'tab': 'Tab', 'space': 'space', 'insert': 'Insert',
+    'home': 'Home', 'end': 'End', 'page_up': 'Prior', 'pageup': 'Prior',
+    'page_down': 'Next', 'pagedown': 'Next', 'up': 'Up', 'down': 'Down',
+    'left': 'Left', 'right': 'Right', 'caps_lock': 'Caps_Lock', 'capslock': 'Caps_Lock',
+    'num_lock': 'Num_Lock', 'scroll_lock': 'Scroll_Lock', 'print_screen': 'Print',
+    'pause': 'Pause', 'menu': 'Menu',
+    'ctrl': 'Control_L', 'ctrl_l': 'Control_L', 'ctrl_r': 'Control_R',
+    'shift': 'Shift_L', 'shift_l': 'Shift_L', 'shift_r': 'Shift_R',
+    'alt': 'Alt_L', 'alt_l': 'Alt_L', 'alt_r': 'Alt_R', 'alt_gr': 'ISO_Level3_Shift',
+    'cmd': 'Super_L', 'cmd_l': 'Super_L', 'cmd_r': 'Super_R', 'win': 'Super_L',
+}
+
+# Nút chuột X11: 1 trái, 2 giữa, 3 phải, 4/5 cuộn lên/xuống
+_X_BUTTONS = {'left': 1, 'middle': 2, 'right': 3}
+
+
+class XTestBackend:
+    """
+    Linux/X11: gửi sự kiện thẳng vào X server qua XTest (python-xlib), không
+    qua lớp trung gian của pyautogui. Ký tự in hoa được gõ kèm Shift; ký tự
+    cần tổ hợp phím khác (theo layout bàn phím) có thể không gõ đúng.
+    """
+
+    name = 'xtest'
+
+    def __init__(self):
+        from Xlib import X, XK, display
+        from Xlib.ext import xtest
+        self._X = X
+        self._XK = XK
+        self._fake_input = xtest.fake_input
+        self.display = display.Display()
+        if not self.display.has_extension('XTEST'):
+            raise ImportError("X server không hỗ trợ extension XTEST")
+        self._keycodes = {}
+
+    def _keycode(self, name):
+        keycode = self._keycodes.get(name)
+        if keycode is None:
+            keysym = self._XK.string_to_keysym(_X_KEYSYMS.get(name, name))
+            if not keysym and len(name) == 1:
+                keysym = ord(name)  # Latin-1 characters use their code point as keysym
+            if not keysym and name.startswith('f') and name[1:].isdigit():
+                keysym = self._XK.string_to_keysym(name.upper())
+            keycode = self._keycodes[name] = self.display.keysym_to_keycode(keysym) if keysym else 0
+        return keycode
+
+    def _key(self, name, pressed):
+        keycode = self._keycode(name)
+        if keycode:
+            self._fake_input(self.display, self._X.KeyPress if pressed else self._X.KeyRelease, keycode)
+
+    def moveTo(self, x, y):
+        self._fake_input(self.display, self._X.MotionNotify, x=int(x), y=int(y))
+        self.display.flush()
+
+    def click(self, x, y, button='left'):
+        number = _X_BUTTONS.get(button, 1)
+        self._fake_input(self.display, self._X.MotionNotify, x=int(x), y=int(y))
+        self._fake_input(self.display, self._X.ButtonPress, number)
+        self._fake_input(self.display, self._X.ButtonRelease, number)
+        self.display.flush()
+
+    def scroll(self, clicks, x=None, y=None):
+        if x is not None and y is not None:
+            self._fake_input(self.display, self._X.MotionNotify, x=int(x), y=int(y))
+        number = 4 if clicks > 0 else 5
+        for _ in range(abs(int(clicks))):
+            self._fake_input(self.display, self._X.ButtonPress, number)
+            self._fake_input(self.display, self._X.ButtonRelease, number)
+        self.display.flush()
+
+    def press(self, key):
+        shifted = len(key) == 1 and key.isupper()
+        if shifted:
+            self._key('shift', True)
+        self._key(key, True)
+        self._key(key, False)
+        if shifted:
+            self._key('shift', False)
+        self.display.flush()
+
+    def hotkey(self, *keys):
+        for key in keys:
+            self._key(key, True)
+        for key in reversed(keys):
+            self._key(key, False)
+        self.display.flush()
+
+    def write(self, text):
+        for char in text:
+            self.press(char)
+
+
+_FACTORIES = {
+    'pyautogui': PyAutoGuiBackend,
+    'pynput': PynputBackend,
+    'xtest': XTestBackend,
+    'recording': RecordingBackend,
+    'null': NullBackend,
+}
+
+
+def create_backend(name=None):
+    """
+    Tạo backend theo tên (mặc định: MACRO_INPUT_BACKEND hoặc pyautogui).
+    Raise ValueError nếu tên không hỗ trợ, ImportError (hoặc lỗi kết nối
+    display) nếu backend không dùng được trên máy này.
+    """
+    name = name or os.environ.get('MACRO_INPUT_BACKEND') or DEFAULT_BACKEND
+    if name not in _FACTORIES:
+        raise ValueError(f"Backend nhập liệu không hỗ trợ: {name} (chọn: {', '.join(BACKEND_NAMES)})")
+    return _FACTORIES[name]()
+
+
+def available_backends():
+    """Tên các backend phát thật dùng được trên máy này"""
+    names = []
+    for name in ('pyautogui', 'pynput', 'xtest'):
+        try:
+            create_backend(name)
+        except Exception:
+            continue
+        names.append(name)
+    return names
+
+
+def measure_latency(backend, count=200):
+    """Thời gian trung bình (µs) của một lệnh moveTo tại chỗ (chuột không nhảy)"""
+    import pyautogui
+    x, y = pyautogui.position()
+    start = time.perf_counter_ns()
+    for _ in range(count):
+        backend.moveTo(x, y)
+    return (time.perf_counter_ns() - start) / count / 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh độ trễ mỗi lệnh của các backend nhập liệu")
+    parser.add_argument('--count', type=int, default=200, help="Số lệnh moveTo đo cho mỗi backend")
+    args = parser.parse_args()
+
+    names = available_backends()
+    if not names:
+        print("❌ Không có backend nhập liệu nào dùng được (cần màn hình)")
+        return 1
+
+    print(f"🎮 Backend dùng được: {', '.join(names)}")
+    for name in names:
+        latency = measure_latency(create_backend(name), args.count)
+        print(f"   {name:<10} {latency:>8.1f} µs/lệnh")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
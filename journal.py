@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Journal ghi nối tiếp (append-only) cho phiên ghi macro.
+
+Trong lúc ghi, một thread nền đọc các sự kiện mới trong EventStore và ghi
+chúng xuống file journal theo từng lô cố định (mỗi lô một dòng JSON, có
+fsync), nên nếu chương trình bị crash thì vẫn khôi phục được gần như toàn
+bộ bản ghi.
+
+Format file (JSON Lines):
+    {"journal": 1, "start_time": ..., "created_at": ...}     # header
+    {"events": [[code, timestamp_ns, x, y, arg1, arg2], ...]} # mỗi lô
+    {"end": {"end_time": ..., "duration_ns": ...}}           # khi dừng ghi
+
+Khôi phục:
+    python journal.py recover JOURNAL/recording_xxx.journal [-o macro.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+
+from event_store import EventStore, NS_PER_SECOND, STRING_ARG_CODES
+from macro_io import build_macro_data, write_macro
+
+JOURNAL_VERSION = 1
+
+
+class JournalWriter:
+    """
+    Thread nền ghi các sự kiện mới của `events` (EventStore) xuống journal.
+
+    Consumer của capture stage vẫn chỉ append vào EventStore; writer tự theo
+    dõi số sự kiện đã ghi và ghi phần mới theo lô `batch_size` sự kiện mỗi
+    `flush_interval` giây.
+    """
+
+    def __init__(self, path, events, start_time=None, batch_size=256, flush_interval=0.5):
+        self.path = path
+        self.events = events
+        self.start_time = start_time
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.written = 0
+        self.batches = 0
+
+        self._file = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Tạo file journal, ghi header và bắt đầu thread ghi. Không bao giờ ghi
+        đè journal có sẵn: nếu `path` đã tồn tại thì thêm hậu tố _1, _2...
+        (`path` được cập nhật theo tên thực tế).
+        """
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self._file = self._open_new_file()
+        self._write_line({
+            'journal': JOURNAL_VERSION,
+            'start_time': self.start_time,
+            'created_at': datetime.now().isoformat()
+        })
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    def _open_new_file(self):
+        base, extension = os.path.splitext(self.path)
+        suffix = 0
+        while True:
+            try:
+                return open(self.path, 'x', encoding='utf-8')
+            except FileExistsError:
+                suffix += 1
+                self.path = f"{base}_{suffix}{extension}"
+
+    def close(self, end_time=None, duration_ns=None):
+        """Ghi nốt các sự kiện còn lại, ghi dòng kết thúc và đóng file"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+        if self._file:
+            self._write_pending()
+            self._write_line({'end': {'end_time': end_time, 'duration_ns': duration_ns}})
+            self._file.close()
+            self._file = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self._write_pending()
+
+    def _write_line(self, obj):
+        self._file.write(json.dumps(obj, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _write_pending(self):
+        events = self.events
+        end = len(events)
+        while self.written < end:
+            batch_end = min(self.written + self.batch_size, end)
+            rows = [_encode_row(events, i) for i in range(self.written, batch_end)]
+            self._write_line({'events': rows})
+            self.written = batch_end
+            self.batches += 1
+
+
+def _encode_row(events, i):
+    code = events.types[i]
+    arg1 = events.arg1[i]
+    if code in STRING_ARG_CODES:
+        arg1 = events.string(arg1)
+    return [code, events.timestamps[i], events.xs[i], events.ys[i], arg1, events.arg2[i]]
+
+
+def read_journal(path):
+    """
+    Đọc journal (kể cả journal dở dang do crash). Trả về
+    (header, EventStore, end_info hoặc None). Dòng cuối bị cắt ngang được bỏ qua.
+    """
+    header = {}
+    end_info = None
+    events = EventStore()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Partial line written when the process died
+                break
+
+            if line_number == 0:
+                header = entry
+                continue
+            if 'end' in entry:
+                end_info = entry['end']
+                break
+
+            for code, timestamp_ns, x, y, arg1, arg2 in entry.get('events', []):
+                if code in STRING_ARG_CODES:
+                    arg1 = events.intern(arg1)
+                events.append_raw(code, timestamp_ns, x, y, arg1, arg2)
+
+    return header, events, end_info
+
+
+def recover_journal(path, output_file):
+    """Dựng lại file macro từ journal. Trả về số sự kiện khôi phục được."""
+    header, events, end_info = read_journal(path)
+    if not events:
+        return 0
+
+    end_info = end_info or {}
+    duration_ns = end_info.get('duration_ns')
+    data = build_macro_data(
+        events,
+        start_time=header.get('start_time'),
+        end_time=end_info.get('end_time'),
+        actual_duration=duration_ns / NS_PER_SECOND if duration_ns else None
+    )
+    write_macro(output_file, data)
+    return len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Khôi phục macro từ journal")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    recover = subparsers.add_parser('recover', help="Dựng lại macro từ file journal")
+    recover.add_argument('journal', help="File .journal")
+    recover.add_argument('-o', '--output', help="File macro kết quả (mặc định: <tên>.json)")
+    args = parser.parse_args()
+
+    output = args.output or f"{os.path.splitext(args.journal)[0]}.json"
+    try:
+        count = recover_journal(args.journal, output)
+    except FileNotFoundError:
+        print(f"❌ Không tìm thấy file: {args.journal}")
+        return 1
+    except Exception as e:
+        print(f"❌ Lỗi khôi phục journal: {e}")
+        return 1
+
+    if not count:
+        print("❌ Journal không có sự kiện nào!")
+        return 1
+    print(f"🩹 Đã khôi phục {count} sự kiện vào {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
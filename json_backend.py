@@ -0,0 +1,131 @@
+"""
+Backend JSON cho đọc/ghi file macro.
+
+Dùng thư viện JSON nhanh nếu đã cài (orjson > msgspec > ujson), nếu không
+thì dùng `json` của thư viện chuẩn. Có thể chọn backend bằng biến môi
+trường MACRO_JSON_BACKEND (orjson, msgspec, ujson, json) hoặc `set_backend()`.
+
+Mọi backend đều làm việc với bytes UTF-8: `dumps(obj, indent)` trả về bytes
+(indent=True: thụt lề 2 khoảng trắng, False: compact) và `loads(data)`.
+`loads` raise ValueError khi JSON lỗi, với mọi backend.
+"""
+
+import json
+import os
+
+BACKEND_NAMES = ('orjson', 'msgspec', 'ujson', 'json')
+
+
+class JsonBackend:
+    def __init__(self, name, dumps, loads):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+    def __repr__(self):
+        return f"JsonBackend({self.name!r})"
+
+
+def _stdlib_backend():
+    def dumps(obj, indent=True):
+        if indent:
+            text = json.dumps(obj, indent=2, ensure_ascii=False)
+        else:
+            text = json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+        return text.encode('utf-8')
+
+    return JsonBackend('json', dumps, json.loads)
+
+
+def _orjson_backend():
+    import orjson
+
+    def dumps(obj, indent=True):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+
+    return JsonBackend('orjson', dumps, orjson.loads)
+
+
+def _msgspec_backend():
+    import msgspec
+
+    encoder = msgspec.json.Encoder()
+    decoder = msgspec.json.Decoder()
+
+    def dumps(obj, indent=True):
+        data = encoder.encode(obj)
+        return msgspec.json.format(data, indent=2) if indent else data
+
+    def loads(data):
+        # msgspec.DecodeError is not a ValueError; callers catch ValueError
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+
+    return JsonBackend('msgspec', dumps, loads)
+
+
+def _ujson_backend():
+    import ujson
+
+    def dumps(obj, indent=True):
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False,
+                           indent=2 if indent else 0).encode('utf-8')
+
+    return JsonBackend('ujson', dumps, ujson.loads)
+
+
+_FACTORIES = {
+    'orjson': _orjson_backend,
+    'msgspec': _msgspec_backend,
+    'ujson': _ujson_backend,
+    'json': _stdlib_backend,
+}
+
+_backends = {}
+_current = None
+
+
+def load_backend(name):
+    """Tạo backend theo tên. Raise ImportError nếu thư viện chưa được cài."""
+    if name not in _FACTORIES:
+        raise ValueError(f"Backend JSON không hỗ trợ: {name} (chọn: {', '.join(BACKEND_NAMES)})")
+    backend = _backends.get(name)
+    if backend is None:
+        backend = _backends[name] = _FACTORIES[name]()
+    return backend
+
+
+def available_backends():
+    """Tên các backend dùng được trên máy này (nhanh nhất trước)"""
+    names = []
+    for name in BACKEND_NAMES:
+        try:
+            load_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend():
+    """Backend đang dùng (tự chọn lần đầu: MACRO_JSON_BACKEND hoặc backend nhanh nhất)"""
+    global _current
+    if _current is None:
+        requested = os.environ.get('MACRO_JSON_BACKEND')
+        if requested:
+            try:
+                _current = load_backend(requested)
+            except (ImportError, ValueError):
+                print(f"⚠️ Không dùng được backend JSON '{requested}', tự chọn backend khác")
+        if _current is None:
+            _current = load_backend(available_backends()[0])
+    return _current
+
+
+def set_backend(name):
+    """Chọn backend JSON theo tên; trả về backend đã chọn"""
+    global _current
+    _current = load_backend(name)
+    return _current
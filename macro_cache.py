@@ -0,0 +1,113 @@
+"""
+Cache macro đã parse dùng chung trong process (LRU giới hạn theo byte).
+
+GUI tải cùng một macro cho slot chính và hai slot phát xen kẽ A/B; thay vì
+parse lại file và copy danh sách sự kiện mỗi lần, các slot nhận cùng một
+đối tượng `CachedMacro` với EventStore đã freeze (chỉ đọc). Một entry bị
+bỏ khi file thay đổi (mtime/kích thước khác) hoặc khi tổng dung lượng vượt
+`max_bytes` (bỏ entry ít dùng gần đây nhất trước).
+"""
+
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from macro_io import read_macro
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# header: dict macro không có 'events'; events: EventStore đã freeze
+CachedMacro = namedtuple('CachedMacro', 'path header events nbytes mtime_ns size')
+
+
+def _macro_nbytes(events):
+    """Dung lượng ước tính của macro trong bộ nhớ (byte)"""
+    return events.nbytes() + sum(len(value) for value in events.strings if value) + 1024
+
+
+class MacroCache:
+    """LRU các macro đã parse, khóa là đường dẫn tuyệt đối"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, filename):
+        """
+        Trả về CachedMacro của file (parse nếu chưa có hoặc file đã đổi).
+        Raise FileNotFoundError / ValueError như read_macro.
+        """
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+
+        # Parse outside the lock so other slots are not blocked by a big file
+        data = read_macro(path)
+        events = data.pop('events').freeze()
+        entry = CachedMacro(path, data, events, _macro_nbytes(events), stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            self.misses += 1
+            self._remove(path)
+            self._entries[path] = entry
+            self.total_bytes += entry.nbytes
+            # Evict least recently used entries, but always keep the new one
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.nbytes
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, filename):
+        """Bỏ file khỏi cache (ví dụ sau khi ghi đè file)"""
+        with self._lock:
+            self._remove(os.path.abspath(filename))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _remove(self, path):
+        entry = self._entries.pop(path, None)
+        if entry:
+            self.total_bytes -= entry.nbytes
+
+    def stats(self):
+        """Thống kê cache: số entry, dung lượng, hit/miss/eviction"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, filename):
+        return os.path.abspath(filename) in self._entries
+
+
+# Cache dùng chung cho cả process (GUI, console)
+macro_cache = MacroCache()
+
+
+def get_macro(filename):
+    """Lấy macro từ cache dùng chung của process"""
+    return macro_cache.get(filename)
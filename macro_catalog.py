@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Danh mục (catalog) cho thư mục macro như SCRIPT/.
+
+Thông tin header của mỗi file (số sự kiện, thời lượng, phân loại sự kiện,
+ngày tạo) được cache trong file index `.macro_catalog.json` đặt trong thư
+mục, với khóa là đường dẫn + mtime + kích thước. Khi làm mới, chỉ các file
+mới hoặc đã thay đổi mới được đọc lại (và chỉ đọc phần header, không parse
+mảng sự kiện), nên liệt kê cả trăm file gần như tức thì.
+
+Sử dụng:
+    python macro_catalog.py SCRIPT                 # liệt kê theo tên
+    python macro_catalog.py SCRIPT --sort events --reverse
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from atomic_file import atomic_write
+from macro_io import read_macro, read_macro_header
+
+CATALOG_VERSION = 1
+INDEX_FILENAME = '.macro_catalog.json'
+MACRO_EXTENSIONS = ('.json', '.mrb', '.mrz')
+
+# Khóa sắp xếp -> hàm lấy giá trị từ entry
+SORT_KEYS = {
+    'name': lambda entry: entry['name'].lower(),
+    'events': lambda entry: entry.get('total_events') or 0,
+    'duration': lambda entry: entry.get('actual_duration') or 0,
+    'created': lambda entry: entry.get('created_at') or '',
+    'modified': lambda entry: entry['mtime_ns'],
+    'size': lambda entry: entry['size'],
+}
+
+
+def _entry_from_header(name, stat, header):
+    recording_info = header.get('recording_info') or {}
+    total_events = header.get('event_count')
+    if total_events is None:
+        total_events = recording_info.get('total_events')
+    return {
+        'name': name,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'version': header.get('version'),
+        'created_at': header.get('created_at'),
+        'total_events': total_events,
+        'actual_duration': recording_info.get('actual_duration', header.get('duration')),
+        'event_counts': header.get('event_counts'),
+    }
+
+
+def read_catalog_entry(path, stat=None):
+    """Đọc thông tin catalog của một file macro (chỉ header nếu có thể)"""
+    stat = stat or os.stat(path)
+    name = os.path.basename(path)
+    try:
+        header = read_macro_header(path)
+        if 'recording_info' not in header:
+            # Old format files keep their metadata after the events array;
+            # parse them once, the result is cached like any other entry
+            data = read_macro(path)
+            events = data.pop('events')
+            header = dict(data, event_count=len(events), event_counts=events.stats.event_counts())
+            header.setdefault('duration', events.stats.duration)
+        return _entry_from_header(name, stat, header)
+    except Exception as e:
+        entry = _entry_from_header(name, stat, {})
+        entry['error'] = str(e)
+        return entry
+
+
+class MacroCatalog:
+    """Catalog của một thư mục macro, lưu cache trong `<folder>/.macro_catalog.json`"""
+
+    def __init__(self, folder, index_file=None):
+        self.folder = folder
+        self.index_file = index_file or os.path.join(folder, INDEX_FILENAME)
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """Nạp index đã lưu (bỏ qua nếu chưa có hoặc bị hỏng)"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == CATALOG_VERSION:
+                self.entries = {entry['name']: entry for entry in index.get('entries', [])}
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        index = {'version': CATALOG_VERSION, 'entries': list(self.entries.values())}
+        with atomic_write(self.index_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+
+    def refresh(self):
+        """
+        Đồng bộ catalog với thư mục: chỉ đọc lại file mới/đã đổi (so mtime +
+        kích thước), bỏ file đã xóa. Trả về (số file đọc lại, số file bị bỏ).
+        """
+        seen = set()
+        updated = 0
+        with os.scandir(self.folder) as it:
+            for item in it:
+                name = item.name
+                if name.startswith('.') or not name.lower().endswith(MACRO_EXTENSIONS):
+                    continue
+                if not item.is_file():
+                    continue
+
+                seen.add(name)
+                stat = item.stat()
+                entry = self.entries.get(name)
+                if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                    continue
+                self.entries[name] = read_catalog_entry(item.path, stat)
+                updated += 1
+
+        removed = [name for name in self.entries if name not in seen]
+        for name in removed:
+            del self.entries[name]
+
+        if updated or removed:
+            self.save()
+        return updated, len(removed)
+
+    def list_entries(self, sort_by='name', reverse=False):
+        """Danh sách entry đã sắp xếp (file không đọc được có key 'error')"""
+        return sorted(self.entries.values(), key=SORT_KEYS[sort_by], reverse=reverse)
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '-'
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes)}:{seconds:04.1f}" if minutes else f"{seconds:.1f}s"
+
+
+def print_catalog(entries):
+    """In bảng catalog ra console"""
+    print(f"{'File':<32} {'Sự kiện':>9} {'Thời lượng':>11} {'Ngày tạo':<17} {'Phân loại'}")
+    print("─" * 100)
+    for entry in entries:
+        if 'error' in entry:
+            print(f"{entry['name']:<32} ⚠️ không đọc được: {entry['error']}")
+            continue
+        total = entry['total_events']
+        created = (entry['created_at'] or '-')[:16].replace('T', ' ')
+        counts = ', '.join(f"{name}: {count}" for name, count in (entry['event_counts'] or {}).items())
+        print(f"{entry['name']:<32} {total if total is not None else '-':>9} "
+              f"{format_duration(entry['actual_duration']):>11} {created:<17} {counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Liệt kê thư viện macro")
+    parser.add_argument('folder', nargs='?', default='SCRIPT', help="Thư mục macro (mặc định: SCRIPT)")
+    parser.add_argument('-s', '--sort', choices=list(SORT_KEYS), default='name', help="Sắp xếp theo")
+    parser.add_argument('-r', '--reverse', action='store_true', help="Sắp xếp giảm dần")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        print(f"❌ Không tìm thấy thư mục: {args.folder}")
+        return 1
+
+    catalog = MacroCatalog(args.folder)
+    updated, removed = catalog.refresh()
+    entries = catalog.list_entries(args.sort, args.reverse)
+    print_catalog(entries)
+    print(f"\n📚 {len(entries)} macro trong {args.folder} (đọc lại {updated}, bỏ {removed})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
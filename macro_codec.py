@@ -0,0 +1,295 @@
+"""
+Mã hóa macro nén (.mrz): delta + zigzag varint, tùy chọn bọc zlib/lzma.
+
+Các sự kiện liên tiếp chỉ cách nhau vài ms và vài pixel, nên thay vì lưu
+giá trị tuyệt đối, mỗi sự kiện lưu độ chênh lệch so với sự kiện trước dưới
+dạng varint (số nhỏ chỉ tốn 1 byte).
+
+Layout file:
+    b'MRZ1' | u8 kiểu nén (0 = không, 1 = zlib, 2 = lzma) | luồng dữ liệu
+    (đã nén) gồm: varint độ dài header | header JSON | các bản ghi
+
+Mỗi bản ghi:
+    u8 loại sự kiện | zigzag(delta timestamp_ns)
+    chuột (move/click/scroll): zigzag(dx) zigzag(dy) so với vị trí chuột trước
+    click/scroll/phím:         zigzag(arg1) zigzag(arg2)
+
+Sự kiện phím không lưu tọa độ (giống format JSON v2). Bộ giải mã đọc file
+theo từng khối nên có thể phát lại sự kiện trong lúc vẫn đang giải nén.
+"""
+
+import json
+import lzma
+import struct
+import zlib
+from array import array
+
+from atomic_file import atomic_write
+from event_store import (
+    COLUMN_LAYOUT, EventStore, RunningStats, EVENT_TYPES,
+    EVENT_MOUSE_MOVE, EVENT_MOUSE_CLICK, EVENT_MOUSE_SCROLL, NS_PER_SECOND
+)
+
+COMPRESSED_VERSION = '3.1'
+COMPRESSED_EXTENSION = '.mrz'
+COMPRESSED_MAGIC = b'MRZ1'
+COMPRESSIONS = ('none', 'zlib', 'lzma')
+
+# magic + compression id
+_PREFIX = struct.Struct('<4sB')
+
+# Worst case record: type byte + 5 varints of up to 10 bytes
+_MAX_RECORD_SIZE = 51
+_CHUNK_SIZE = 64 * 1024
+_ENCODE_BATCH = 4096
+
+
+def _write_varint(out, value):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_zigzag(out, value):
+    _write_varint(out, value << 1 if value >= 0 else ((-value) << 1) - 1)
+
+
+def _read_varint(buf, pos):
+    byte = buf[pos]
+    pos += 1
+    if byte < 0x80:
+        return byte, pos
+
+    value = byte & 0x7f
+    shift = 7
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _read_zigzag(buf, pos):
+    value, pos = _read_varint(buf, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def _make_compressor(compression, level=None):
+    if compression == 'zlib':
+        return zlib.compressobj(9 if level is None else level)
+    if compression == 'lzma':
+        return lzma.LZMACompressor(preset=6 if level is None else level)
+    return None
+
+
+def write_compressed_macro(filename, data, compression='zlib', level=None):
+    """Ghi dict macro theo format nén .mrz (`compression`: none, zlib, lzma)"""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Kiểu nén không hỗ trợ: {compression}")
+
+    events = data['events']
+    if not isinstance(events, EventStore):
+        events = EventStore.from_events(events)
+
+    header = {key: value for key, value in data.items() if key != 'events'}
+    header['version'] = COMPRESSED_VERSION
+    header['event_count'] = len(events)
+    header['strings'] = events.strings
+    header['running_stats'] = events.stats.to_dict()
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    compressor = _make_compressor(compression, level)
+    types, timestamps = events.types, events.timestamps
+    xs, ys, arg1, arg2 = events.xs, events.ys, events.arg1, events.arg2
+
+    with atomic_write(filename) as f:
+        f.write(_PREFIX.pack(COMPRESSED_MAGIC, COMPRESSIONS.index(compression)))
+
+        out = bytearray()
+        _write_varint(out, len(header_bytes))
+        out += header_bytes
+
+        last_ts = last_x = last_y = 0
+        for start in range(0, len(types), _ENCODE_BATCH):
+            for i in range(start, min(start + _ENCODE_BATCH, len(types))):
+                code = types[i]
+                out.append(code)
+                timestamp = timestamps[i]
+                _write_zigzag(out, timestamp - last_ts)
+                last_ts = timestamp
+
+                if code <= EVENT_MOUSE_SCROLL:
+                    x, y = xs[i], ys[i]
+                    _write_zigzag(out, x - last_x)
+                    _write_zigzag(out, y - last_y)
+                    last_x, last_y = x, y
+                if code != EVENT_MOUSE_MOVE:
+                    _write_zigzag(out, arg1[i])
+                    _write_zigzag(out, arg2[i])
+
+            f.write(compressor.compress(bytes(out)) if compressor else out)
+            out = bytearray()
+
+        if out:
+            f.write(compressor.compress(bytes(out)) if compressor else out)
+        if compressor:
+            f.write(compressor.flush())
+
+
+class CompressedMacroReader:
+    """
+    Đọc file .mrz theo luồng. Header được đọc ngay khi mở; `records()` và
+    `events()` giải mã dần từng khối nên bộ nhớ dùng không phụ thuộc số
+    sự kiện.
+    """
+
+    def __init__(self, filename, chunk_size=_CHUNK_SIZE):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self._file = open(filename, 'rb')
+        try:
+            prefix = self._file.read(_PREFIX.size)
+            if len(prefix) != _PREFIX.size:
+                raise ValueError(f"File macro nén không hợp lệ: {filename}")
+            magic, compression_id = _PREFIX.unpack(prefix)
+            if magic != COMPRESSED_MAGIC or compression_id >= len(COMPRESSIONS):
+                raise ValueError(f"File macro nén không hợp lệ: {filename}")
+
+            self.compression = COMPRESSIONS[compression_id]
+            if self.compression == 'zlib':
+                self._decompressor = zlib.decompressobj()
+            elif self.compression == 'lzma':
+                self._decompressor = lzma.LZMADecompressor()
+            else:
+                self._decompressor = None
+
+            self._buffer = b''
+            self._pos = 0
+            self._eof = False
+            self.header = self._read_header()
+        except Exception:
+            self._file.close()
+            raise
+
+        self.event_count = self.header.pop('event_count')
+        self.strings = self.header.pop('strings')
+        self.running_stats = self.header.pop('running_stats', None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def _fill(self, size):
+        """Giải nén thêm cho tới khi buffer còn ít nhất `size` byte (hoặc hết file)"""
+        while len(self._buffer) - self._pos < size and not self._eof:
+            chunk = self._file.read(self.chunk_size)
+            if chunk:
+                data = self._decompressor.decompress(chunk) if self._decompressor else chunk
+            else:
+                self._eof = True
+                data = self._decompressor.flush() if self.compression == 'zlib' else b''
+            self._buffer = self._buffer[self._pos:] + data
+            self._pos = 0
+
+    def _read_header(self):
+        self._fill(10)
+        try:
+            length, self._pos = _read_varint(self._buffer, self._pos)
+            self._fill(length)
+            end = self._pos + length
+            if end > len(self._buffer):
+                raise IndexError
+        except IndexError:
+            raise ValueError(f"File macro nén bị cắt cụt: {self.filename}")
+        header = json.loads(self._buffer[self._pos:end].decode('utf-8'))
+        self._pos = end
+        return header
+
+    def records(self):
+        """Sinh (code, timestamp_ns, x, y, arg1, arg2); arg1 của click/phím là id chuỗi"""
+        last_ts = last_x = last_y = 0
+        remaining = self.event_count
+
+        while remaining:
+            self._fill(_MAX_RECORD_SIZE)
+            buf = self._buffer
+            pos = self._pos
+            # Only parse records that are guaranteed to be complete
+            safe_end = len(buf) if self._eof else len(buf) - _MAX_RECORD_SIZE + 1
+            if pos >= len(buf):
+                raise ValueError(f"File macro nén bị cắt cụt: {self.filename}")
+
+            batch = []
+            try:
+                while remaining and pos < safe_end:
+                    code = buf[pos]
+                    delta, pos = _read_zigzag(buf, pos + 1)
+                    last_ts += delta
+                    x = y = a = b = 0
+                    if code <= EVENT_MOUSE_SCROLL:
+                        dx, pos = _read_zigzag(buf, pos)
+                        dy, pos = _read_zigzag(buf, pos)
+                        last_x += dx
+                        last_y += dy
+                        x, y = last_x, last_y
+                    if code != EVENT_MOUSE_MOVE:
+                        a, pos = _read_zigzag(buf, pos)
+                        b, pos = _read_zigzag(buf, pos)
+                    batch.append((code, last_ts, x, y, a, b))
+                    remaining -= 1
+            except IndexError:
+                raise ValueError(f"File macro nén bị cắt cụt: {self.filename}")
+            self._pos = pos
+
+            yield from batch
+
+    def events(self):
+        """Sinh các dict sự kiện (format JSON v2) theo luồng"""
+        strings = self.strings
+        for code, timestamp_ns, x, y, a, b in self.records():
+            timestamp = timestamp_ns / NS_PER_SECOND
+            if code == EVENT_MOUSE_MOVE:
+                yield {'type': 'mouse_move', 'timestamp': timestamp, 'x': x, 'y': y}
+            elif code == EVENT_MOUSE_CLICK:
+                yield {'type': 'mouse_click', 'timestamp': timestamp, 'x': x, 'y': y,
+                       'button': strings[a] if a >= 0 else None, 'pressed': bool(b)}
+            elif code == EVENT_MOUSE_SCROLL:
+                yield {'type': 'mouse_scroll', 'timestamp': timestamp, 'x': x, 'y': y,
+                       'dx': a, 'dy': b}
+            else:
+                yield {'type': EVENT_TYPES[code], 'timestamp': timestamp,
+                       'key': strings[a] if a >= 0 else None}
+
+
+def read_compressed_macro(filename):
+    """Đọc toàn bộ file .mrz thành dict macro với data['events'] là EventStore"""
+    with CompressedMacroReader(filename) as reader:
+        columns = {name: array(typecode) for name, typecode in COLUMN_LAYOUT}
+        timestamps, types = columns['timestamps'], columns['types']
+        xs, ys, arg1, arg2 = columns['xs'], columns['ys'], columns['arg1'], columns['arg2']
+        for code, timestamp_ns, x, y, a, b in reader.records():
+            types.append(code)
+            timestamps.append(timestamp_ns)
+            xs.append(x)
+            ys.append(y)
+            arg1.append(a)
+            arg2.append(b)
+
+        stats = RunningStats.from_dict(reader.running_stats) if reader.running_stats else None
+        data = reader.header
+        data['events'] = EventStore.from_columns(columns, reader.strings, stats)
+    return data
+
+
+def iter_compressed_events(filename):
+    """Sinh các dict sự kiện của file .mrz mà không nạp toàn bộ vào bộ nhớ"""
+    with CompressedMacroReader(filename) as reader:
+        yield from reader.events()
@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+"""
+Đọc/ghi file macro độc lập với MacroRecorder.
+
+Module này không import pynput/pyautogui nên có thể dùng cho các công cụ
+xử lý macro offline (simplify, convert...) trên máy không có màn hình.
+
+Các format:
+    v2 (.json)  JSON dễ đọc, mỗi sự kiện là một object
+    v3 (.mrb)   nhị phân, mở bằng mmap; các cột của EventStore trỏ thẳng
+                vào file nên không tạo object Python cho từng sự kiện
+    .mrz        nén delta + varint (+ zlib/lzma), đọc theo luồng
+                (xem macro_codec.py)
+
+Layout file v3 (little-endian):
+    b'MRB3' | u32 độ dài header | header JSON (recording_info, timing_stats,
+    event_counts, bảng chuỗi, ...) đệm khoảng trắng tới bội số của 8 |
+    các cột timestamps (int64), xs, ys, arg1, arg2 (int32), types (uint8)
+
+Chuyển đổi:
+    python macro_io.py convert macro.json macro.mrb
+    python macro_io.py convert macro.mrb macro.json
+    python macro_io.py convert macro.json macro.mrz --compression lzma
+    python macro_io.py convert macro.json macro_compact.json --compact
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import weakref
+from array import array
+from datetime import datetime
+
+from atomic_file import atomic_write
+from event_store import COLUMN_LAYOUT, EventStore, RunningStats
+from json_backend import BACKEND_NAMES, get_backend, set_backend
+from macro_codec import (
+    COMPRESSED_EXTENSION, COMPRESSED_MAGIC, COMPRESSIONS, CompressedMacroReader,
+    read_compressed_macro, write_compressed_macro
+)
+
+MACRO_VERSION = '2.0'
+BINARY_VERSION = '3.0'
+BINARY_EXTENSION = '.mrb'
+BINARY_MAGIC = b'MRB3'
+
+# magic + header length
+_PREFIX = struct.Struct('<4sI')
+
+_JSON_CHUNK_SIZE = 1 << 20
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DELIMITERS = frozenset(',:]} \t\n\r')
+
+
+def build_macro_data(events, start_time=None, end_time=None, actual_duration=None,
+                     smooth_factor=1.0, min_delay=0.01, replay_options=None):
+    """
+    Tạo dict macro format v2 (header + events) từ EventStore.
+
+    `actual_duration` là thời lượng ghi thực (giây); nếu không có thì dùng
+    timestamp của sự kiện cuối cùng. `replay_options` (tùy chọn phát lại
+    riêng của macro, xem replay_plan.DEFAULT_REPLAY_OPTIONS) được lưu vào
+    header nếu có.
+    """
+    # Thống kê đã được EventStore cộng dồn sẵn (O(1))
+    stats = events.stats
+    duration = stats.duration
+    actual_duration = actual_duration or duration
+    avg_delay = stats.average_delay
+
+    data = {
+        'created_at': datetime.now().isoformat(),
+        'version': MACRO_VERSION,
+        'recording_info': {
+            'start_time': start_time,
+            'end_time': end_time,
+            'actual_duration': actual_duration,
+            'event_duration': duration,
+            'total_events': len(events),
+            'events_per_second': len(events) / actual_duration if actual_duration > 0 else 0,
+            'pointer_bounds': stats.pointer_bounds()
+        },
+        'timing_stats': {
+            'average_delay': avg_delay,
+            'min_delay': stats.min_delay,
+            'max_delay': stats.max_delay,
+            'delay_stddev': stats.delay_stddev,
+            'smooth_factor': smooth_factor,
+            'recommended_min_delay': max(min_delay, avg_delay * 0.1)
+        },
+        'event_counts': stats.event_counts(),
+        'events': events
+    }
+    if replay_options:
+        data['replay_options'] = dict(replay_options)
+    return data
+
+
+def is_binary_file(filename):
+    """True nếu tên file có đuôi của format nhị phân v3"""
+    return os.path.splitext(filename)[1].lower() == BINARY_EXTENSION
+
+
+def is_compressed_file(filename):
+    """True nếu tên file có đuôi của format nén delta/varint"""
+    return os.path.splitext(filename)[1].lower() == COMPRESSED_EXTENSION
+
+
+def write_macro(filename, data, compression='zlib', compact=False):
+    """
+    Ghi dict macro ra file (events có thể là EventStore hoặc list).
+    File đuôi .mrb được ghi theo format nhị phân v3, đuôi .mrz theo format
+    nén (`compression`: none, zlib, lzma), còn lại là JSON v2 (thụt lề,
+    hoặc viết liền một dòng nếu `compact`) qua backend JSON đang chọn.
+    Mọi format đều ghi nguyên tử (file tạm + fsync + đổi tên), nên lỗi giữa
+    chừng không làm hỏng file cũ. EventStore đang map file đích (.mrb đã
+    tải) được tách khỏi file trước khi ghi.
+    """
+    release_mapped(filename)
+    if is_binary_file(filename):
+        write_binary_macro(filename, data)
+        return
+    if is_compressed_file(filename):
+        write_compressed_macro(filename, data, compression)
+        return
+
+    events = data['events']
+    if isinstance(events, EventStore):
+        data = dict(data, events=events.to_list())
+    data = dict(data, version=MACRO_VERSION)
+
+    payload = get_backend().dumps(data, indent=not compact)
+    with atomic_write(filename) as f:
+        f.write(payload)
+
+
+def read_macro(filename):
+    """
+    Đọc file macro (JSON v2, nhị phân v3 hoặc .mrz, nhận dạng theo nội
+    dung). Trả về dict macro với data['events'] là EventStore.
+    Raise FileNotFoundError / ValueError (JSON lỗi, với mọi backend).
+    """
+    magic = _read_magic(filename)
+    if magic == BINARY_MAGIC:
+        return read_binary_macro(filename)
+    if magic == COMPRESSED_MAGIC:
+        return read_compressed_macro(filename)
+
+    with open(filename, 'rb') as f:
+        data = get_backend().loads(f.read())
+
+    data['events'] = EventStore.from_events(data['events'])
+    return data
+
+
+def open_macro_stream(filename):
+    """
+    Mở file macro để phát lại theo luồng. Trả về (header, iterator dict sự
+    kiện); với file JSON và .mrz các sự kiện được parse/giải mã dần trong
+    lúc phát nên bộ nhớ dùng không phụ thuộc kích thước file.
+    header['event_count'] là số sự kiện nếu biết trước, hoặc None.
+    """
+    magic = _read_magic(filename)
+    if magic == COMPRESSED_MAGIC:
+        reader = CompressedMacroReader(filename)
+        header = dict(reader.header, event_count=reader.event_count)
+        return header, _close_after(reader, reader.events())
+
+    if magic == BINARY_MAGIC:
+        data = read_binary_macro(filename)
+        events = data.pop('events')
+        data['event_count'] = len(events)
+        return data, iter(events)
+
+    reader = JsonMacroStream(filename)
+    header = dict(reader.header)
+    header['event_count'] = header.get('recording_info', {}).get('total_events')
+    return header, _close_after(reader, reader.events())
+
+
+def read_macro_header(filename):
+    """
+    Chỉ đọc phần header của file macro (không parse mảng sự kiện).
+    Trả về dict header (recording_info, timing_stats, event_counts...)
+    với 'event_count' là số sự kiện nếu biết, hoặc None.
+    """
+    magic = _read_magic(filename)
+    if magic == BINARY_MAGIC:
+        with open(filename, 'rb') as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) != _PREFIX.size:
+                raise ValueError(f"File macro v3 không hợp lệ: {filename}")
+            _, header_length = _PREFIX.unpack(prefix)
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        header.pop('strings', None)
+        header.pop('running_stats', None)
+        return header
+
+    if magic == COMPRESSED_MAGIC:
+        with CompressedMacroReader(filename) as reader:
+            return dict(reader.header, event_count=reader.event_count)
+
+    with JsonMacroStream(filename) as reader:
+        header = dict(reader.header)
+    header['event_count'] = header.get('recording_info', {}).get('total_events')
+    return header
+
+
+class JsonMacroStream:
+    """
+    Đọc file macro JSON theo luồng: các trường đứng trước mảng `events`
+    (version, recording_info, timing_stats...) được parse ngay khi mở,
+    sau đó `events()` parse dần từng phần tử của mảng theo từng khối
+    `chunk_size` ký tự. Các trường đứng sau mảng `events` được thêm vào
+    `header` khi đọc xong mảng.
+    """
+
+    def __init__(self, filename, chunk_size=_JSON_CHUNK_SIZE):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.header = {}
+        self._decoder = json.JSONDecoder()
+        self._file = open(filename, 'r', encoding='utf-8')
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._has_events = False
+        try:
+            self._expect('{')
+            self._read_members()
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def _read_more(self):
+        """Đọc thêm một khối vào buffer, trả về False nếu đã hết file"""
+        if self._eof:
+            return False
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        """Ký tự khác khoảng trắng tiếp theo (không tiêu thụ), '' nếu hết file"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read_more():
+                return ''
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"File macro JSON không hợp lệ (thiếu '{char}'): {self.filename}")
+        self._pos += 1
+
+    def _decode_value(self):
+        """Parse một giá trị JSON hoàn chỉnh, đọc thêm dữ liệu nếu cần"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # A number cut by the chunk boundary ("12" of "12.5") also decodes,
+                # so only accept values followed by a delimiter
+                if self._eof or (end < len(self._buffer) and self._buffer[end] in _DELIMITERS):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._read_more()
+
+    def _read_members(self):
+        """Parse các cặp key/value của object gốc tới mảng `events` hoặc hết object"""
+        while True:
+            char = self._peek()
+            if char == '}':
+                self._pos += 1
+                return
+            if char == ',':
+                self._pos += 1
+                continue
+
+            key = self._decode_value()
+            self._expect(':')
+            if key == 'events' and self._peek() == '[':
+                self._pos += 1
+                self._has_events = True
+                return
+            self.header[key] = self._decode_value()
+
+    def events(self):
+        """Sinh các dict sự kiện của mảng `events`"""
+        if not self._has_events:
+            return
+        self._has_events = False
+
+        decode = self._decoder.raw_decode
+        while True:
+            char = self._peek()
+            if char == ']':
+                self._pos += 1
+                break
+            if char == ',':
+                self._pos += 1
+                continue
+            if not char:
+                raise ValueError(f"File macro JSON bị cắt cụt: {self.filename}")
+
+            # Fast path: decode straight from the buffer; events are objects,
+            # so a successful decode is always complete
+            try:
+                event, self._pos = decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                event = self._decode_value()
+            yield event
+
+        self._read_members()
+
+
+def _close_after(reader, iterator):
+    try:
+        yield from iterator
+    finally:
+        reader.close()
+
+
+def _read_magic(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(BINARY_MAGIC))
+
+
+def write_binary_macro(filename, data):
+    """Ghi dict macro theo format nhị phân v3"""
+    events = data['events']
+    if not isinstance(events, EventStore):
+        events = EventStore.from_events(events)
+    elif events.read_only:
+        # Views (frozen or mapped store) become plain arrays for byteswap/tobytes
+        events = events.copy()
+
+    header = {key: value for key, value in data.items() if key != 'events'}
+    header['version'] = BINARY_VERSION
+    header['event_count'] = len(events)
+    header['strings'] = events.strings
+    header['running_stats'] = events.stats.to_dict()
+
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    # Pad with JSON whitespace so the columns start 8-byte aligned
+    header_bytes += b' ' * (-(_PREFIX.size + len(header_bytes)) % 8)
+
+    with atomic_write(filename) as f:
+        f.write(_PREFIX.pack(BINARY_MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for name, _ in COLUMN_LAYOUT:
+            column = getattr(events, name)
+            if sys.byteorder != 'little':
+                column = array(column.typecode, column)
+                column.byteswap()
+            f.write(column.tobytes())
+
+
+class MappedFile:
+    """mmap chỉ đọc của một file v3; `close()` bỏ view gốc rồi đóng mmap"""
+
+    def __init__(self, path, buffer):
+        self.path = path
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+
+    def close(self):
+        self.view.release()
+        try:
+            self.buffer.close()
+        except BufferError:
+            # Some view we do not own still points into the file; the map is
+            # closed when that view is garbage collected
+            pass
+
+
+# EventStore đang trỏ vào file mmap (để bỏ map trước khi ghi đè file đó)
+_mapped_stores = weakref.WeakSet()
+_mapped_lock = threading.Lock()
+
+
+def _mapping_key(filename):
+    return os.path.normcase(os.path.abspath(filename))
+
+
+def release_mapped(filename):
+    """
+    Tách mọi EventStore đang map `filename` khỏi file (EventStore.release),
+    gọi trước khi ghi đè/xóa file. Trả về số store đã tách.
+    """
+    key = _mapping_key(filename)
+    with _mapped_lock:
+        stores = [store for store in _mapped_stores if store.mapping is not None and store.mapping.path == key]
+        for store in stores:
+            store.release()
+            _mapped_stores.discard(store)
+    return len(stores)
+
+
+def read_binary_macro(filename):
+    """
+    Mở file v3 bằng mmap. Các cột của EventStore trả về là memoryview chỉ
+    đọc trỏ vào file (EventStore.read_only == True); dùng `events.copy()` nếu
+    cần sửa. Thống kê được nạp từ header nên không phải duyệt lại sự kiện.
+    write_macro tự tách các store khỏi file trước khi ghi đè nó.
+    """
+    with open(filename, 'rb') as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError(f"File macro rỗng: {filename}")
+    mapping = MappedFile(_mapping_key(filename), buffer)
+
+    try:
+        data = _parse_binary(filename, mapping.view)
+    except BaseException:
+        mapping.close()
+        raise
+
+    events = data['events']
+    if sys.byteorder == 'little':
+        events.mapping = mapping
+        with _mapped_lock:
+            _mapped_stores.add(events)
+    else:
+        # Columns were byte-swapped into arrays, nothing points into the map
+        mapping.close()
+    return data
+
+
+def _parse_binary(filename, view):
+    """Dict macro từ nội dung file v3 (các cột là view của `view` nếu máy little-endian)"""
+    if len(view) < _PREFIX.size:
+        raise ValueError(f"File macro v3 không hợp lệ: {filename}")
+    magic, header_length = _PREFIX.unpack_from(view, 0)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"File macro v3 không hợp lệ: {filename}")
+
+    offset = _PREFIX.size + header_length
+    data = json.loads(bytes(view[_PREFIX.size:offset]).decode('utf-8'))
+    count = data.pop('event_count')
+    strings = data.pop('strings')
+    running_stats = data.pop('running_stats', None)
+
+    columns = {}
+    for name, typecode in COLUMN_LAYOUT:
+        size = array(typecode).itemsize * count
+        raw = view[offset:offset + size]
+        if len(raw) != size:
+            raise ValueError(f"File macro v3 bị cắt cụt: {filename}")
+        if sys.byteorder == 'little':
+            columns[name] = raw.cast(typecode)
+        else:
+            column = array(typecode)
+            column.frombytes(raw)
+            column.byteswap()
+            columns[name] = column
+        offset += size
+
+    stats = RunningStats.from_dict(running_stats) if running_stats else None
+    data['events'] = EventStore.from_columns(columns, strings, stats)
+    return data
+
+
+def convert_macro(input_file, output_file, compression='zlib', compact=False):
+    """Chuyển đổi qua lại giữa các format (.json, .mrb, .mrz). Trả về số sự kiện."""
+    data = read_macro(input_file)
+    write_macro(output_file, data, compression, compact)
+    return len(data['events'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Công cụ file macro")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert = subparsers.add_parser('convert', help="Chuyển đổi giữa JSON (v2), nhị phân (v3) và nén (.mrz)")
+    convert.add_argument('input', help="File macro nguồn (.json, .mrb hoặc .mrz)")
+    convert.add_argument('output', help="File kết quả (.mrb = nhị phân v3, .mrz = nén, còn lại = JSON v2)")
+    convert.add_argument('-c', '--compression', choices=COMPRESSIONS, default='zlib',
+                         help="Kiểu nén cho file .mrz (mặc định: zlib)")
+    convert.add_argument('--compact', action='store_true', help="Ghi JSON liền một dòng (không thụt lề)")
+    convert.add_argument('--json-backend', choices=BACKEND_NAMES,
+                         help="Backend JSON (mặc định: nhanh nhất đã cài)")
+    args = parser.parse_args()
+
+    try:
+        if args.json_backend:
+            set_backend(args.json_backend)
+        count = convert_macro(args.input, args.output, args.compression, args.compact)
+    except FileNotFoundError:
+        print(f"❌ Không tìm thấy file: {args.input}")
+        return 1
+    except Exception as e:
+        print(f"❌ Lỗi chuyển đổi macro: {e}")
+        return 1
+
+    before = os.path.getsize(args.input)
+    after = os.path.getsize(args.output)
+    print(f"✅ Đã chuyển {count} sự kiện: {args.input} → {args.output}")
+    print(f"   💾 Kích thước: {before:,} → {after:,} byte")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
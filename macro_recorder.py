@@ -1,4 +1,3 @@
-import json
 import time
 import threading
 import os
@@ -7,27 +6,71 @@ from pynput import mouse, keyboard
 from pynput.mouse import Button, Listener as MouseListener
 from pynput.keyboard import Key, Listener as KeyboardListener
 import pyautogui
+from capture import CaptureStage, MoveDecimator
+from macro_io import build_macro_data, open_macro_stream
+from macro_cache import get_macro, macro_cache
+from macro_saver import SaveJob, macro_saver
+from journal import JournalWriter
+from input_backends import DEFAULT_BACKEND, create_backend
+from replay_plan import (DEFAULT_REPLAY_OPTIONS, TYPING_MODES, ActionCompiler, TimelineIndex, TypingCoalescer,
+                         get_plan, iter_plan, steps_in_span)
+from resample import get_resampled
+from replay_scheduler import DeadlineScheduler, MoveCoalescer, run_plan
+from replay_control import PAUSED, ReplayController
+from precise_timer import DEFAULT_SPIN_BUDGET, PreciseTimer
+from event_store import (
+    EventStore, EVENT_MOUSE_MOVE, EVENT_MOUSE_CLICK, EVENT_MOUSE_SCROLL,
+    EVENT_KEY_PRESS, EVENT_KEY_RELEASE, NS_PER_SECOND
+)
 
 class MacroRecorder:
     def __init__(self):
         self.recording = False
-        self.replaying = False
-        self.events = []
+        # Replay state (running/paused/stopping) shared with hotkey and GUI threads
+        self.replay_control = ReplayController()
+        self.events = EventStore()
         self.start_time = None
         self.end_time = None
+        # Monotonic clock (perf_counter_ns) for event timestamps
+        self._start_ns = None
+        self._end_ns = None
         self.mouse_listener = None
         self.keyboard_listener = None
         self.screenshot_listener = None
         self.replay_listener = None
         self.screenshot_enabled = False
         
+        # Capture stage (ring buffer + consumer thread) while recording
+        self._capture = None
+        self._move_filter = None
+        self.capture_stats = {}
+        
+        # Capture-time mouse_move filter (0 = giữ tất cả)
+        self.move_min_distance = 0  # pixel
+        self.move_min_interval = 0.0  # giây
+        self.keep_moves_near_clicks = True
+        
+        # Append-only journal while recording (khôi phục khi crash)
+        self.journal_enabled = False
+        self.journal_folder = "JOURNAL"
+        self.journal_path = None
+        self._journal = None
+        
+        # File JSON viết liền một dòng (nhỏ hơn, ghi/đọc nhanh hơn) thay vì thụt lề
+        self.compact_json = False
+        
         # Screenshot folder
         self.screenshot_folder = "SCREENSHOT"
         self.create_screenshot_folder()
         
         # Replay settings
-        self.min_delay = 0.01  # Minimum delay between events (10ms)
+        self.min_delay = 0.01  # Minimum gap between injected events (10ms)
         self.smooth_factor = 1.0  # Smoothness factor for delays
+        self.spin_budget = DEFAULT_SPIN_BUDGET  # Final part of each wait spent spinning (0 = sleep only)
+        self.max_move_rate = None  # Move coalescing: None = off, 0 = only when behind, N = at most N moves/s
+        self.resample_rate = None  # Resample mouse paths to N points/s before replay (None = off)
+        self.replay_options = dict(DEFAULT_REPLAY_OPTIONS)  # Per-macro options, saved in the macro header
+        self.last_replay_report = None  # Timing/lateness of the last replay pass
         
         # Callback for when F9 is pressed (for save prompt)
         self.on_f9_callback = None
@@ -35,14 +78,92 @@ class MacroRecorder:
         # Auto type content for F7
         self.type_content = ""
         
-        # Modifier key tracking for proper key combinations
-        self._ctrl_pressed = False
-        self._shift_pressed = False
-        self._alt_pressed = False
+        # Backend phát chuột/phím (pyautogui, pynput, xtest...); MACRO_INPUT_BACKEND để chọn
+        backend_name = os.environ.get('MACRO_INPUT_BACKEND') or DEFAULT_BACKEND
+        try:
+            self.input_backend = create_backend(backend_name)
+        except Exception as e:
+            # A bad MACRO_INPUT_BACKEND or missing xtest/pynput must not stop the app
+            print(f"⚠️ Không dùng được backend nhập liệu '{backend_name}' "
+                  f"({type(e).__name__}: {e}), dùng {DEFAULT_BACKEND}")
+            self.input_backend = create_backend(DEFAULT_BACKEND)
+        
+        # Modifier key tracking for execute_event (replay plans track their own)
+        self._event_compiler = ActionCompiler(self.input_backend)
         
-        # Disable pyautogui fail-safe (optional, be careful!)
+        # Keep pyautogui fail-safe on (move the mouse to a corner to abort)
         pyautogui.FAILSAFE = True
-        pyautogui.PAUSE = 0.01  # Reduce default pause for smoother playback
+    
+    @property
+    def replaying(self):
+        """True khi đang phát lại (kể cả đang tạm dừng) và chưa bị yêu cầu dừng"""
+        return self.replay_control.active
+    
+    @property
+    def events(self):
+        """Sự kiện của macro hiện tại (EventStore dạng cột)"""
+        return self._events
+    
+    @events.setter
+    def events(self, events):
+        # Chấp nhận cả list các dict (format JSON) để tương thích code cũ
+        if not isinstance(events, EventStore):
+            events = EventStore.from_events(events)
+        self._events = events
+    
+    def set_move_filter(self, min_distance=0, min_interval=0.0, keep_near_clicks=True):
+        """Đặt bộ lọc mouse_move lúc ghi (khoảng cách pixel, khoảng thời gian giây)"""
+        self.move_min_distance = max(0, min_distance)
+        self.move_min_interval = max(0.0, min_interval)
+        self.keep_moves_near_clicks = keep_near_clicks
+        if self.move_min_distance or self.move_min_interval:
+            print(f"🎚️ Lọc mouse_move: ≥{self.move_min_distance}px, ≥{self.move_min_interval * 1000:.0f}ms")
+        else:
+            print("🎚️ Tắt lọc mouse_move (ghi tất cả)")
+    
+    def set_journal_enabled(self, enabled):
+        """Bật/tắt ghi journal (append-only) trong lúc ghi macro"""
+        self.journal_enabled = enabled
+        if enabled:
+            print(f"📓 Đã bật journal khi ghi (folder {self.journal_folder}/)")
+        else:
+            print("📓 Đã tắt journal khi ghi")
+    
+    def set_input_backend(self, name):
+        """Chọn backend phát chuột/phím theo tên (xem input_backends.BACKEND_NAMES)"""
+        try:
+            backend = create_backend(name)
+        except Exception as e:
+            print(f"❌ Không dùng được backend '{name}': {e}")
+            return False
+        self.input_backend = backend
+        self._event_compiler = ActionCompiler(backend)
+        print(f"🎮 Backend nhập liệu: {backend.name}")
+        return True
+    
+    def set_resample_rate(self, rate):
+        """Resample đường đi chuột về `rate` điểm/giây khi phát lại (None/0 = tắt)"""
+        self.resample_rate = rate or None
+        if self.resample_rate:
+            print(f"🖱️ Resample đường đi chuột khi phát: {self.resample_rate:g} điểm/giây")
+        else:
+            print("🖱️ Tắt resample đường đi chuột (phát đúng các mẫu đã ghi)")
+    
+    def set_typing_mode(self, mode, chunk=None):
+        """
+        Cách phát các đoạn gõ ký tự của macro hiện tại (lưu kèm macro):
+        'keys' từng phím, 'bulk' một lệnh write cho cả đoạn, 'paced' write
+        từng nhóm `chunk` ký tự.
+        """
+        if mode not in TYPING_MODES:
+            print(f"❌ Chế độ gõ không hỗ trợ: {mode}")
+            return False
+        self.replay_options['typing'] = mode
+        if chunk:
+            self.replay_options['typing_chunk'] = max(1, int(chunk))
+        detail = f", {self.replay_options['typing_chunk']} ký tự/lệnh" if mode == 'paced' else ""
+        print(f"⌨️ Phát đoạn gõ phím: {mode}{detail}")
+        return True
     
     def set_f9_callback(self, callback):
         """Đặt callback khi nhấn F9"""
@@ -60,8 +181,7 @@ class MacroRecorder:
             return
             
         try:
-            # Sử dụng pyautogui để gõ text
-            pyautogui.typewrite(self.type_content)
+            self.input_backend.write(self.type_content)
             print(f"✅ Đã gõ: '{self.type_content[:50]}{'...' if len(self.type_content) > 50 else ''}'")
         except Exception as e:
             print(f"❌ Lỗi khi gõ: {e}")
@@ -75,9 +195,31 @@ class MacroRecorder:
         print("Bắt đầu ghi lại hành động...")
         print("Nhấn F9 để dừng ghi")
         
-        self.recording = True
-        self.events = []
+        self.events = EventStore()
         self.start_time = time.time()
+        self._start_ns = time.perf_counter_ns()
+        self._end_ns = None
+        self.capture_stats = {}
+        
+        move_filter = MoveDecimator(self.move_min_distance,
+                                    round(self.move_min_interval * NS_PER_SECOND),
+                                    self.keep_moves_near_clicks)
+        self._move_filter = move_filter if move_filter.active else None
+        
+        if self.journal_enabled:
+            filename = f"recording_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.journal"
+            self._journal = JournalWriter(os.path.join(self.journal_folder, filename), self.events, self.start_time)
+            self._journal.start()
+            # The writer may have picked another name if this one was taken
+            self.journal_path = self._journal.path
+            print(f"📓 Journal: {self.journal_path}")
+        else:
+            self.journal_path = None
+        
+        # Consumer thread phải chạy trước khi listener bắt đầu đẩy bản ghi
+        self._capture = CaptureStage(self._consume_records)
+        self._capture.start()
+        self.recording = True
         
         # Tạo listeners cho mouse và keyboard
         self.mouse_listener = MouseListener(
@@ -101,63 +243,77 @@ class MacroRecorder:
             return
             
         print("Dừng ghi lại!")
+        self.stop_capture()
+            
+        # Print recording summary
+        duration = self.recording_duration()
+        if self.events and duration:
+            print(f"📊 Tóm tắt bản ghi:")
+            print(f"   ⏱️  Thời lượng: {duration:.2f} giây")
+            print(f"   📝 Sự kiện: {len(self.events)}")
+            print(f"   📈 Tần suất: {len(self.events)/duration:.1f} sự kiện/giây")
+        
+        if self.capture_stats:
+            stats = self.capture_stats
+            print(f"   🧵 Capture: max buffer {stats['max_depth']}/{stats['capacity']}, "
+                  f"bỏ {stats['dropped']}, callback TB {stats['avg_callback_us']:.1f}µs "
+                  f"(max {stats['max_callback_us']:.1f}µs)")
+            if 'moves_seen' in stats:
+                print(f"   🎚️  Lọc di chuyển: bỏ {stats['moves_dropped']}/{stats['moves_seen']} mouse_move")
+    
+    def stop_capture(self):
+        """Dừng listeners và đổ hết capture buffer vào self.events (không in tóm tắt)"""
         self.recording = False
         self.end_time = time.time()
+        self._end_ns = time.perf_counter_ns()
         
         if self.mouse_listener:
             self.mouse_listener.stop()
         if self.keyboard_listener:
             self.keyboard_listener.stop()
+        
+        if self._capture:
+            self._capture.stop()
+            self.capture_stats = self._capture.stats()
             
-        # Print recording summary
-        if self.events and self.start_time and self.end_time:
-            duration = self.end_time - self.start_time
-            print(f"📊 Tóm tắt bản ghi:")
-            print(f"   ⏱️  Thời lượng: {duration:.2f} giây")
-            print(f"   📝 Sự kiện: {len(self.events)}")
-            print(f"   📈 Tần suất: {len(self.events)/duration:.1f} sự kiện/giây")
+            move_filter = self._move_filter
+            if move_filter:
+                # Vị trí cuối cùng của con trỏ luôn được giữ
+                held = move_filter.flush()
+                if held:
+                    self._events.append_move(*held)
+                self.capture_stats['moves_seen'] = move_filter.seen
+                self.capture_stats['moves_dropped'] = move_filter.dropped
+                self._move_filter = None
+        
+        if self._journal:
+            self._journal.close(self.end_time, self._end_ns - self._start_ns)
+            self._journal = None
+    
+    def recording_duration(self):
+        """Thời lượng thực của lần ghi gần nhất (giây, theo đồng hồ đơn điệu)"""
+        if self._start_ns is None or self._end_ns is None:
+            return 0
+        return (self._end_ns - self._start_ns) / NS_PER_SECOND
     
     def on_mouse_move(self, x, y):
         """Ghi lại di chuyển chuột"""
-        if self.recording and self.start_time is not None:
-            timestamp = time.time() - self.start_time
-            self.events.append({
-                'type': 'mouse_move',
-                'timestamp': timestamp,
-                'x': x,
-                'y': y
-            })
+        if self.recording:
+            self._capture.mouse.push(EVENT_MOUSE_MOVE, x, y)
     
     def on_mouse_click(self, x, y, button, pressed):
         """Ghi lại click chuột"""
-        if self.recording and self.start_time is not None:
-            timestamp = time.time() - self.start_time
-            self.events.append({
-                'type': 'mouse_click',
-                'timestamp': timestamp,
-                'x': x,
-                'y': y,
-                'button': str(button),
-                'pressed': pressed
-            })
-            print(f"Click {'press' if pressed else 'release'}: {button} tại ({x}, {y})")
+        if self.recording:
+            self._capture.mouse.push(EVENT_MOUSE_CLICK, x, y, button, pressed)
     
     def on_mouse_scroll(self, x, y, dx, dy):
         """Ghi lại cuộn chuột"""
-        if self.recording and self.start_time is not None:
-            timestamp = time.time() - self.start_time
-            self.events.append({
-                'type': 'mouse_scroll',
-                'timestamp': timestamp,
-                'x': x,
-                'y': y,
-                'dx': dx,
-                'dy': dy
-            })
+        if self.recording:
+            self._capture.mouse.push(EVENT_MOUSE_SCROLL, x, y, dx, dy)
     
     def on_key_press(self, key):
         """Ghi lại nhấn phím"""
-        if self.recording and self.start_time is not None:
+        if self.recording:
             # Dừng ghi khi nhấn F9
             if key == keyboard.Key.f9:
                 if self.on_f9_callback:
@@ -166,86 +322,110 @@ class MacroRecorder:
                     self.stop_recording()
                 return
                 
-            timestamp = time.time() - self.start_time
-            try:
-                key_char = key.char
-            except AttributeError:
-                key_char = str(key)
-                
-            self.events.append({
-                'type': 'key_press',
-                'timestamp': timestamp,
-                'key': key_char
-            })
-            print(f"Key press: {key_char}")
+            self._capture.keyboard.push(EVENT_KEY_PRESS, 0, 0, key)
     
     def on_key_release(self, key):
         """Ghi lại thả phím"""
-        if self.recording and self.start_time is not None:
-            timestamp = time.time() - self.start_time
-            try:
-                key_char = key.char
-            except AttributeError:
-                key_char = str(key)
+        if self.recording:
+            self._capture.keyboard.push(EVENT_KEY_RELEASE, 0, 0, key)
+    
+    def _consume_records(self, records):
+        """Chuyển bản ghi capture vào kho sự kiện (chạy trên consumer thread)"""
+        events = self._events
+        move_filter = self._move_filter
+        start_ns = self._start_ns
+        for timestamp, code, x, y, a, b in records:
+            timestamp_ns = timestamp - start_ns
+            
+            if code == EVENT_MOUSE_MOVE:
+                if move_filter is None or move_filter.accept(timestamp_ns, x, y):
+                    events.append_move(timestamp_ns, x, y)
+                continue
+            
+            if move_filter is not None and code in (EVENT_MOUSE_CLICK, EVENT_MOUSE_SCROLL):
+                # Giữ vị trí ngay trước click/scroll
+                held = move_filter.before_click()
+                if held:
+                    events.append_move(*held)
+            
+            if code == EVENT_MOUSE_CLICK:
+                events.append_click(timestamp_ns, x, y, str(a), b)
+                print(f"Click {'press' if b else 'release'}: {a} tại ({x}, {y})")
+            elif code == EVENT_MOUSE_SCROLL:
+                events.append_scroll(timestamp_ns, x, y, a, b)
+            else:
+                try:
+                    key_char = a.char
+                except AttributeError:
+                    key_char = str(a)
                 
-            self.events.append({
-                'type': 'key_release',
-                'timestamp': timestamp,
-                'key': key_char
-            })
-    
-    def save_macro(self, filename):
-        """Lưu macro vào file"""
+                events.append_key(code, timestamp_ns, key_char)
+                if code == EVENT_KEY_PRESS:
+                    print(f"Key press: {key_char}")
+    
+    def save_macro(self, filename, background=False, callback=None):
+        """
+        Lưu macro vào file (ghi nguyên tử). Với `background=True` việc ghi
+        chạy trên thread nền của macro_saver và hàm trả về ngay; `callback(job)`
+        được gọi trên thread đó khi ghi xong. Trả về SaveJob (None nếu không
+        có sự kiện); khi lưu đồng bộ mà ghi lỗi thì lỗi đã được in và trả về
+        False.
+        """
         if not self.events:
             print("Không có sự kiện nào để lưu!")
-            return
+            return None
             
-        # Calculate timing statistics
-        duration = self.events[-1]['timestamp'] if self.events else 0
-        actual_duration = (self.end_time - self.start_time) if (self.end_time and self.start_time) else duration
-        
-        # Calculate delays between events
-        delays = []
-        for i in range(1, len(self.events)):
-            delay = self.events[i]['timestamp'] - self.events[i-1]['timestamp']
-            delays.append(delay)
-        
-        avg_delay = sum(delays) / len(delays) if delays else 0
-        min_delay = min(delays) if delays else 0
-        max_delay = max(delays) if delays else 0
-        
-        # Count event types
-        event_counts = {}
-        for event in self.events:
-            event_type = event['type']
-            event_counts[event_type] = event_counts.get(event_type, 0) + 1
-        
-        data = {
-            'created_at': datetime.now().isoformat(),
-            'version': '2.0',
-            'recording_info': {
-                'start_time': self.start_time,
-                'end_time': self.end_time,
-                'actual_duration': actual_duration,
-                'event_duration': duration,
-                'total_events': len(self.events),
-                'events_per_second': len(self.events) / actual_duration if actual_duration > 0 else 0
-            },
-            'timing_stats': {
-                'average_delay': avg_delay,
-                'min_delay': min_delay,
-                'max_delay': max_delay,
-                'smooth_factor': self.smooth_factor,
-                'recommended_min_delay': max(self.min_delay, avg_delay * 0.1)
-            },
-            'event_counts': event_counts,
-            'events': self.events
-        }
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        
-        print(f"💾 Đã lưu {len(self.events)} sự kiện vào {filename}")
+        data = build_macro_data(
+            self.events,
+            start_time=self.start_time,
+            end_time=self.end_time,
+            actual_duration=self.recording_duration(),
+            smooth_factor=self.smooth_factor,
+            min_delay=self.min_delay,
+            replay_options=self.replay_options if self.replay_options != DEFAULT_REPLAY_OPTIONS else None
+        )
+        journal_path = self.journal_path
+        # Drop the cached copy before writing; write_macro also detaches any
+        # loaded store still mapping the file so it can be replaced
+        macro_cache.invalidate(filename)
+        
+        def on_saved(job):
+            self._on_macro_saved(job, journal_path)
+            if callback:
+                callback(job)
+        
+        if background:
+            print(f"💾 Đang lưu nền {len(self.events)} sự kiện vào {filename}...")
+            return macro_saver.submit(filename, data, on_saved, compact=self.compact_json)
+        
+        job = SaveJob(filename, data, on_saved, compact=self.compact_json)
+        job.run()
+        return job if job.ok else False
+    
+    def _on_macro_saved(self, job, journal_path):
+        """In kết quả lưu, bỏ cache và journal khi file đã được ghi đầy đủ"""
+        if job.error:
+            # Keep the journal: it is the only complete copy of the recording
+            print(f"❌ Lỗi lưu macro {job.filename}: {job.error}")
+            return
+        
+        macro_cache.invalidate(job.filename)
+        
+        # Macro đã được lưu đầy đủ, journal của phiên ghi không còn cần nữa
+        if journal_path and os.path.exists(journal_path):
+            os.remove(journal_path)
+            print(f"📓 Đã hoàn tất journal: {journal_path}")
+        if self.journal_path == journal_path:
+            self.journal_path = None
+        
+        data = job.data
+        actual_duration = data['recording_info']['actual_duration']
+        timing_stats = data['timing_stats']
+        avg_delay = timing_stats['average_delay']
+        min_delay = timing_stats['min_delay']
+        max_delay = timing_stats['max_delay']
+        
+        print(f"💾 Đã lưu {len(data['events'])} sự kiện vào {job.filename} ({job.elapsed * 1000:.0f}ms)")
         print(f"📊 Thống kê:")
         print(f"   ⏱️  Thời lượng thực: {actual_duration:.2f}s")
         print(f"   📈 Delay trung bình: {avg_delay:.3f}s")
@@ -253,16 +433,25 @@ class MacroRecorder:
         print(f"   🐌 Delay tối đa: {max_delay:.3f}s")
     
     def load_macro(self, filename):
-        """Tải macro từ file"""
+        """Tải macro từ file (qua cache dùng chung, sự kiện chỉ đọc)"""
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            macro = get_macro(filename)
+            data = macro.header
             
-            self.events = data['events']
+            self.events = macro.events
+            # Biên dịch replay plan một lần; các lần phát/lặp sau dùng lại
+            get_plan(self.events, self.input_backend)
+            # Thời lượng ghi của phiên trước không còn áp dụng cho macro vừa tải
+            self._start_ns = None
+            self._end_ns = None
+            # Journal của phiên ghi trước được giữ lại trên đĩa để khôi phục
+            self.journal_path = None
+            # Tùy chọn phát lại là của từng macro
+            self.replay_options = dict(DEFAULT_REPLAY_OPTIONS, **(data.get('replay_options') or {}))
             
             # Handle both old and new format
-            if 'version' in data and data['version'] == '2.0':
-                # New format with detailed info
+            if 'recording_info' in data:
+                # New format (v2 JSON / v3 binary) with detailed info
                 recording_info = data.get('recording_info', {})
                 timing_stats = data.get('timing_stats', {})
                 event_counts = data.get('event_counts', {})
@@ -285,6 +474,9 @@ class MacroRecorder:
                     print(f"   🔍 Phân tích:")
                     for event_type, count in event_counts.items():
                         print(f"      {event_type}: {count}")
+                
+                if self.replay_options['typing'] != 'keys':
+                    print(f"   ⌨️  Phát đoạn gõ phím: {self.replay_options['typing']}")
                         
             else:
                 # Old format - backward compatibility
@@ -302,8 +494,15 @@ class MacroRecorder:
             print(f"❌ Lỗi khi tải file: {e}")
             return False
     
-    def replay_macro(self, speed_multiplier=1.0, enable_hotkey_stop=True, repeat_count=1):
-        """Phát lại macro với khả năng dừng bằng hotkey và lặp lại"""
+    def replay_macro(self, speed_multiplier=1.0, enable_hotkey_stop=True, repeat_count=1, max_move_rate=None,
+                     start_time=None, end_time=None, start_index=None):
+        """
+        Phát lại macro với khả năng dừng bằng hotkey và lặp lại.
+        `max_move_rate`: gộp mouse_move khi phát (xem MoveCoalescer; None =
+        dùng self.max_move_rate). `start_time`/`end_time` (giây tính từ đầu
+        macro) hoặc `start_index` (vị trí sự kiện) chỉ phát một đoạn; trạng
+        thái Ctrl/Shift/Alt tại điểm bắt đầu giống như khi phát từ đầu.
+        """
         if not self.events:
             print("❌ Không có macro nào để phát!")
             return False
@@ -312,19 +511,152 @@ class MacroRecorder:
             print("⚠️ Đang phát lại macro khác!")
             return False
         
-        print(f"▶️ Bắt đầu phát lại macro với {len(self.events)} sự kiện...")
+        span = index_range = None
+        if start_index is not None:
+            index_range = self._replay_range(start_index, end_time)
+            if index_range is None:
+                return False
+        elif start_time is not None or end_time is not None:
+            span = self._replay_span(start_time, end_time)
+            if span is None:
+                return False
+        
+        events = self.events
+        if self.resample_rate and index_range is not None:
+            # Resampling renumbers the events, so an index would point elsewhere
+            print("⚠️ Phát từ vị trí sự kiện không hỗ trợ resample, phát đúng các mẫu đã ghi")
+        elif self.resample_rate:
+            # Uniformly timed pointer paths; clicks, keys and their positions stay exact
+            events = get_resampled(events, self.resample_rate)
+            print(f"🖱️ Resample {self.resample_rate:g} điểm/giây: "
+                  f"{self.events.stats.count('mouse_move')} → {events.stats.count('mouse_move')} mouse_move")
+        total = len(events)
+        if index_range is not None:
+            first, last = index_range
+            total = last - first
+            print(f"⏩ Phát từ sự kiện {first} tới {last}")
+        elif span is not None:
+            first, last = TimelineIndex(events.timestamps).span(*span)
+            total = last - first
+            print(f"⏩ Phát đoạn {self._span_label(span)} (sự kiện {first}-{last})")
+        print(f"▶️ Bắt đầu phát lại macro với {total} sự kiện...")
+        return self._run_replay(lambda: events, total, speed_multiplier, enable_hotkey_stop, repeat_count,
+                                max_move_rate, span=span, index_range=index_range)
+    
+    def _replay_range(self, start_index, end_time=None):
+        """
+        Khoảng vị trí (đầu, cuối) — cuối không tính — cần phát của
+        self.events khi bắt đầu từ sự kiện `start_index`; in lỗi và trả về
+        None nếu không hợp lệ
+        """
+        if not 0 <= start_index < len(self.events):
+            print(f"❌ Vị trí sự kiện không hợp lệ: {start_index} (macro có {len(self.events)} sự kiện)")
+            return None
+        # The index is used as is: events sharing its timestamp but stored
+        # before it must not be replayed
+        end_ns = round(end_time * NS_PER_SECOND) if end_time is not None else None
+        last = TimelineIndex(self.events.timestamps).span(None, end_ns)[1]
+        if last <= start_index:
+            print("❌ Thời điểm kết thúc phải sau sự kiện bắt đầu!")
+            return None
+        return start_index, last
+    
+    def _replay_span(self, start_time=None, end_time=None):
+        """
+        Khoảng (start_ns, end_ns) cần phát của self.events (None = không giới
+        hạn); in lỗi và trả về None nếu không hợp lệ
+        """
+        start_ns = round(start_time * NS_PER_SECOND) if start_time is not None else None
+        end_ns = round(end_time * NS_PER_SECOND) if end_time is not None else None
+        
+        if start_ns is not None and end_ns is not None and end_ns < start_ns:
+            print("❌ Thời điểm kết thúc phải sau thời điểm bắt đầu!")
+            return None
+        first, last = TimelineIndex(self.events.timestamps).span(start_ns, end_ns)
+        if first == last:
+            print("❌ Không có sự kiện nào trong khoảng thời gian đã chọn!")
+            return None
+        return start_ns, end_ns
+    
+    @staticmethod
+    def _span_label(span):
+        start_ns, end_ns = span
+        start = f"{start_ns / NS_PER_SECOND:.2f}s" if start_ns is not None else "đầu"
+        end = f"{end_ns / NS_PER_SECOND:.2f}s" if end_ns is not None else "cuối"
+        return f"{start} → {end}"
+    
+    def replay_file(self, filename, speed_multiplier=1.0, enable_hotkey_stop=True, repeat_count=1, max_move_rate=None,
+                    start_time=None, end_time=None):
+        """
+        Phát lại trực tiếp từ file theo luồng: sự kiện được parse/giải mã
+        dần trong lúc phát nên có thể bắt đầu ngay cả với file rất lớn.
+        Macro đang tải trong bộ nhớ (self.events) không bị thay đổi.
+        `start_time`/`end_time` (giây) chỉ phát một đoạn; luồng không tra cứu
+        ngẫu nhiên được nên các sự kiện trước đoạn vẫn được đọc rồi bỏ qua.
+        """
+        if self.replaying:
+            print("⚠️ Đang phát lại macro khác!")
+            return False
+        
+        try:
+            header, events = open_macro_stream(filename)
+        except FileNotFoundError:
+            print(f"❌ Không tìm thấy file: {filename}")
+            return False
+        except Exception as e:
+            print(f"❌ Lỗi khi mở file: {e}")
+            return False
+        
+        timing_stats = header.get('timing_stats') or {}
+        self.smooth_factor = timing_stats.get('smooth_factor', self.smooth_factor)
+        total = header.get('event_count')
+        if self.resample_rate:
+            print("⚠️ Phát theo luồng không hỗ trợ resample, phát đúng các mẫu đã ghi")
+        replay_options = dict(DEFAULT_REPLAY_OPTIONS, **(header.get('replay_options') or {}))
+        
+        span = None
+        if start_time is not None or end_time is not None:
+            span = (round(start_time * NS_PER_SECOND) if start_time is not None else None,
+                    round(end_time * NS_PER_SECOND) if end_time is not None else None)
+            if span[0] is not None and span[1] is not None and span[1] < span[0]:
+                print("❌ Thời điểm kết thúc phải sau thời điểm bắt đầu!")
+                return False
+            # Only the events inside the span count towards progress
+            total = None
+        
+        print(f"▶️ Phát trực tiếp từ file: {filename}" + (f" ({total} sự kiện)" if total else ""))
+        if span is not None:
+            print(f"⏩ Phát đoạn {self._span_label(span)}")
+        
+        # The first repeat reuses the stream opened for the header; later
+        # repeats re-open the file
+        pending = [events]
+        def next_stream():
+            return pending.pop() if pending else open_macro_stream(filename)[1]
+        
+        return self._run_replay(next_stream, total, speed_multiplier, enable_hotkey_stop, repeat_count,
+                                max_move_rate, replay_options, span)
+    
+    def _run_replay(self, next_events, total, speed_multiplier, enable_hotkey_stop, repeat_count,
+                    max_move_rate=None, replay_options=None, span=None, index_range=None):
+        """
+        Vòng lặp phát lại dùng chung: `next_events()` trả về nguồn sự kiện
+        cho mỗi lần lặp (EventStore hoặc iterator dict sự kiện);
+        `replay_options` là tùy chọn của macro đang phát (mặc định
+        self.replay_options); `span` là khoảng (start_ns, end_ns) cần phát,
+        `index_range` là khoảng vị trí (đầu, cuối) trong EventStore.
+        """
         print(f"⚡ Tốc độ: {speed_multiplier}x")
         print(f"🔁 Số lần lặp: {repeat_count}")
         if enable_hotkey_stop:
             print("🛑 Nhấn ESC để dừng phát lại")
+            print("⏯️  Nhấn F8 để tạm dừng/tiếp tục")
         print("⏸️  Nhấn Ctrl+C để dừng")
         
-        self.replaying = True
+        self.replay_control.start()
         
         # Reset modifier key states
-        self._ctrl_pressed = False
-        self._shift_pressed = False
-        self._alt_pressed = False
+        self._event_compiler.reset()
         
         # Setup hotkey listener for stopping
         if enable_hotkey_stop:
@@ -341,45 +673,13 @@ class MacroRecorder:
                     
                 if repeat_count > 1:
                     print(f"🔄 Lần lặp {repeat_num + 1}/{repeat_count}")
-                    
-                last_timestamp = 0
-                completed_events = 0
                 
-                for i, event in enumerate(self.events):
-                    # Check if should stop
-                    if not self.replaying:
-                        print("🛑 Phát lại đã bị dừng!")
-                        break
-                    
-                    # Calculate wait time with smoothing
-                    raw_wait_time = (event['timestamp'] - last_timestamp) / speed_multiplier
-                    # Apply minimum delay and smoothing
-                    wait_time = max(self.min_delay, raw_wait_time * self.smooth_factor)
-                    
-                    if wait_time > 0:
-                        time.sleep(wait_time)
-                    
-                    # Check again after sleep
-                    if not self.replaying:
-                        print("🛑 Phát lại đã bị dừng!")
-                        break
-                    
-                    # Execute event
-                    success = self.execute_event(event)
-                    if success:
-                        completed_events += 1
-                        
-                    last_timestamp = event['timestamp']
-                    
-                    # Progress feedback for long macros
-                    if len(self.events) > 100 and (i + 1) % 50 == 0:
-                        progress = (i + 1) / len(self.events) * 100
-                        print(f"📈 Tiến độ: {progress:.1f}% ({i + 1}/{len(self.events)})")
-                
-                total_completed_events += completed_events
+                total_completed_events += self._execute_events(next_events(), speed_multiplier, total,
+                                                               max_move_rate, replay_options, span, index_range)
                 
                 # Break if stopped mid-execution
                 if not self.replaying:
+                    print("🛑 Phát lại đã bị dừng!")
                     break
                     
                 # Delay between repeats (6 seconds with countdown)
@@ -389,14 +689,19 @@ class MacroRecorder:
                         if not self.replaying:  # Check if stopped during pause
                             break
                         print(f"   ⏰ Còn {i} giây đến lần lặp tiếp theo...")
-                        time.sleep(1)
+                        if not self.replay_control.sleep(1):
+                            break
             
             if self.replaying:  # Completed normally
                 print("✅ Hoàn thành phát lại macro!")
-                print(f"📊 Tổng sự kiện: {total_completed_events}/{len(self.events) * repeat_count}")
+                if total:
+                    print(f"📊 Tổng sự kiện: {total_completed_events}/{total * repeat_count}")
+                else:
+                    print(f"📊 Tổng sự kiện: {total_completed_events}")
                 return True
             else:
                 print(f"⏹️ Phát lại bị dừng. Đã thực hiện: {total_completed_events} sự kiện")
+                self._print_stop_latency()
                 return False
             
         except KeyboardInterrupt:
@@ -406,11 +711,22 @@ class MacroRecorder:
             print(f"❌ Lỗi khi phát lại: {e}")
             return False
         finally:
-            self.replaying = False
+            self.replay_control.finish()
             if self.replay_listener:
                 self.replay_listener.stop()
                 self.replay_listener = None
     
+    def _replay_scheduler(self, speed_multiplier, base_ns=0):
+        """
+        Scheduler theo thời điểm tuyệt đối cho một lần phát. min_delay là
+        khoảng cách tối thiểu giữa hai lệnh ở tốc độ 1x, co giãn cùng tốc độ;
+        `base_ns` là timestamp bắt đầu khi phát từ giữa macro.
+        """
+        scale = self.smooth_factor / speed_multiplier
+        control = self.replay_control
+        timer = PreciseTimer(self.spin_budget, interrupt=control.interrupt)
+        return DeadlineScheduler(scale, self.min_delay * scale, timer, control, base_ns)
+    
     def on_replay_key_press(self, key):
         """Xử lý phím bấm khi đang phát lại macro"""
         try:
@@ -418,107 +734,48 @@ class MacroRecorder:
             if key == keyboard.Key.esc:
                 print("🛑 Nhận lệnh dừng (ESC)...")
                 self.stop_replay()
+            # F8 để tạm dừng/tiếp tục
+            elif key == keyboard.Key.f8:
+                self.toggle_pause_replay()
         except Exception as e:
             print(f"❌ Lỗi xử lý hotkey phát lại: {e}")
     
     def stop_replay(self):
-        """Dừng phát lại macro"""
-        if self.replaying:
-            self.replaying = False
+        """Dừng phát lại macro (có hiệu lực ngay cả khi đang chờ giữa hai sự kiện)"""
+        if self.replay_control.stop():
             print("⏹️ Đang dừng phát lại...")
     
+    def pause_replay(self):
+        """Tạm dừng phát lại; lịch phát được dời theo thời gian tạm dừng"""
+        if self.replay_control.pause():
+            print("⏸️ Đã tạm dừng phát lại")
+            return True
+        return False
+    
+    def resume_replay(self):
+        """Tiếp tục phát lại sau khi tạm dừng"""
+        if self.replay_control.resume():
+            print("▶️ Tiếp tục phát lại")
+            return True
+        return False
+    
+    def toggle_pause_replay(self):
+        """Tạm dừng / tiếp tục phát lại"""
+        if self.replay_control.state == PAUSED:
+            return self.resume_replay()
+        return self.pause_replay()
+    
+    def _print_stop_latency(self):
+        latency = self.replay_control.last_stop_latency_ns
+        if latency is not None:
+            print(f"   ⏱️  Dừng sau {latency / 1e6:.2f}ms kể từ lúc yêu cầu")
+    
     def execute_event(self, event):
-        """Thực hiện một sự kiện"""
+        """Thực hiện một sự kiện (dict format JSON v2)"""
         try:
-            if event['type'] == 'mouse_move':
-                pyautogui.moveTo(event['x'], event['y'])
-                
-            elif event['type'] == 'mouse_click':
-                if event['pressed']:
-                    button = 'left' if 'left' in event['button'].lower() else 'right'
-                    pyautogui.click(event['x'], event['y'], button=button)
-                    
-            elif event['type'] == 'mouse_scroll':
-                pyautogui.scroll(event['dy'], x=event['x'], y=event['y'])
-                
-            elif event['type'] == 'key_press':
-                key = event['key']
-                
-                # Skip paste operations to avoid duplicate paste
-                # Ctrl+V paste sẽ được xử lý ở key_release
-                if key == 'v' and hasattr(self, '_ctrl_pressed') and self._ctrl_pressed:
-                    return True
-                    
-                if key and key.startswith('Key.'):
-                    # Track modifier keys
-                    if key in ['Key.ctrl_l', 'Key.ctrl_r']:
-                        self._ctrl_pressed = True
-                        return True
-                    elif key in ['Key.shift', 'Key.shift_l', 'Key.shift_r']:
-                        self._shift_pressed = True
-                        return True
-                    elif key in ['Key.alt_l', 'Key.alt_r']:
-                        self._alt_pressed = True
-                        return True
-                    
-                    # Xử lý các phím đặc biệt khác
-                    special_keys = {
-                        'Key.space': 'space',
-                        'Key.enter': 'enter',
-                        'Key.tab': 'tab',
-                        'Key.backspace': 'backspace',
-                        'Key.delete': 'delete',
-                        'Key.esc': 'esc'
-                    }
-                    mapped_key = special_keys.get(key, key.replace('Key.', ''))
-                    if mapped_key:
-                        pyautogui.press(mapped_key)
-                elif key:
-                    # Regular character keys
-                    # Check for Ctrl combinations
-                    ctrl_pressed = getattr(self, '_ctrl_pressed', False)
-                    shift_pressed = getattr(self, '_shift_pressed', False)
-                    alt_pressed = getattr(self, '_alt_pressed', False)
-                    
-                    if ctrl_pressed and key == 'v':
-                        # This is Ctrl+V - use pyautogui's hotkey for proper paste
-                        pyautogui.hotkey('ctrl', 'v')
-                    elif ctrl_pressed and key == 'c':
-                        # This is Ctrl+C
-                        pyautogui.hotkey('ctrl', 'c')
-                    elif ctrl_pressed and key == 'x':
-                        # This is Ctrl+X
-                        pyautogui.hotkey('ctrl', 'x')
-                    elif ctrl_pressed and key == 'a':
-                        # This is Ctrl+A
-                        pyautogui.hotkey('ctrl', 'a')
-                    elif ctrl_pressed and key == 'z':
-                        # This is Ctrl+Z
-                        pyautogui.hotkey('ctrl', 'z')
-                    elif ctrl_pressed and key == 'y':
-                        # This is Ctrl+Y
-                        pyautogui.hotkey('ctrl', 'y')
-                    elif shift_pressed:
-                        # Handle shifted characters
-                        pyautogui.hotkey('shift', key)
-                    elif alt_pressed:
-                        # Handle alt combinations
-                        pyautogui.hotkey('alt', key)
-                    else:
-                        # Regular key press
-                        pyautogui.press(key)
-            
-            elif event['type'] == 'key_release':
-                key = event['key']
-                
-                # Track modifier key releases
-                if key in ['Key.ctrl_l', 'Key.ctrl_r']:
-                    self._ctrl_pressed = False
-                elif key in ['Key.shift', 'Key.shift_l', 'Key.shift_r']:
-                    self._shift_pressed = False
-                elif key in ['Key.alt_l', 'Key.alt_r']:
-                    self._alt_pressed = False
-            
+            func, args = self._event_compiler.compile_dict(event)
+            if func is not None:
+                func(*args)
             return True  # Success
                     
         except Exception as e:
@@ -531,30 +788,23 @@ class MacroRecorder:
             print("Không có macro nào!")
             return
             
-        stats = {
-            'mouse_move': 0,
-            'mouse_click': 0,
-            'mouse_scroll': 0,
-            'key_press': 0,
-            'key_release': 0
-        }
-        
-        for event in self.events:
-            event_type = event['type']
-            if event_type in stats:
-                stats[event_type] += 1
+        # Thống kê cộng dồn của EventStore, không cần duyệt lại sự kiện
+        stats = self.events.stats
         
         print("\n=== THỐNG KÊ MACRO ===")
         print(f"Tổng số sự kiện: {len(self.events)}")
-        print(f"Di chuyển chuột: {stats['mouse_move']}")
-        print(f"Click chuột: {stats['mouse_click']}")
-        print(f"Cuộn chuột: {stats['mouse_scroll']}")
-        print(f"Nhấn phím: {stats['key_press']}")
-        print(f"Thả phím: {stats['key_release']}")
-        
-        if self.events:
-            duration = self.events[-1]['timestamp']
-            print(f"Thời lượng: {duration:.2f} giây")
+        print(f"Di chuyển chuột: {stats.count('mouse_move')}")
+        print(f"Click chuột: {stats.count('mouse_click')}")
+        print(f"Cuộn chuột: {stats.count('mouse_scroll')}")
+        print(f"Nhấn phím: {stats.count('key_press')}")
+        print(f"Thả phím: {stats.count('key_release')}")
+        print(f"Thời lượng: {stats.duration:.2f} giây")
+        print(f"Delay: TB {stats.average_delay:.3f}s, độ lệch chuẩn {stats.delay_stddev:.3f}s, "
+              f"min {stats.min_delay:.3f}s, max {stats.max_delay:.3f}s")
+        bounds = stats.pointer_bounds()
+        if bounds:
+            print(f"Vùng con trỏ: ({bounds['min_x']}, {bounds['min_y']}) → ({bounds['max_x']}, {bounds['max_y']})")
+        print(f"Bộ nhớ: {self.events.nbytes() / 1024:.1f} KB")
         print("========================\n")
     
     def create_screenshot_folder(self):
@@ -737,13 +987,12 @@ class MacroRecorder:
         print(f"   🔄 Tổng {total_cycles} chu kỳ")
         print(f"   ⚡ Tốc độ: {speed_multiplier}x")
         print("🛑 Nhấn ESC để dừng phát lại")
+        print("⏯️  Nhấn F8 để tạm dừng/tiếp tục")
         
-        self.replaying = True
+        self.replay_control.start()
         
         # Reset modifier key states
-        self._ctrl_pressed = False
-        self._shift_pressed = False
-        self._alt_pressed = False
+        self._event_compiler.reset()
         
         # Setup hotkey listener for stopping
         self.replay_listener = KeyboardListener(on_press=self.on_replay_key_press)
@@ -792,7 +1041,8 @@ class MacroRecorder:
                             if progress_callback:
                                 progress_callback(a_repeat + 1, repeat_a_count, cycle + 1, total_cycles, 
                                                 f"Nghỉ {i}s giữa A...")
-                            time.sleep(1)
+                            if not self.replay_control.sleep(1):
+                                break
                 
                 if not self.replaying:
                     break
@@ -818,7 +1068,8 @@ class MacroRecorder:
                         if progress_callback:
                             progress_callback(repeat_a_count, repeat_a_count, cycle + 1, total_cycles, 
                                             f"Nghỉ {i}s giữa chu kỳ...")
-                        time.sleep(1)
+                        if not self.replay_control.sleep(1):
+                            break
             
             if self.replaying:
                 print("✅ Hoàn thành phát lại xen kẽ!")
@@ -832,6 +1083,7 @@ class MacroRecorder:
                 return True
             else:
                 print(f"⏹️ Phát lại bị dừng. Đã thực hiện: {total_completed_events} sự kiện")
+                self._print_stop_latency()
                 return False
             
         except KeyboardInterrupt:
@@ -841,43 +1093,78 @@ class MacroRecorder:
             print(f"❌ Lỗi khi phát lại xen kẽ: {e}")
             return False
         finally:
-            self.replaying = False
+            self.replay_control.finish()
             if self.replay_listener:
                 self.replay_listener.stop()
                 self.replay_listener = None
     
-    def _execute_events(self, events, speed_multiplier):
+    def _execute_events(self, events, speed_multiplier, total=None, max_move_rate=None, replay_options=None,
+                        span=None, index_range=None):
         """
-        Thực thi danh sách events với tốc độ đã cho
+        Thực thi danh sách events với tốc độ đã cho.
+        `events` có thể là EventStore (dùng replay plan đã biên dịch, chung
+        cho mọi lần lặp), list dict hoặc iterator dict sự kiện (ví dụ bộ giải
+        mã luồng của macro_codec, được biên dịch dần); `total` là số sự kiện
+        dự kiến để in tiến độ khi không biết trước độ dài; `max_move_rate`
+        bật gộp mouse_move (None = dùng self.max_move_rate); `replay_options`
+        là tùy chọn của macro (None = self.replay_options); `span` là khoảng
+        (start_ns, end_ns) cần phát (None = cả macro); `index_range` là
+        khoảng vị trí (đầu, cuối) cần phát của EventStore, thay cho `span`.
         Trả về số sự kiện đã hoàn thành
         """
-        completed_events = 0
-        last_timestamp = 0
+        start_ns, end_ns = span or (None, None)
+        base_ns = start_ns or 0
+        if isinstance(events, EventStore):
+            steps = get_plan(events, self.input_backend).steps
+            if index_range is None and span is not None:
+                index_range = TimelineIndex(events.timestamps).span(start_ns, end_ns)
+            if index_range is not None:
+                # Steps were compiled from the beginning, so a slice keeps the
+                # modifier state of everything before the seek point
+                first, last = index_range
+                steps = steps[first:last]
+                if span is None and steps:
+                    base_ns = steps[0][0]
+            event_count = len(steps)
+        else:
+            # Streamed dicts are consumed one by one, never materialized
+            event_count = total if total is not None else (len(events) if hasattr(events, '__len__') else 0)
+            steps = iter_plan(events, self.input_backend)
+            if span is not None:
+                steps = steps_in_span(steps, start_ns, end_ns)
         
-        for i, event in enumerate(events):
-            if not self.replaying:
-                break
-            
-            # Calculate wait time with smoothing
-            raw_wait_time = (event['timestamp'] - last_timestamp) / speed_multiplier
-            wait_time = max(self.min_delay, raw_wait_time * self.smooth_factor)
-            
-            if wait_time > 0:
-                time.sleep(wait_time)
-            
-            if not self.replaying:
-                break
-            
-            # Execute event
-            success = self.execute_event(event)
-            if success:
-                completed_events += 1
-                
-            last_timestamp = event['timestamp']
-            
+        # Each event waits for its absolute deadline from the start of the pass,
+        # so lateness and execution time never accumulate
+        scheduler = self._replay_scheduler(speed_multiplier, base_ns)
+        
+        def progress(done):
             # Progress feedback for long macros
-            if len(events) > 50 and (i + 1) % 25 == 0:
-                progress = (i + 1) / len(events) * 100
-                print(f"   📈 Tiến độ: {progress:.1f}% ({i + 1}/{len(events)})")
+            print(f"   📈 Tiến độ: {done / event_count * 100:.1f}% ({done}/{event_count})")
+        
+        options = replay_options or self.replay_options
+        typing = None
+        if options.get('typing', 'keys') != 'keys':
+            typing = TypingCoalescer(self.input_backend, options['typing'], options.get('typing_chunk', 8))
+        if max_move_rate is None:
+            max_move_rate = self.max_move_rate
+        coalescer = MoveCoalescer(self.input_backend.moveTo, max_move_rate) if max_move_rate is not None else None
+        coalescers = [c for c in (typing, coalescer) if c is not None]
+        
+        completed_events = run_plan(steps, scheduler, self.replay_control.is_running,
+                                    progress if event_count > 50 else None, coalescers=coalescers)
+        
+        if completed_events:
+            report = self.last_replay_report = scheduler.report()
+            print(f"   ⏱️  Thời lượng phát: {report['elapsed']:.2f}s (theo lịch {report['scheduled']:.2f}s), "
+                  f"trễ TB {report['mean_ms']:.1f}ms, p95 {report['p95_ms']:.1f}ms, max {report['max_ms']:.1f}ms, "
+                  f"timer quá giờ p99 {report['timer']['p99_us']:.0f}µs")
+            if coalescer is not None:
+                report['moves'] = coalescer.moves
+                report['coalesced_moves'] = coalescer.coalesced
+                print(f"   🖱️  Gộp mouse_move: bỏ {coalescer.coalesced}/{coalescer.moves} lệnh di chuột")
+            if typing is not None:
+                report['typed_chars'] = typing.chars
+                report['coalesced_key_steps'] = typing.coalesced
+                print(f"   ⌨️  Gộp gõ phím: {typing.chars} ký tự trong {typing.runs} đoạn, bớt {typing.coalesced} bước")
         
-        return completed_events 
\ No newline at end of file
+        return completed_events
@@ -0,0 +1,128 @@
+"""
+Lưu macro ở thread nền để F9 và GUI không bị chặn bởi việc ghi đĩa.
+
+`MacroSaver.submit()` chụp snapshot sự kiện ngay trên thread gọi (copy các
+cột của EventStore, rất nhanh), rồi một thread nền tuần tự serialize và ghi
+file bằng `write_macro` (ghi nguyên tử: file tạm + fsync + os.replace), sau
+đó gọi callback với `SaveJob` đã xong. Thread ghi không phải daemon nên khi
+thoát chương trình các lần lưu đang chờ vẫn được ghi hết.
+"""
+
+import threading
+import time
+from collections import deque
+
+from event_store import EventStore
+from macro_io import write_macro
+
+
+def snapshot_macro_data(data):
+    """Bản sao dict macro mà việc ghi tiếp vào macro gốc không ảnh hưởng tới"""
+    events = data['events']
+    if isinstance(events, EventStore):
+        # Frozen stores never change, everything else gets its own columns
+        if not events.frozen:
+            events = events.copy()
+    else:
+        events = list(events)
+    return dict(data, events=events)
+
+
+class SaveJob:
+    """Một lần lưu macro; `error` là exception nếu ghi thất bại"""
+
+    def __init__(self, filename, data, callback=None, compression='zlib', compact=False):
+        self.filename = filename
+        self.data = data
+        self.callback = callback
+        self.compression = compression
+        self.compact = compact
+
+        self.error = None
+        self.elapsed = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def ok(self):
+        return self.done and self.error is None
+
+    def wait(self, timeout=None):
+        """Chờ lần lưu hoàn tất; trả về False nếu hết `timeout`"""
+        return self._done.wait(timeout)
+
+    def run(self):
+        """Ghi file (trên thread hiện tại) rồi gọi callback"""
+        start = time.perf_counter()
+        try:
+            write_macro(self.filename, self.data, self.compression, self.compact)
+        except Exception as e:
+            self.error = e
+        self.elapsed = time.perf_counter() - start
+        self._done.set()
+
+        if self.callback:
+            try:
+                self.callback(self)
+            except Exception as e:
+                print(f"⚠️ Lỗi trong callback lưu macro: {e}")
+
+
+class MacroSaver:
+    """Hàng đợi lưu macro, ghi tuần tự trên một thread nền"""
+
+    def __init__(self):
+        self.saved = 0
+        self.failed = 0
+
+        self._jobs = deque()
+        self._last_job = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, filename, data, callback=None, compression='zlib', compact=False):
+        """
+        Đưa macro vào hàng đợi lưu và trả về ngay `SaveJob`. `callback(job)`
+        được gọi trên thread nền khi ghi xong (kể cả khi lỗi).
+        """
+        job = SaveJob(filename, snapshot_macro_data(data), callback, compression, compact)
+        with self._lock:
+            self._jobs.append(job)
+            self._last_job = job
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="macro-saver")
+                self._thread.start()
+        return job
+
+    def pending(self):
+        """Số lần lưu chưa bắt đầu ghi"""
+        with self._lock:
+            return len(self._jobs)
+
+    def wait(self, timeout=None):
+        """Chờ mọi lần lưu đã gửi hoàn tất; trả về False nếu hết `timeout`"""
+        with self._lock:
+            job = self._last_job
+        # Jobs run in submission order, so the last one finishing means all did
+        return job.wait(timeout) if job else True
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._jobs:
+                    self._thread = None
+                    return
+                job = self._jobs.popleft()
+
+            job.run()
+            if job.error is None:
+                self.saved += 1
+            else:
+                self.failed += 1
+
+
+# Hàng đợi lưu dùng chung cho cả process (GUI, console)
+macro_saver = MacroSaver()
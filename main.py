@@ -4,9 +4,21 @@ Macro Recorder Tool - Ghi lại và phát lại hành động chuột/bàn phím
 Sử dụng: python main.py
 """
 
+import os
 import sys
 import time
 from macro_recorder import MacroRecorder
+from journal import recover_journal
+from macro_catalog import MacroCatalog, SORT_KEYS, print_catalog
+from macro_saver import macro_saver
+
+MACRO_EXTENSIONS = ('.json', '.mrb', '.mrz')
+
+def with_macro_extension(filename):
+    """Thêm đuôi .json nếu tên file chưa có đuôi macro (.json / .mrb / .mrz)"""
+    if not filename.lower().endswith(MACRO_EXTENSIONS):
+        filename += '.json'
+    return filename
 
 def print_menu():
     """In menu chính"""
@@ -28,6 +40,12 @@ def print_menu():
     print("13. 📁 Xem danh sách screenshot")
     print("14. 🗑️  Xóa screenshot cũ (>7 ngày)")
     print("15. 🔁 Phát lại macro với số lần lặp")
+    print("16. 🎚️  Lọc di chuyển chuột khi ghi")
+    print("17. 📓 Bật/tắt journal khi ghi (chống mất dữ liệu)")
+    print("18. 🩹 Khôi phục macro từ journal")
+    print("19. 📼 Phát trực tiếp từ file (không cần tải trước)")
+    print("20. 📚 Thư viện macro (liệt kê/sắp xếp thư mục)")
+    print("21. ⏩ Phát một đoạn macro (từ giây X đến giây Y)")
     print("─" * 50)
     print("9. ❓ Hướng dẫn")
     print("0. 🚪 Thoát")
@@ -47,6 +65,9 @@ def print_help():
     print("🔸 Để phát lại macro:")
     print("   - Chọn '4' để tải macro từ file")
     print("   - Chọn '5' để phát lại với tốc độ bình thường")
+    print("   - Chọn '19' để phát ngay từ file rất lớn (đọc dần trong lúc phát)")
+    print("   - Chọn '21' để phát một đoạn của macro đã tải (theo giây)")
+    print("   - Nhấn F8 để tạm dừng/tiếp tục, ESC để dừng khi đang phát")
     print("   - Nhấn Ctrl+C để dừng phát lại bất cứ lúc nào")
     print()
     print("🔸 Tính năng chụp màn hình:")
@@ -72,6 +93,12 @@ def print_help():
     print("   - Screenshot được lưu với format: screenshot_YYYYMMDD_HHMMSS.png")
     print("="*60)
 
+def wait_for_saves():
+    """Chờ các lần lưu nền (F9) ghi xong trước khi thoát"""
+    if not macro_saver.wait(0):
+        print("⏳ Đang chờ lưu macro xong...")
+        macro_saver.wait()
+
 def handle_f9_save_prompt(recorder):
     """Xử lý F9 với prompt lưu file"""
     recorder.stop_recording()
@@ -85,9 +112,9 @@ def handle_f9_save_prompt(recorder):
                     filename = input("📝 Tên file để lưu (Enter = tự động): ").strip()
                     if not filename:
                         filename = f"macro_{int(time.time())}"
-                    if not filename.endswith('.json'):
-                        filename += '.json'
-                    recorder.save_macro(filename)
+                    filename = with_macro_extension(filename)
+                    # Ghi ở thread nền để listener phím không bị chặn bởi việc ghi đĩa
+                    recorder.save_macro(filename, background=True)
                     break
                 elif save_choice in ['n', 'no', 'không']:
                     print("❌ Không lưu macro.")
@@ -120,7 +147,7 @@ def main():
     while True:
         try:
             print_menu()
-            choice = input("👉 Chọn chức năng (0-15): ").strip()
+            choice = input("👉 Chọn chức năng (0-21): ").strip()
             
             if choice == '1':
                 print("\n🎬 Chuẩn bị ghi macro...")
@@ -136,20 +163,18 @@ def main():
                 print("✅ Đã dừng ghi macro!")
                 
             elif choice == '3':
-                filename = input("📝 Tên file để lưu (không cần .json): ").strip()
+                filename = input("📝 Tên file để lưu (.json mặc định, .mrb = nhị phân, .mrz = nén): ").strip()
                 if not filename:
                     filename = f"macro_{int(time.time())}"
-                if not filename.endswith('.json'):
-                    filename += '.json'
+                filename = with_macro_extension(filename)
                 recorder.save_macro(filename)
                 
             elif choice == '4':
-                filename = input("📂 Tên file để tải (không cần .json): ").strip()
+                filename = input("📂 Tên file để tải (.json mặc định, hoặc .mrb/.mrz): ").strip()
                 if not filename:
                     print("❌ Vui lòng nhập tên file!")
                     continue
-                if not filename.endswith('.json'):
-                    filename += '.json'
+                filename = with_macro_extension(filename)
                 recorder.load_macro(filename)
                 
             elif choice == '5':
@@ -246,21 +271,110 @@ def main():
                     time.sleep(1)
                 recorder.replay_macro(speed, True, repeat_count)
                 
+            elif choice == '16':
+                distance_input = input("🎚️ Khoảng cách tối thiểu (pixel, 0 = tắt) [mặc định 0]: ").strip()
+                interval_input = input("⏱️ Khoảng thời gian tối thiểu (ms, 0 = tắt) [mặc định 0]: ").strip()
+                try:
+                    min_distance = int(distance_input) if distance_input else 0
+                    min_interval = float(interval_input) / 1000 if interval_input else 0.0
+                except ValueError:
+                    print("❌ Giá trị không hợp lệ!")
+                    continue
+                recorder.set_move_filter(min_distance, min_interval)
+                
+            elif choice == '17':
+                recorder.set_journal_enabled(not recorder.journal_enabled)
+                
+            elif choice == '18':
+                journal_file = input("📓 File journal cần khôi phục: ").strip()
+                if not journal_file:
+                    print("❌ Vui lòng nhập tên file!")
+                    continue
+                filename = input("📝 Tên file macro để lưu (Enter = tự động): ").strip()
+                if not filename:
+                    filename = os.path.splitext(journal_file)[0]
+                filename = with_macro_extension(filename)
+                try:
+                    count = recover_journal(journal_file, filename)
+                    if count:
+                        print(f"🩹 Đã khôi phục {count} sự kiện vào {filename}")
+                    else:
+                        print("❌ Journal không có sự kiện nào!")
+                except FileNotFoundError:
+                    print(f"❌ Không tìm thấy file: {journal_file}")
+                
+            elif choice == '19':
+                filename = input("📼 File macro cần phát (.json/.mrb/.mrz): ").strip()
+                if not filename:
+                    print("❌ Vui lòng nhập tên file!")
+                    continue
+                filename = with_macro_extension(filename)
+                try:
+                    speed = float(input("⚡ Tốc độ (Enter = 1.0): ").strip() or 1.0)
+                except ValueError:
+                    print("❌ Tốc độ không hợp lệ!")
+                    continue
+                print("⏳ Bạn có 3 giây để chuẩn bị...")
+                for i in range(3, 0, -1):
+                    print(f"   {i}...")
+                    time.sleep(1)
+                recorder.replay_file(filename, speed)
+                
+            elif choice == '20':
+                folder = input("📁 Thư mục macro (Enter = SCRIPT): ").strip() or "SCRIPT"
+                if not os.path.isdir(folder):
+                    print(f"❌ Không tìm thấy thư mục: {folder}")
+                    continue
+                sort_by = input(f"🔃 Sắp xếp theo ({'/'.join(SORT_KEYS)}, Enter = name): ").strip() or 'name'
+                if sort_by not in SORT_KEYS:
+                    print("❌ Khóa sắp xếp không hợp lệ!")
+                    continue
+                catalog = MacroCatalog(folder)
+                updated, removed = catalog.refresh()
+                entries = catalog.list_entries(sort_by, reverse=sort_by != 'name')
+                print_catalog(entries)
+                print(f"📚 {len(entries)} macro (đọc lại {updated}, bỏ {removed})")
+                name = input("📂 Tên file để tải (Enter = bỏ qua): ").strip()
+                if name:
+                    recorder.load_macro(catalog.path(name))
+                
+            elif choice == '21':
+                if not recorder.events:
+                    print("❌ Chưa có macro nào! Hãy ghi hoặc tải macro trước.")
+                    continue
+                print(f"⏱️  Macro dài {recorder.events.stats.duration:.2f}s ({len(recorder.events)} sự kiện)")
+                try:
+                    start_input = input("⏩ Bắt đầu từ giây (Enter = đầu macro): ").strip()
+                    end_input = input("⏹️  Kết thúc ở giây (Enter = cuối macro): ").strip()
+                    start_time = float(start_input) if start_input else None
+                    end_time = float(end_input) if end_input else None
+                    speed = float(input("⚡ Tốc độ (Enter = 1.0): ").strip() or 1.0)
+                except ValueError:
+                    print("❌ Giá trị không hợp lệ!")
+                    continue
+                print("⏳ Bạn có 3 giây để chuẩn bị...")
+                for i in range(3, 0, -1):
+                    print(f"   {i}...")
+                    time.sleep(1)
+                recorder.replay_macro(speed, True, start_time=start_time, end_time=end_time)
+                
             elif choice == '9':
                 print_help()
                 
             elif choice == '0':
                 print("👋 Cảm ơn bạn đã sử dụng Macro Recorder Tool!")
                 recorder.stop_screenshot_hotkey()  # Tắt hotkey trước khi thoát
+                wait_for_saves()
                 sys.exit(0)
                 
             else:
-                print("❌ Lựa chọn không hợp lệ! Vui lòng chọn từ 0-15.")
+                print("❌ Lựa chọn không hợp lệ! Vui lòng chọn từ 0-21.")
                 
         except KeyboardInterrupt:
             print("\n\n🛑 Đã nhận Ctrl+C. Dừng tool...")
             recorder.stop_recording()
             recorder.stop_screenshot_hotkey()
+            wait_for_saves()
             sys.exit(0)
         except Exception as e:
             print(f"❌ Lỗi: {e}")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Timer chính xác cho vòng phát lại: ngủ thô rồi quay (spin) ở đoạn cuối.
+
+`time.sleep` trên Linux thường ngủ quá 50-100µs (hơn nhiều khi máy bận),
+lớn hơn nhiều khoảng cách dưới 1ms giữa các sự kiện trong bản ghi. PreciseTimer
+ngủ bằng `time.sleep` tới trước thời điểm đích `spin_budget` giây, phần còn
+lại thì liên tục đọc clock (nhường CPU bằng sleep(0) khi còn xa hơn
+`yield_window`). Spin budget lớn hơn = chính xác hơn nhưng tốn CPU hơn;
+0 = chỉ dùng sleep. Độ quá giờ (overshoot) của mỗi lần chờ được thống kê.
+Nếu có `interrupt` (threading.Event), lần chờ trả về ngay khi event được set.
+
+Đo overshoot với các spin budget khác nhau:
+    python precise_timer.py
+    python precise_timer.py --budgets 0 0.0005 0.002 --interval 0.0002 --count 2000
+"""
+
+import argparse
+import sys
+import time
+from array import array
+
+from event_store import NS_PER_SECOND
+
+DEFAULT_SPIN_BUDGET = 0.001  # giây
+DEFAULT_YIELD_WINDOW = 0.0002  # giây
+
+
+class DelayStats:
+    """Thống kê các độ trễ (ns): trung bình, phân vị, lớn nhất"""
+
+    def __init__(self):
+        self.samples = array('q')
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, delay_ns):
+        self.samples.append(delay_ns)
+        self.total_ns += delay_ns
+        if delay_ns > self.max_ns:
+            self.max_ns = delay_ns
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def mean_ns(self):
+        return self.total_ns / len(self.samples) if self.samples else 0.0
+
+    def percentile(self, percent):
+        """Độ trễ (ns) ở phân vị `percent` (0-100)"""
+        if not self.samples:
+            return 0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index]
+
+    def late_count(self, threshold_ns=1_000_000):
+        """Số mẫu trễ hơn `threshold_ns` (mặc định 1ms)"""
+        return sum(1 for delay in self.samples if delay > threshold_ns)
+
+    def to_dict(self):
+        return {
+            'events': len(self.samples),
+            'mean_ms': self.mean_ns / 1e6,
+            'p50_ms': self.percentile(50) / 1e6,
+            'p95_ms': self.percentile(95) / 1e6,
+            'p99_ms': self.percentile(99) / 1e6,
+            'max_ms': self.max_ns / 1e6,
+            'late_over_1ms': self.late_count()
+        }
+
+
+class PreciseTimer:
+    """Chờ tới thời điểm tuyệt đối (ns theo `clock`) bằng sleep thô + spin"""
+
+    def __init__(self, spin_budget=DEFAULT_SPIN_BUDGET, yield_window=DEFAULT_YIELD_WINDOW,
+                 clock=time.perf_counter_ns, interrupt=None):
+        self.spin_budget_ns = round(spin_budget * NS_PER_SECOND)
+        self.yield_window_ns = round(yield_window * NS_PER_SECOND)
+        self.clock = clock
+        self.interrupt = interrupt
+
+        self.overshoot = DelayStats()
+        self.spin_ns = 0  # CPU time spent spinning
+
+    def sleep_until(self, deadline_ns):
+        """
+        Chờ tới `deadline_ns`; trả về clock lúc thức dậy (sớm hơn deadline
+        nếu bị `interrupt`).
+        """
+        clock = self.clock
+        interrupt = self.interrupt
+        now = clock()
+        remaining = deadline_ns - now
+        if remaining > self.spin_budget_ns:
+            coarse = (remaining - self.spin_budget_ns) / NS_PER_SECOND
+            if interrupt is None:
+                time.sleep(coarse)
+            elif interrupt.wait(coarse):
+                return clock()
+            now = clock()
+
+        spin_start = now
+        yield_window_ns = self.yield_window_ns
+        while now < deadline_ns:
+            if interrupt is not None and interrupt.is_set():
+                self.spin_ns += now - spin_start
+                return now
+            if deadline_ns - now > yield_window_ns:
+                time.sleep(0)  # let other threads (listeners, GUI) run
+            now = clock()
+        self.spin_ns += now - spin_start
+
+        self.overshoot.add(now - deadline_ns)
+        return now
+
+    def sleep(self, seconds):
+        """Như time.sleep nhưng chính xác hơn"""
+        return self.sleep_until(self.clock() + round(seconds * NS_PER_SECOND))
+
+    def stats(self):
+        """Thống kê overshoot (µs) và thời gian CPU dùng để spin (giây)"""
+        overshoot = self.overshoot
+        return {
+            'waits': len(overshoot),
+            'mean_us': overshoot.mean_ns / 1e3,
+            'p50_us': overshoot.percentile(50) / 1e3,
+            'p99_us': overshoot.percentile(99) / 1e3,
+            'max_us': overshoot.max_ns / 1e3,
+            'spin_seconds': self.spin_ns / NS_PER_SECOND
+        }
+
+
+def measure(spin_budget, interval, count):
+    """Chờ `count` lần, mỗi lần `interval` giây; trả về (stats, thời gian chạy)"""
+    timer = PreciseTimer(spin_budget)
+    start = time.perf_counter_ns()
+    deadline = start
+    step = round(interval * NS_PER_SECOND)
+    for _ in range(count):
+        deadline += step
+        timer.sleep_until(deadline)
+    return timer.stats(), (time.perf_counter_ns() - start) / NS_PER_SECOND
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo độ quá giờ của PreciseTimer theo spin budget")
+    parser.add_argument('--budgets', type=float, nargs='+', default=[0.0, 0.0005, 0.001, 0.002],
+                        help="Các spin budget cần đo (giây, 0 = chỉ sleep)")
+    parser.add_argument('--interval', type=float, default=0.001, help="Khoảng chờ mỗi lần (giây)")
+    parser.add_argument('--count', type=int, default=1000, help="Số lần chờ")
+    args = parser.parse_args()
+
+    print(f"⏱️  {args.count} lần chờ {args.interval * 1000:.2f}ms")
+    print(f"{'spin budget':>12} {'TB (µs)':>9} {'p50':>8} {'p99':>8} {'max':>9} {'CPU spin':>9}")
+    print("─" * 60)
+    for budget in args.budgets:
+        stats, elapsed = measure(budget, args.interval, args.count)
+        print(f"{budget * 1000:>10.2f}ms {stats['mean_us']:>9.1f} {stats['p50_us']:>8.1f} "
+              f"{stats['p99_us']:>8.1f} {stats['max_us']:>9.1f} {stats['spin_seconds'] / elapsed:>8.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Điều khiển phát lại (dừng / tạm dừng / tiếp tục) bằng Condition và Event.
+
+Trước đây việc dừng chỉ là lật cờ `replaying`, vòng phát lại thấy cờ sau khi
+thức dậy từ `time.sleep`, nên ESC có thể mất cả khoảng nghỉ giữa hai sự kiện
+(hoặc một nhịp đếm ngược 1 giây) mới có hiệu lực. ReplayController giữ trạng
+thái tường minh (idle, running, paused, stopping) dưới một Condition; mọi lần
+chờ của vòng phát lại (PreciseTimer, đếm ngược giữa các lần lặp) chờ trên
+`interrupt`/Condition nên thức dậy ngay khi trạng thái đổi. Thời gian từ lúc
+yêu cầu dừng tới lúc vòng phát lại thực sự dừng được đo trong `stop_latency`.
+"""
+
+import threading
+import time
+
+from event_store import NS_PER_SECOND
+from precise_timer import DelayStats
+
+IDLE = 'idle'
+RUNNING = 'running'
+PAUSED = 'paused'
+STOPPING = 'stopping'
+
+
+class ReplayController:
+    """
+    Trạng thái phát lại dùng chung giữa thread phát và các thread điều khiển
+    (hotkey, GUI). `interrupt` được set khi trạng thái khác running để các
+    lần chờ đang diễn ra trả về ngay; `paused_ns` là tổng thời gian đã tạm
+    dừng trong lần phát hiện tại (scheduler dùng để dời lịch, không bị lệch).
+    """
+
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.state = IDLE
+        self.interrupt = threading.Event()
+        self.paused_ns = 0
+        self.stop_latency = DelayStats()
+        self.last_stop_latency_ns = None
+
+        self._condition = threading.Condition()
+        self._pause_started_ns = None
+        self._stop_requested_ns = None
+
+    @property
+    def active(self):
+        """True khi đang phát (kể cả đang tạm dừng), chưa có yêu cầu dừng"""
+        return self.state in (RUNNING, PAUSED)
+
+    def _set_state(self, state):
+        # Caller holds the condition
+        self.state = state
+        if state == RUNNING:
+            self.interrupt.clear()
+        else:
+            self.interrupt.set()
+        self._condition.notify_all()
+
+    def start(self):
+        """Bắt đầu một lần phát mới"""
+        with self._condition:
+            self.paused_ns = 0
+            self.last_stop_latency_ns = None
+            self._pause_started_ns = None
+            self._stop_requested_ns = None
+            self._set_state(RUNNING)
+
+    def finish(self):
+        """Kết thúc lần phát (thread phát gọi khi thoát vòng lặp)"""
+        with self._condition:
+            self._acknowledge_stop()
+            self._set_state(IDLE)
+
+    def stop(self):
+        """Yêu cầu dừng; trả về False nếu không có gì đang phát"""
+        with self._condition:
+            if not self.active:
+                return False
+            self._stop_requested_ns = self.clock()
+            self._set_state(STOPPING)
+            return True
+
+    def pause(self):
+        """Tạm dừng; trả về False nếu không đang chạy"""
+        with self._condition:
+            if self.state != RUNNING:
+                return False
+            self._pause_started_ns = self.clock()
+            self._set_state(PAUSED)
+            return True
+
+    def resume(self):
+        """Tiếp tục sau khi tạm dừng; trả về False nếu không đang tạm dừng"""
+        with self._condition:
+            if self.state != PAUSED:
+                return False
+            self.paused_ns += self.clock() - self._pause_started_ns
+            self._pause_started_ns = None
+            self._set_state(RUNNING)
+            return True
+
+    def _acknowledge_stop(self):
+        # Caller holds the condition
+        if self._stop_requested_ns is not None:
+            latency = self.clock() - self._stop_requested_ns
+            self.stop_latency.add(latency)
+            self.last_stop_latency_ns = latency
+            self._stop_requested_ns = None
+
+    def is_running(self):
+        """
+        Điểm kiểm tra của vòng phát: True để tiếp tục. Khi đang tạm dừng thì
+        chờ (không tốn CPU) tới khi tiếp tục hoặc bị dừng.
+        """
+        if self.state == RUNNING:
+            return True
+        with self._condition:
+            while self.state == PAUSED:
+                self._condition.wait()
+            if self.state == RUNNING:
+                return True
+            self._acknowledge_stop()
+            return False
+
+    def sleep(self, seconds):
+        """
+        Ngủ `seconds` giây (thời gian tạm dừng không tính), thức dậy ngay khi
+        bị dừng. Trả về False nếu bị dừng.
+        """
+        deadline = self.clock() + round(seconds * NS_PER_SECOND)
+        with self._condition:
+            while True:
+                if self.state == PAUSED:
+                    paused_before = self.paused_ns
+                    while self.state == PAUSED:
+                        self._condition.wait()
+                    deadline += self.paused_ns - paused_before
+                    continue
+                if self.state != RUNNING:
+                    self._acknowledge_stop()
+                    return False
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    return True
+                self._condition.wait(remaining / NS_PER_SECOND)
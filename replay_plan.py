@@ -0,0 +1,336 @@
+"""
+Biên dịch macro thành kế hoạch phát lại (replay plan).
+
+Thay vì mỗi lần phát lại lại đọc dict sự kiện, so sánh chuỗi loại sự kiện,
+tra bảng phím đặc biệt, lowercase tên nút chuột..., macro được biên dịch một
+lần thành danh sách phẳng các bước `(timestamp_ns, hàm, args)`: hàm đã gắn
+sẵn với backend (pyautogui hoặc backend khác có moveTo/click/scroll/press/
+hotkey), args đã được parse sẵn, timestamp_ns là thời điểm của sự kiện tính
+từ đầu macro. Bước không cần gọi gì (thả nút chuột, phím modifier...) có hàm
+là None.
+
+Trạng thái phím modifier (Ctrl/Shift/Alt) chỉ phụ thuộc thứ tự sự kiện nên
+cũng được giải quyết lúc biên dịch, với đúng quy tắc của
+`MacroRecorder.execute_event` trước đây.
+
+TypingCoalescer (tùy chọn theo macro, `replay_options['typing']`) gộp các
+đoạn gõ ký tự thường thành lệnh write(text) thay vì press/release từng phím.
+
+Phát từ giữa macro: TimelineIndex tìm vị trí theo thời gian bằng tìm kiếm nhị
+phân rồi cắt replay plan. Mỗi bước đã được biên dịch với trạng thái modifier
+của mọi sự kiện trước nó, nên Ctrl/Shift/Alt tại điểm bắt đầu vẫn đúng.
+"""
+
+import weakref
+from bisect import bisect_left, bisect_right
+from functools import partial
+
+from event_store import (
+    EventStore, EVENT_MOUSE_MOVE, EVENT_MOUSE_CLICK, EVENT_MOUSE_SCROLL,
+    EVENT_KEY_PRESS, EVENT_KEY_RELEASE, TYPE_CODES, NS_PER_SECOND
+)
+
+# Phím đặc biệt pynput -> tên phím pyautogui (phím khác: bỏ tiền tố 'Key.')
+SPECIAL_KEYS = {
+    'Key.space': 'space',
+    'Key.enter': 'enter',
+    'Key.tab': 'tab',
+    'Key.backspace': 'backspace',
+    'Key.delete': 'delete',
+    'Key.esc': 'esc'
+}
+
+CTRL_KEYS = frozenset(('Key.ctrl_l', 'Key.ctrl_r'))
+SHIFT_KEYS = frozenset(('Key.shift', 'Key.shift_l', 'Key.shift_r'))
+ALT_KEYS = frozenset(('Key.alt_l', 'Key.alt_r'))
+
+# Ctrl + các phím này được phát bằng hotkey('ctrl', phím)
+CTRL_HOTKEYS = frozenset('cxazy')
+
+# Cách phát đoạn gõ ký tự: từng phím như lúc ghi, một lệnh write cho cả đoạn,
+# hoặc write từng nhóm `typing_chunk` ký tự tại thời điểm ký tự đầu nhóm
+TYPING_MODES = ('keys', 'bulk', 'paced')
+
+# Tùy chọn phát lại lưu kèm từng macro (header 'replay_options')
+DEFAULT_REPLAY_OPTIONS = {
+    'typing': 'keys',
+    'typing_chunk': 8,
+}
+
+
+class ActionCompiler:
+    """
+    Chuyển từng sự kiện thành (hàm, args) gắn với `backend`, theo dõi trạng
+    thái Ctrl/Shift/Alt qua các sự kiện phím.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.ctrl_pressed = False
+        self.shift_pressed = False
+        self.alt_pressed = False
+
+        self._click = {
+            'left': partial(backend.click, button='left'),
+            'right': partial(backend.click, button='right'),
+        }
+        # button string -> bound click, key string -> press action
+        self._buttons = {}
+        self._presses = {}
+
+    def reset(self):
+        """Bỏ trạng thái modifier (đầu mỗi lần phát lại)"""
+        self.ctrl_pressed = False
+        self.shift_pressed = False
+        self.alt_pressed = False
+
+    def mouse_click(self, x, y, button, pressed):
+        if not pressed:
+            return None, ()
+        click = self._buttons.get(button)
+        if click is None:
+            click = self._buttons[button] = self._click['left' if 'left' in button.lower() else 'right']
+        return click, (x, y)
+
+    def key_press(self, key):
+        if not key:
+            return None, ()
+        # Ctrl+V press is skipped to avoid a duplicate paste
+        if key == 'v' and self.ctrl_pressed:
+            return None, ()
+
+        if key.startswith('Key.'):
+            if key in CTRL_KEYS:
+                self.ctrl_pressed = True
+                return None, ()
+            if key in SHIFT_KEYS:
+                self.shift_pressed = True
+                return None, ()
+            if key in ALT_KEYS:
+                self.alt_pressed = True
+                return None, ()
+            return self._press(key, SPECIAL_KEYS.get(key, key.replace('Key.', '')))
+
+        if self.ctrl_pressed and key in CTRL_HOTKEYS:
+            return self.backend.hotkey, ('ctrl', key)
+        if self.shift_pressed:
+            return self.backend.hotkey, ('shift', key)
+        if self.alt_pressed:
+            return self.backend.hotkey, ('alt', key)
+        return self._press(key, key)
+
+    def key_release(self, key):
+        if key in CTRL_KEYS:
+            self.ctrl_pressed = False
+        elif key in SHIFT_KEYS:
+            self.shift_pressed = False
+        elif key in ALT_KEYS:
+            self.alt_pressed = False
+        return None, ()
+
+    def _press(self, key, mapped_key):
+        action = self._presses.get(key)
+        if action is None:
+            action = self._presses[key] = (self.backend.press, (mapped_key,)) if mapped_key else (None, ())
+        return action
+
+    def compile_columns(self, code, x, y, arg1, arg2, strings):
+        """(hàm, args) cho một sự kiện dạng cột của EventStore"""
+        if code == EVENT_MOUSE_MOVE:
+            return self.backend.moveTo, (x, y)
+        if code == EVENT_MOUSE_CLICK:
+            return self.mouse_click(x, y, strings[arg1] if arg1 >= 0 else '', arg2)
+        if code == EVENT_MOUSE_SCROLL:
+            return self.backend.scroll, (arg2, x, y)
+        key = strings[arg1] if arg1 >= 0 else None
+        if code == EVENT_KEY_PRESS:
+            return self.key_press(key)
+        return self.key_release(key)
+
+    def compile_dict(self, event):
+        """(hàm, args) cho một dict sự kiện format JSON v2"""
+        code = TYPE_CODES.get(event['type'])
+        if code == EVENT_MOUSE_MOVE:
+            return self.backend.moveTo, (event['x'], event['y'])
+        if code == EVENT_MOUSE_CLICK:
+            return self.mouse_click(event['x'], event['y'], event['button'], event['pressed'])
+        if code == EVENT_MOUSE_SCROLL:
+            return self.backend.scroll, (event['dy'], event['x'], event['y'])
+        if code == EVENT_KEY_PRESS:
+            return self.key_press(event['key'])
+        if code == EVENT_KEY_RELEASE:
+            return self.key_release(event['key'])
+        return None, ()
+
+
+class TypingCoalescer:
+    """
+    Gộp các đoạn gõ ký tự thường (press của ký tự in được hoặc space, không
+    kèm modifier: Shift/Ctrl/Alt đã được biên dịch thành hotkey) thành lệnh
+    `backend.write(text)`. Các bước không gọi gì nằm giữa đoạn (thả phím) bị
+    bỏ theo; mọi bước khác giữ nguyên thứ tự và thời điểm. Lệnh write được
+    phát tại thời điểm ký tự đầu (nhóm) nên bước sau đoạn vẫn theo lịch gốc
+    và tổng thời lượng macro không đổi.
+    """
+
+    def __init__(self, backend, mode='bulk', chunk=8):
+        if mode not in TYPING_MODES:
+            raise ValueError(f"Chế độ gõ không hỗ trợ: {mode} (chọn: {', '.join(TYPING_MODES)})")
+        self.press = backend.press
+        self.write = backend.write
+        self.chunk = max(1, int(chunk)) if mode == 'paced' else 0
+        self.runs = 0
+        self.chars = 0
+        self.coalesced = 0  # source steps merged away
+
+    def _char(self, step):
+        """Ký tự được gõ ở bước này, hoặc None nếu không phải press ký tự thường"""
+        func, args = step[1], step[2]
+        if func is None or func != self.press:
+            return None
+        key = args[0]
+        if key == 'space':
+            return ' '
+        return key if len(key) == 1 and key.isprintable() else None
+
+    def _flush(self, pending, chars):
+        """Các bước thay cho đoạn `pending`; `chars` = list (vị trí trong pending, ký tự)"""
+        if len(chars) < 2:
+            return pending
+        first, last = chars[0][0], chars[-1][0]
+        size = self.chunk or len(chars)
+        writes = []
+        for start in range(0, len(chars), size):
+            group = chars[start:start + size]
+            text = ''.join(char for _, char in group)
+            writes.append((pending[group[0][0]][0], self.write, (text,)))
+
+        self.runs += 1
+        self.chars += len(chars)
+        self.coalesced += (last - first + 1) - len(writes)
+        return pending[:first] + writes + pending[last + 1:]
+
+    def filter(self, steps, scheduler=None):
+        """Yield các bước `(timestamp_ns, hàm, args)` sau khi gộp các đoạn gõ"""
+        pending, chars = [], []
+        for step in steps:
+            char = self._char(step)
+            if char is not None:
+                chars.append((len(pending), char))
+                pending.append(step)
+            elif step[1] is None and chars:
+                pending.append(step)
+            else:
+                if pending:
+                    yield from self._flush(pending, chars)
+                    pending, chars = [], []
+                yield step
+        if pending:
+            yield from self._flush(pending, chars)
+
+
+class ReplayPlan:
+    """
+    Kế hoạch phát lại đã biên dịch của một EventStore. `steps` là list
+    `(timestamp_ns, hàm, args)`, hàm None = sự kiện không cần gọi backend.
+    """
+
+    def __init__(self, steps, backend, source_types, source_length):
+        self.steps = steps
+        self.backend = backend
+        # Identity of the type column + length tell whether the store changed
+        # (appends grow the column in place, clear() replaces it)
+        self.source_types = source_types
+        self.source_length = source_length
+
+    def is_current(self, events, backend):
+        return (self.backend is backend and self.source_types is events.types
+                and self.source_length == len(events))
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    @property
+    def duration(self):
+        """Thời lượng macro (giây) theo timestamp của bước cuối"""
+        return self.steps[-1][0] / NS_PER_SECOND if self.steps else 0.0
+
+
+class TimelineIndex:
+    """
+    Chỉ mục thời gian của macro: tra cột timestamp (ns, không giảm) của
+    EventStore bằng tìm kiếm nhị phân O(log n), không copy dữ liệu.
+    """
+
+    def __init__(self, timestamps):
+        self.timestamps = timestamps
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def index_at(self, timestamp_ns):
+        """Vị trí sự kiện đầu tiên có timestamp >= timestamp_ns"""
+        return bisect_left(self.timestamps, timestamp_ns)
+
+    def span(self, start_ns=None, end_ns=None):
+        """(đầu, cuối) — cuối không tính — của các sự kiện trong [start_ns, end_ns]"""
+        first = 0 if start_ns is None else bisect_left(self.timestamps, start_ns)
+        last = len(self.timestamps) if end_ns is None else bisect_right(self.timestamps, end_ns)
+        return first, max(first, last)
+
+
+def steps_in_span(steps, start_ns=None, end_ns=None):
+    """
+    Lọc iterator bước `(timestamp_ns, hàm, args)` (phát theo luồng) theo
+    khoảng thời gian. Các bước trước điểm bắt đầu vẫn được lấy ra (biên dịch)
+    nên trạng thái modifier tại điểm bắt đầu vẫn đúng.
+    """
+    for step in steps:
+        if end_ns is not None and step[0] > end_ns:
+            break
+        if start_ns is None or step[0] >= start_ns:
+            yield step
+
+
+def compile_plan(events, backend):
+    """Biên dịch EventStore (hoặc list dict sự kiện) thành ReplayPlan"""
+    if not isinstance(events, EventStore):
+        events = EventStore.from_events(events)
+
+    compiler = ActionCompiler(backend)
+    compile_columns = compiler.compile_columns
+    strings = events.strings
+    steps = [
+        (timestamp_ns, *compile_columns(code, x, y, arg1, arg2, strings))
+        for code, timestamp_ns, x, y, arg1, arg2 in zip(
+            events.types, events.timestamps, events.xs, events.ys, events.arg1, events.arg2)
+    ]
+    return ReplayPlan(steps, backend, events.types, len(events))
+
+
+def iter_plan(events, backend):
+    """
+    Biên dịch dần một iterator dict sự kiện (phát theo luồng từ file):
+    yield `(timestamp_ns, hàm, args)` cho từng sự kiện.
+    """
+    compile_dict = ActionCompiler(backend).compile_dict
+    for event in events:
+        yield (round(event['timestamp'] * NS_PER_SECOND), *compile_dict(event))
+
+
+# EventStore -> ReplayPlan; entries disappear together with their store
+_plans = weakref.WeakKeyDictionary()
+
+
+def get_plan(events, backend):
+    """
+    ReplayPlan của EventStore, biên dịch lần đầu rồi dùng lại cho các lần
+    phát/lặp sau (biên dịch lại nếu store đã có thêm sự kiện hoặc đổi backend).
+    """
+    plan = _plans.get(events)
+    if plan is None or not plan.is_current(events, backend):
+        plan = _plans[events] = compile_plan(events, backend)
+    return plan
@@ -0,0 +1,211 @@
+"""
+Lập lịch phát lại theo thời điểm tuyệt đối (không trôi thời gian).
+
+Cách cũ chờ `max(min_delay, delta * smooth)` tính từ sự kiện trước, nên
+phần sàn min_delay, pyautogui.PAUSE và thời gian thực thi mỗi lệnh cộng dồn
+lại: macro 10s có thể phát mất lâu hơn nhiều. Ở đây mỗi sự kiện có một thời
+điểm đích tính từ lúc bắt đầu phát (`timestamp * smooth / speed`), scheduler
+chỉ ngủ tới thời điểm đó, nên trễ của một sự kiện không làm lệch các sự kiện
+sau và thời lượng phát ở 1x bằng thời lượng ghi.
+
+`min_delay` vẫn là khoảng cách tối thiểu giữa hai lệnh liên tiếp (giới hạn
+tốc độ), nhưng không cộng dồn: sự kiện bị giãn ra sẽ đuổi kịp lịch ở các
+khoảng nghỉ sau. Việc chờ dùng PreciseTimer (sleep + spin đoạn cuối); độ
+trễ so với lịch của từng sự kiện được ghi lại trong `lateness`. Với
+`control` (ReplayController), lần chờ thức dậy ngay khi bị dừng/tạm dừng và
+thời gian tạm dừng được cộng vào lịch nên phát tiếp không bị dồn sự kiện.
+
+MoveCoalescer (tùy chọn) bỏ các mouse_move trung gian khi phát bị trễ lịch
+hoặc vượt tần suất tối đa, giữ nguyên mọi sự kiện khác.
+"""
+
+from event_store import NS_PER_SECOND
+from precise_timer import DelayStats, PreciseTimer
+from replay_control import RUNNING
+
+
+class DeadlineScheduler:
+    """
+    Ngủ tới thời điểm đích của từng sự kiện: `origin + (timestamp - base) * scale`,
+    với `scale = smooth_factor / speed` (giữ dạng fixed-point Q16 để tính
+    bằng số nguyên) và khoảng cách tối thiểu `min_gap` giây giữa hai lệnh;
+    `base_ns` là timestamp bắt đầu phát khi phát từ giữa macro.
+    """
+
+    def __init__(self, scale=1.0, min_gap=0.0, timer=None, control=None, base_ns=0):
+        self.scale_q16 = round(scale * 65536)
+        self.min_gap_ns = round(min_gap * NS_PER_SECOND)
+        self.timer = timer or PreciseTimer(interrupt=control.interrupt if control is not None else None)
+        self.clock = self.timer.clock
+        self.control = control
+        self._paused_ns = 0
+
+        self.lateness = DelayStats()
+        self.origin_ns = None
+        self.base_ns = base_ns
+        self.last_fire_ns = None
+        self.last_deadline_ns = None
+
+    def start(self):
+        """Đặt mốc thời gian bắt đầu phát (gọi tự động ở sự kiện đầu tiên)"""
+        self.origin_ns = self.clock()
+        self.last_fire_ns = None
+        self.last_deadline_ns = None
+        if self.control is not None:
+            self._paused_ns = self.control.paused_ns
+
+    def deadline(self, timestamp_ns):
+        """Thời điểm đích (theo clock) của sự kiện có timestamp này"""
+        return self.origin_ns + (((timestamp_ns - self.base_ns) * self.scale_q16) >> 16)
+
+    def _shift_for_pause(self):
+        """Dời mốc lịch theo thời gian tạm dừng mới kể từ lần kiểm tra trước"""
+        paused = self.control.paused_ns - self._paused_ns
+        if paused:
+            self._paused_ns += paused
+            self.origin_ns += paused
+            if self.last_fire_ns is not None:
+                self.last_fire_ns += paused
+                self.last_deadline_ns += paused
+
+    def wait(self, timestamp_ns):
+        """
+        Ngủ tới thời điểm đích của sự kiện; trả về độ trễ (ns) so với lịch
+        (0 nếu bị dừng giữa chừng).
+        """
+        if self.origin_ns is None:
+            self.start()
+        control = self.control
+
+        while True:
+            if control is not None:
+                self._shift_for_pause()
+            deadline = self.deadline(timestamp_ns)
+
+            target = deadline
+            if self.last_fire_ns is not None and target < self.last_fire_ns + self.min_gap_ns:
+                target = self.last_fire_ns + self.min_gap_ns
+
+            now = self.clock()
+            if target > now:
+                now = self.timer.sleep_until(target)
+
+            if control is None or (now >= target and control.state == RUNNING
+                                   and control.paused_ns == self._paused_ns):
+                break
+            # Woken by stop/pause (or a pause began and ended during the sleep):
+            # wait out a pause, then recompute the shifted deadline
+            if not control.is_running():
+                return 0
+
+        lateness = now - deadline
+        self.lateness.add(lateness if lateness > 0 else 0)
+        self.last_fire_ns = now
+        self.last_deadline_ns = deadline
+        return lateness
+
+    def elapsed(self):
+        """Thời gian đã phát (giây) tính từ mốc bắt đầu"""
+        return (self.clock() - self.origin_ns) / NS_PER_SECOND if self.origin_ns is not None else 0.0
+
+    def scheduled_duration(self):
+        """Thời lượng theo lịch (giây) tới sự kiện gần nhất"""
+        if self.last_deadline_ns is None:
+            return 0.0
+        return (self.last_deadline_ns - self.origin_ns) / NS_PER_SECOND
+
+    def report(self):
+        """Dict thống kê: thời lượng thực/theo lịch, độ trễ và overshoot của timer"""
+        report = self.lateness.to_dict()
+        report['elapsed'] = self.elapsed()
+        report['scheduled'] = self.scheduled_duration()
+        report['timer'] = self.timer.stats()
+        return report
+
+
+class MoveCoalescer:
+    """
+    Gộp các mouse_move liên tiếp khi phát lại: ứng dụng chỉ cần vị trí chuột
+    theo nhịp khung hình, nên một move được bỏ qua nếu move ngay sau nó đã
+    tới hạn (scheduler đang trễ lịch) hoặc cùng khung `1/max_rate` giây theo
+    lịch. Move cuối cùng trước sự kiện khác (click, cuộn, phím...) luôn được
+    phát và thứ tự sự kiện không đổi; chỉ mouse_move bị bỏ.
+
+    `max_rate` = 0: chỉ gộp khi trễ lịch; > 0: thêm giới hạn N move/giây.
+    """
+
+    def __init__(self, move_func, max_rate=0.0):
+        self.move_func = move_func
+        self.frame_ns = round(NS_PER_SECOND / max_rate) if max_rate and max_rate > 0 else 0
+        self.moves = 0
+        self.coalesced = 0
+
+    def _mergeable(self, current_ns, upcoming_ns, scheduler):
+        deadline = scheduler.deadline(upcoming_ns)
+        if deadline <= scheduler.clock():
+            return True
+        if self.frame_ns:
+            origin = scheduler.origin_ns
+            return (scheduler.deadline(current_ns) - origin) // self.frame_ns == (deadline - origin) // self.frame_ns
+        return False
+
+    def filter(self, steps, scheduler):
+        """Yield các bước `(timestamp_ns, hàm, args)` sau khi bỏ các move bị gộp"""
+        move = self.move_func
+        iterator = iter(steps)
+        current = next(iterator, None)
+        if current is None:
+            return
+        if scheduler.origin_ns is None:
+            scheduler.start()
+
+        for upcoming in iterator:
+            # Decided lazily, right before the step is due, so "behind" uses the current clock
+            if current[1] == move:
+                self.moves += 1
+                if upcoming[1] == move and self._mergeable(current[0], upcoming[0], scheduler):
+                    self.coalesced += 1
+                    current = upcoming
+                    continue
+            yield current
+            current = upcoming
+
+        if current[1] == move:
+            self.moves += 1
+        yield current
+
+
+def run_plan(steps, scheduler, is_running, progress=None, progress_every=25, coalescers=()):
+    """
+    Vòng phát lại dùng chung: chờ thời điểm đích của từng bước
+    `(timestamp_ns, hàm, args)` rồi gọi hàm. `is_running()` được kiểm tra
+    trước và sau mỗi lần chờ; `progress(số bước đã qua)` được gọi mỗi
+    `progress_every` bước. `coalescers` (MoveCoalescer, TypingCoalescer...)
+    lọc các bước theo thứ tự; bước bị gộp được tính là đã hoàn thành.
+    Trả về số sự kiện đã hoàn thành.
+    """
+    for coalescer in coalescers:
+        steps = coalescer.filter(steps, scheduler)
+    wait = scheduler.wait
+    completed = 0
+
+    for i, (timestamp_ns, func, args) in enumerate(steps):
+        if not is_running():
+            break
+
+        wait(timestamp_ns)
+
+        if not is_running():
+            break
+
+        try:
+            if func is not None:
+                func(*args)
+            completed += 1
+        except Exception as e:
+            print(f"❌ Lỗi khi thực hiện sự kiện: {e}")
+
+        if progress and (i + 1) % progress_every == 0:
+            progress(i + 1 + sum(coalescer.coalesced for coalescer in coalescers))
+
+    return completed + sum(coalescer.coalesced for coalescer in coalescers)
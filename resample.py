@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Lấy mẫu lại (resample) đường đi chuột của macro theo nhịp đều.
+
+pynput gửi mouse_move không đều (dồn cục rồi ngắt quãng) và replay phát lại
+đúng sự không đều đó, mỗi mẫu một lệnh moveTo. Ở đây mỗi đoạn mouse_move
+liên tiếp (giữa các click/scroll/phím) được thay bằng quỹ đạo nội suy tuyến
+tính tại các thời điểm cách đều `1/rate` giây tính từ mẫu đầu đoạn. Mẫu đầu
+và mẫu cuối mỗi đoạn giữ nguyên vị trí và thời điểm, nên vị trí chuột ngay
+trước mỗi click/scroll/phím không đổi; các sự kiện không phải mouse_move giữ
+nguyên. Điểm trùng vị trí với điểm trước đó trong đoạn (chuột đứng yên) bị bỏ.
+
+Sử dụng:
+    python resample.py macro.json [-o macro_60hz.json] [--rate 60]
+"""
+
+import argparse
+import os
+import sys
+import time
+import weakref
+from array import array
+from bisect import bisect_right
+
+from event_store import COLUMN_LAYOUT, EVENT_MOUSE_MOVE, NS_PER_SECOND, EventStore
+from macro_io import build_macro_data, read_macro, write_macro
+from simplify import estimate_replay_time, move_runs
+
+try:
+    import numpy as np
+except ImportError:  # NumPy là tùy chọn, có bản thuần Python dự phòng
+    np = None
+
+
+def _resample_numpy(events, period):
+    """Các cột (dict tên cột -> numpy array) của macro đã resample"""
+    types = np.frombuffer(events.types, dtype=np.uint8)
+    ts = np.frombuffer(events.timestamps, dtype=np.int64)
+    xs = np.frombuffer(events.xs, dtype=np.int32)
+    ys = np.frombuffer(events.ys, dtype=np.int32)
+    starts, ends = move_runs(events.types)
+
+    # Grid points t0 + j*period (j >= 0) strictly before the run's last sample,
+    # followed by the last sample itself
+    t0, t1 = ts[starts], ts[ends]
+    counts = np.where(t1 > t0, (t1 - t0 - 1) // period + 1, 0)
+    sizes = counts + 1
+    offsets = np.cumsum(sizes) - sizes
+    run = np.repeat(np.arange(len(starts)), sizes)
+    j = np.arange(sizes.sum()) - offsets[run]
+    is_first = j == 0
+    is_last = j == counts[run]
+    grid = t0[run] + j * period
+    grid[is_last] = t1[run][is_last]
+
+    # Queries fall inside their own run's time span, so interpolating over all
+    # move samples at once never mixes runs
+    is_move = types == EVENT_MOUSE_MOVE
+    move_ts = ts[is_move]
+    gx = np.rint(np.interp(grid, move_ts, xs[is_move])).astype(np.int32)
+    gy = np.rint(np.interp(grid, move_ts, ys[is_move])).astype(np.int32)
+    gx[is_first] = xs[starts]
+    gy[is_first] = ys[starts]
+    gx[is_last] = xs[ends][run[is_last]]
+    gy[is_last] = ys[ends][run[is_last]]
+
+    # Drop points where the pointer has not moved since the previous point
+    repeated = np.zeros(len(grid), dtype=bool)
+    repeated[1:] = (gx[1:] == gx[:-1]) & (gy[1:] == gy[:-1]) & (run[1:] == run[:-1])
+    keep = ~repeated | is_last
+
+    other = np.flatnonzero(~is_move)
+    # Every point of a run sorts at the run's first index, before the next non-move event
+    order = np.argsort(np.concatenate((starts[run[keep]], other)), kind='stable')
+    moves = int(keep.sum())
+    return {
+        'timestamps': np.concatenate((grid[keep], ts[other]))[order],
+        'xs': np.concatenate((gx[keep], xs[other]))[order],
+        'ys': np.concatenate((gy[keep], ys[other]))[order],
+        'arg1': np.concatenate((np.zeros(moves, dtype=np.int32), np.frombuffer(events.arg1, dtype=np.int32)[other]))[order],
+        'arg2': np.concatenate((np.zeros(moves, dtype=np.int32), np.frombuffer(events.arg2, dtype=np.int32)[other]))[order],
+        'types': np.concatenate((np.zeros(moves, dtype=np.uint8), types[other]))[order],
+    }
+
+
+def _resample_run_python(ts, xs, ys, period):
+    """List (timestamp_ns, x, y) cho một đoạn move"""
+    t0, t1 = ts[0], ts[-1]
+    points = [(t0, xs[0], ys[0])]
+    grid = t0 + period
+    while grid < t1:
+        i = bisect_right(ts, grid)  # ts[i - 1] <= grid < ts[i]
+        left, right = i - 1, i
+        frac = (grid - ts[left]) / (ts[right] - ts[left])
+        x = round(xs[left] + (xs[right] - xs[left]) * frac)
+        y = round(ys[left] + (ys[right] - ys[left]) * frac)
+        if (x, y) != points[-1][1:]:
+            points.append((grid, x, y))
+        grid += period
+    if t1 > t0:
+        points.append((t1, xs[-1], ys[-1]))
+    else:
+        points[-1] = (t1, xs[-1], ys[-1])
+    return points
+
+
+def _resample_python(events, period):
+    columns = {name: array(typecode) for name, typecode in COLUMN_LAYOUT}
+    types = events.types
+    starts, ends = move_runs(types)
+    runs = dict(zip(starts, ends))
+
+    i = 0
+    while i < len(types):
+        end = runs.get(i)
+        if end is None:
+            for name, _ in COLUMN_LAYOUT:
+                columns[name].append(getattr(events, name)[i])
+            i += 1
+            continue
+        points = _resample_run_python(events.timestamps[i:end + 1], events.xs[i:end + 1],
+                                      events.ys[i:end + 1], period)
+        for timestamp_ns, x, y in points:
+            columns['timestamps'].append(timestamp_ns)
+            columns['xs'].append(x)
+            columns['ys'].append(y)
+            columns['arg1'].append(0)
+            columns['arg2'].append(0)
+            columns['types'].append(EVENT_MOUSE_MOVE)
+        i = end + 1
+    return columns
+
+
+def resample_events(events, rate=60.0):
+    """
+    Resample các đoạn mouse_move của EventStore về `rate` điểm/giây.
+    Trả về EventStore mới (dùng chung bảng chuỗi).
+    """
+    if rate <= 0:
+        raise ValueError("rate phải > 0")
+    period = max(1, round(NS_PER_SECOND / rate))
+    if not events.stats.counts[EVENT_MOUSE_MOVE]:
+        return events.copy()
+
+    if np is not None:
+        resampled = _resample_numpy(events, period)
+        columns = {}
+        for name, typecode in COLUMN_LAYOUT:
+            column = array(typecode)
+            column.frombytes(resampled[name].tobytes())
+            columns[name] = column
+    else:
+        columns = _resample_python(events, period)
+
+    return EventStore.from_columns(columns, events.strings)
+
+
+# EventStore -> (rate, type column, length, resampled store)
+_resampled = weakref.WeakKeyDictionary()
+
+
+def get_resampled(events, rate):
+    """
+    Bản resample của EventStore, tính lần đầu rồi dùng lại cho các lần phát
+    sau (tính lại nếu đổi rate hoặc store đã thay đổi).
+    """
+    cached = _resampled.get(events)
+    if cached is None or cached[0] != rate or cached[1] is not events.types or cached[2] != len(events):
+        cached = _resampled[events] = (rate, events.types, len(events), resample_events(events, rate))
+    return cached[3]
+
+
+def resample_file(input_file, output_file, rate=60.0):
+    """Resample một file macro và ghi ra file mới. Trả về dict thống kê."""
+    data = read_macro(input_file)
+    events = data['events']
+
+    start = time.perf_counter()
+    resampled = resample_events(events, rate)
+    elapsed = time.perf_counter() - start
+
+    recording_info = data.get('recording_info', {})
+    timing_stats = data.get('timing_stats', {})
+    new_data = build_macro_data(
+        resampled,
+        start_time=recording_info.get('start_time'),
+        end_time=recording_info.get('end_time'),
+        actual_duration=recording_info.get('actual_duration'),
+        smooth_factor=timing_stats.get('smooth_factor', 1.0),
+        replay_options=data.get('replay_options')
+    )
+    write_macro(output_file, new_data)
+
+    return {
+        'events_before': len(events),
+        'events_after': len(resampled),
+        'moves_before': events.stats.count('mouse_move'),
+        'moves_after': resampled.stats.count('mouse_move'),
+        'replay_before': estimate_replay_time(events),
+        'replay_after': estimate_replay_time(resampled),
+        'elapsed': elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resample đường đi chuột của macro theo nhịp đều")
+    parser.add_argument('input', help="File macro (.json/.mrb/.mrz)")
+    parser.add_argument('-o', '--output', help="File kết quả (mặc định: <tên>_<rate>hz.json)")
+    parser.add_argument('-r', '--rate', type=float, default=60.0, help="Số điểm mỗi giây (mặc định 60)")
+    args = parser.parse_args()
+
+    output = args.output or f"{os.path.splitext(args.input)[0]}_{args.rate:g}hz.json"
+
+    try:
+        stats = resample_file(args.input, output, args.rate)
+    except FileNotFoundError:
+        print(f"❌ Không tìm thấy file: {args.input}")
+        return 1
+    except Exception as e:
+        print(f"❌ Lỗi khi resample macro: {e}")
+        return 1
+
+    print(f"✅ Đã lưu macro resample {args.rate:g} Hz: {output}")
+    print(f"   🖱️  mouse_move: {stats['moves_before']} → {stats['moves_after']}")
+    print(f"   📝 Sự kiện: {stats['events_before']} → {stats['events_after']}")
+    print(f"   ⏱️  Thời gian phát lại ước tính: {stats['replay_before']:.2f}s → {stats['replay_after']:.2f}s")
+    print(f"   ⚡ Xử lý trong {stats['elapsed'] * 1000:.0f}ms ({'NumPy' if np is not None else 'Python'})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Đơn giản hóa đường đi chuột của macro đã lưu (Ramer–Douglas–Peucker).
+
+Mỗi đoạn mouse_move liên tiếp (giữa các click/scroll/phím) được rút gọn
+bằng RDP; điểm đầu và cuối mỗi đoạn luôn được giữ, các sự kiện không phải
+mouse_move và timestamp của mọi sự kiện được giữ nguyên.
+
+Sử dụng:
+    python simplify.py macro.json [-o macro_simplified.json] [--epsilon 2]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from event_store import EVENT_MOUSE_MOVE, EVENT_MOUSE_CLICK, EVENT_MOUSE_SCROLL, EVENT_KEY_PRESS, NS_PER_SECOND
+from macro_io import build_macro_data, read_macro, write_macro
+
+try:
+    import numpy as np
+except ImportError:  # NumPy là tùy chọn, có bản thuần Python dự phòng
+    np = None
+
+
+def move_runs(types):
+    """Trả về list (start, end) (bao gồm end) của các đoạn mouse_move liên tiếp"""
+    if np is not None:
+        is_move = np.frombuffer(types, dtype=np.uint8) == EVENT_MOUSE_MOVE
+        edges = np.diff(np.concatenate(([False], is_move, [False])).astype(np.int8))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1) - 1
+        return starts, ends
+
+    runs_start, runs_end = [], []
+    start = None
+    for i, code in enumerate(types):
+        if code == EVENT_MOUSE_MOVE:
+            if start is None:
+                start = i
+        elif start is not None:
+            runs_start.append(start)
+            runs_end.append(i - 1)
+            start = None
+    if start is not None:
+        runs_start.append(start)
+        runs_end.append(len(types) - 1)
+    return runs_start, runs_end
+
+
+def _rdp_keep_numpy(xs, ys, starts, ends, epsilon):
+    """
+    RDP cho tất cả các đoạn cùng lúc: mỗi vòng lặp xử lý toàn bộ các
+    segment đang mở bằng phép toán vector, nên số vòng ~ độ sâu đệ quy.
+    """
+    xs = np.frombuffer(xs, dtype=np.int32).astype(np.float64)
+    ys = np.frombuffer(ys, dtype=np.int32).astype(np.float64)
+    keep = np.zeros(len(xs), dtype=bool)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    keep[starts] = True
+    keep[ends] = True
+
+    open_segments = ends - starts > 1
+    seg_start = starts[open_segments]
+    seg_end = ends[open_segments]
+
+    while len(seg_start):
+        counts = seg_end - seg_start - 1
+        offsets = np.cumsum(counts) - counts
+        seg = np.repeat(np.arange(len(seg_start)), counts)
+        idx = np.arange(counts.sum()) - offsets[seg] + seg_start[seg] + 1
+
+        ax = xs[seg_start][seg]
+        ay = ys[seg_start][seg]
+        dx = xs[seg_end][seg] - ax
+        dy = ys[seg_end][seg] - ay
+        px = xs[idx] - ax
+        py = ys[idx] - ay
+
+        # Perpendicular distance to the chord (point distance if degenerate)
+        norm = np.hypot(dx, dy)
+        safe_norm = np.where(norm > 0, norm, 1.0)
+        dist = np.where(norm > 0, np.abs(dx * py - dy * px) / safe_norm, np.hypot(px, py))
+
+        seg_max = np.maximum.reduceat(dist, offsets)
+        hits = np.flatnonzero(dist == seg_max[seg])
+        _, first_hit = np.unique(seg[hits], return_index=True)
+        split = idx[hits[first_hit]]
+
+        over = seg_max > epsilon
+        split = split[over]
+        keep[split] = True
+
+        seg_start, seg_end = (np.concatenate((seg_start[over], split)),
+                              np.concatenate((split, seg_end[over])))
+        open_segments = seg_end - seg_start > 1
+        seg_start = seg_start[open_segments]
+        seg_end = seg_end[open_segments]
+
+    return np.flatnonzero(keep)
+
+
+def _rdp_keep_python(xs, ys, starts, ends, epsilon):
+    keep = set()
+    for start, end in zip(starts, ends):
+        keep.add(start)
+        keep.add(end)
+        stack = [(start, end)]
+        while stack:
+            first, last = stack.pop()
+            if last - first < 2:
+                continue
+            ax, ay = xs[first], ys[first]
+            dx, dy = xs[last] - ax, ys[last] - ay
+            norm = (dx * dx + dy * dy) ** 0.5
+            best, best_dist = first, -1.0
+            for i in range(first + 1, last):
+                px, py = xs[i] - ax, ys[i] - ay
+                if norm > 0:
+                    dist = abs(dx * py - dy * px) / norm
+                else:
+                    dist = (px * px + py * py) ** 0.5
+                if dist > best_dist:
+                    best, best_dist = i, dist
+            if best_dist > epsilon:
+                keep.add(best)
+                stack.append((first, best))
+                stack.append((best, last))
+    return sorted(keep)
+
+
+def simplify_events(events, epsilon=2.0):
+    """
+    Rút gọn các đoạn mouse_move của EventStore bằng RDP với ngưỡng
+    `epsilon` pixel. Trả về EventStore mới.
+    """
+    starts, ends = move_runs(events.types)
+
+    if np is not None:
+        kept_moves = _rdp_keep_numpy(events.xs, events.ys, starts, ends, epsilon)
+        other = np.flatnonzero(np.frombuffer(events.types, dtype=np.uint8) != EVENT_MOUSE_MOVE)
+        indices = np.union1d(kept_moves, other).tolist()
+    else:
+        kept_moves = _rdp_keep_python(events.xs, events.ys, starts, ends, epsilon)
+        other = [i for i, code in enumerate(events.types) if code != EVENT_MOUSE_MOVE]
+        indices = sorted(set(kept_moves).union(other))
+
+    return events.take(indices)
+
+
+def estimate_replay_time(events, speed_multiplier=1.0, min_delay=0.01, smooth_factor=1.0, pause=0.0):
+    """
+    Ước tính thời gian phát lại (giây) theo cách scheduler của replay chờ:
+    mỗi sự kiện chạy ở thời điểm đích `timestamp * smooth / speed`, nhưng
+    không sớm hơn lệnh trước cộng max(min_delay * smooth / speed, `pause`)
+    (thời gian mỗi lệnh phát chuột/phím chiếm, mặc định bỏ qua). Trễ không cộng dồn: lệnh bị giãn ra sẽ
+    đuổi kịp lịch ở các khoảng nghỉ sau.
+    """
+    timestamps = events.timestamps
+    if not timestamps:
+        return 0.0
+
+    scale = smooth_factor / speed_multiplier
+    min_gap = min_delay * scale
+    if np is not None:
+        deadlines = np.frombuffer(timestamps, dtype=np.int64) / NS_PER_SECOND * scale
+
+        types = np.frombuffer(events.types, dtype=np.uint8)
+        pressed = np.frombuffer(events.arg2, dtype=np.int32) != 0
+        injected = (np.isin(types, (EVENT_MOUSE_MOVE, EVENT_MOUSE_SCROLL, EVENT_KEY_PRESS))
+                    | ((types == EVENT_MOUSE_CLICK) & pressed))
+
+        # fire[i] = max(deadline[i], fire[i-1] + gap[i]) unrolled as
+        # fire[i] = G[i] + max(deadline[j] - G[j] for j <= i), G = cumulative gaps
+        gaps = np.maximum(min_gap, np.where(injected[:-1], pause, 0.0))
+        cumulative = np.concatenate(([0.0], np.cumsum(gaps)))
+        fire = cumulative + np.maximum.accumulate(deadlines - cumulative)
+        return float(fire[-1]) + (pause if injected[-1] else 0.0)
+
+    fire = None
+    gap = 0.0
+    for i, ts in enumerate(timestamps):
+        deadline = ts / NS_PER_SECOND * scale
+        fire = deadline if fire is None else max(deadline, fire + gap)
+
+        code = events.types[i]
+        injected = (code in (EVENT_MOUSE_MOVE, EVENT_MOUSE_SCROLL, EVENT_KEY_PRESS)
+                    or (code == EVENT_MOUSE_CLICK and events.arg2[i]))
+        gap = max(min_gap, pause if injected else 0.0)
+
+    return fire + (pause if injected else 0.0)
+
+
+def simplify_file(input_file, output_file, epsilon=2.0):
+    """Rút gọn một file macro và ghi ra file mới. Trả về dict thống kê."""
+    data = read_macro(input_file)
+    events = data['events']
+
+    start = time.perf_counter()
+    simplified = simplify_events(events, epsilon)
+    elapsed = time.perf_counter() - start
+
+    recording_info = data.get('recording_info', {})
+    timing_stats = data.get('timing_stats', {})
+    new_data = build_macro_data(
+        simplified,
+        start_time=recording_info.get('start_time'),
+        end_time=recording_info.get('end_time'),
+        actual_duration=recording_info.get('actual_duration'),
+        smooth_factor=timing_stats.get('smooth_factor', 1.0),
+        replay_options=data.get('replay_options')
+    )
+    write_macro(output_file, new_data)
+
+    return {
+        'events_before': len(events),
+        'events_after': len(simplified),
+        'replay_before': estimate_replay_time(events),
+        'replay_after': estimate_replay_time(simplified),
+        'elapsed': elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rút gọn đường đi chuột của macro (RDP)")
+    parser.add_argument('input', help="File macro JSON")
+    parser.add_argument('-o', '--output', help="File kết quả (mặc định: <tên>_simplified.json)")
+    parser.add_argument('-e', '--epsilon', type=float, default=2.0,
+                        help="Sai số tối đa cho phép (pixel, mặc định 2)")
+    args = parser.parse_args()
+
+    output = args.output or f"{os.path.splitext(args.input)[0]}_simplified.json"
+
+    try:
+        stats = simplify_file(args.input, output, args.epsilon)
+    except FileNotFoundError:
+        print(f"❌ Không tìm thấy file: {args.input}")
+        return 1
+    except Exception as e:
+        print(f"❌ Lỗi khi rút gọn macro: {e}")
+        return 1
+
+    before, after = stats['events_before'], stats['events_after']
+    reduction = (1 - after / before) * 100 if before else 0
+    print(f"✅ Đã lưu macro rút gọn: {output}")
+    print(f"   📝 Sự kiện: {before} → {after} (-{reduction:.1f}%)")
+    print(f"   ⏱️  Thời gian phát lại ước tính: {stats['replay_before']:.2f}s → {stats['replay_after']:.2f}s")
+    print(f"   ⚡ Xử lý trong {stats['elapsed'] * 1000:.0f}ms ({'NumPy' if np is not None else 'Python'})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+"""Fixture dùng chung cho các test"""
+
+import pytest
+
+from event_store import EVENT_KEY_PRESS, EVENT_KEY_RELEASE, EventStore
+
+MS = 1_000_000
+
+
+@pytest.fixture
+def events():
+    """Macro nhỏ có đủ mọi loại sự kiện (kể cả phím không có tên)"""
+    store = EventStore()
+    store.append_move(0, 10, 20)
+    store.append_move(5 * MS, 12, 24)
+    store.append_click(12 * MS, 12, 24, 'Button.left', True)
+    store.append_click(30 * MS, 12, 24, 'Button.left', False)
+    store.append_scroll(41 * MS, 12, 24, 0, -3)
+    store.append_key(EVENT_KEY_PRESS, 50 * MS, 'Key.shift')
+    store.append_key(EVENT_KEY_PRESS, 51 * MS, 'A')
+    store.append_key(EVENT_KEY_RELEASE, 60 * MS, 'A')
+    store.append_key(EVENT_KEY_RELEASE, 61 * MS, 'Key.shift')
+    store.append_key(EVENT_KEY_PRESS, 70 * MS, None)
+    store.append_move(1_234_567_891, -5, 3000)
+    return store
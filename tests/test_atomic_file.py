@@ -0,0 +1,55 @@
+"""Test ghi nguyên tử: file cũ nguyên vẹn khi lỗi, quyền file như open() thường"""
+
+import os
+import stat
+
+import pytest
+
+from atomic_file import atomic_write
+
+posix_only = pytest.mark.skipif(os.name == 'nt', reason="quyền file kiểu POSIX")
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_replaces_file(tmp_path):
+    path = tmp_path / 'macro.json'
+    path.write_text('old', encoding='utf-8')
+    with atomic_write(str(path), 'w', encoding='utf-8') as f:
+        f.write('new')
+    assert path.read_text(encoding='utf-8') == 'new'
+    assert os.listdir(tmp_path) == ['macro.json']
+
+
+def test_error_keeps_old_file(tmp_path):
+    path = tmp_path / 'macro.json'
+    path.write_bytes(b'old')
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path)) as f:
+            f.write(b'half written')
+            raise RuntimeError("disk full")
+    assert path.read_bytes() == b'old'
+    assert os.listdir(tmp_path) == ['macro.json']
+
+
+@posix_only
+def test_new_file_follows_umask(tmp_path):
+    old_umask = os.umask(0o027)
+    try:
+        with atomic_write(str(tmp_path / 'macro.mrb')) as f:
+            f.write(b'data')
+    finally:
+        os.umask(old_umask)
+    assert _mode(tmp_path / 'macro.mrb') == 0o640
+
+
+@posix_only
+def test_overwrite_keeps_permissions(tmp_path):
+    path = tmp_path / 'macro.mrb'
+    path.write_bytes(b'old')
+    os.chmod(path, 0o600)
+    with atomic_write(str(path)) as f:
+        f.write(b'new')
+    assert _mode(path) == 0o600
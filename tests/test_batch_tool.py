@@ -0,0 +1,93 @@
+"""Test batch_tool: chọn file cần xử lý khi ghi lại tại chỗ và khi chuyển format, kiểm tra hợp lệ"""
+
+import argparse
+import os
+
+from batch_tool import plan_tasks, process_file, validate_events
+from event_store import EVENT_KEY_PRESS, EventStore
+from macro_io import build_macro_data, write_macro
+
+
+def _args(**kwargs):
+    defaults = {'output_dir': None, 'compression': 'zlib', 'compact': False, 'epsilon': 2.0, 'force': False}
+    return argparse.Namespace(**dict(defaults, **kwargs))
+
+
+def _run(command, files, args):
+    tasks, skipped = plan_tasks(command, files, args)
+    for task in tasks:
+        assert process_file(task)['status'] == 'ok'
+    return [task[1] for task in tasks], skipped
+
+
+def test_reencode_compact_rewrites_indented_json(tmp_path, events):
+    path = str(tmp_path / 'macro.json')
+    write_macro(path, build_macro_data(events))
+
+    planned, skipped = _run('reencode', [path], _args(compact=True))
+    assert planned == [path] and skipped == []
+    with open(path, 'rb') as f:
+        assert f.read(2) == b'{"'
+
+    # Now compact on disk: nothing to do for --compact, but plain reencode re-indents
+    assert plan_tasks('reencode', [path], _args(compact=True)) == ([], [path])
+    planned, _ = _run('reencode', [path], _args())
+    assert planned == [path]
+    assert plan_tasks('reencode', [path], _args()) == ([], [path])
+
+
+def test_reencode_compressed_with_other_compression(tmp_path, events):
+    path = str(tmp_path / 'macro.mrz')
+    write_macro(path, build_macro_data(events), compression='zlib')
+    assert plan_tasks('reencode', [path], _args()) == ([], [path])
+
+    planned, _ = _run('reencode', [path], _args(compression='lzma'))
+    assert planned == [path]
+    assert plan_tasks('reencode', [path], _args(compression='lzma')) == ([], [path])
+
+
+def test_reencode_force_and_old_header(tmp_path, events):
+    path = str(tmp_path / 'macro.json')
+    write_macro(path, build_macro_data(events))
+    assert len(plan_tasks('reencode', [path], _args(force=True))[0]) == 1
+
+    write_macro(path, {'version': '2.0', 'events': events})
+    assert len(plan_tasks('reencode', [path], _args())[0]) == 1
+
+
+def test_convert_skips_newer_output(tmp_path, events):
+    path = str(tmp_path / 'macro.json')
+    write_macro(path, build_macro_data(events))
+    args = _args(to='mrb')
+
+    planned, _ = _run('convert', [path], args)
+    assert planned == [path]
+    assert plan_tasks('convert', [path], args) == ([], [path])
+
+    os.utime(path, ns=(os.stat(path).st_mtime_ns + 10 ** 9,) * 2)
+    assert len(plan_tasks('convert', [path], args)[0]) == 1
+
+
+def _validate(path):
+    tasks, _ = plan_tasks('validate', [path], _args())
+    return process_file(tasks[0])
+
+
+def test_validate_accepts_keys_without_name(tmp_path, events):
+    # The fixture holds a key event whose key is None (stored as NO_STRING)
+    assert validate_events({'events': events}) == []
+    path = str(tmp_path / 'macro.mrb')
+    write_macro(path, build_macro_data(events))
+    result = _validate(path)
+    assert result['status'] == 'ok' and result['events'] == len(events)
+
+
+def test_validate_reports_bad_string_id(tmp_path):
+    events = EventStore()
+    events.append_key(EVENT_KEY_PRESS, 0, 'a')
+    events.append_raw(EVENT_KEY_PRESS, 1_000_000, 0, 0, 5, 0)
+    path = str(tmp_path / 'macro.mrb')
+    write_macro(path, build_macro_data(events))
+    result = _validate(path)
+    assert result['status'] == 'invalid'
+    assert 'sự kiện 1: id chuỗi không hợp lệ 5' in result['message']
@@ -0,0 +1,67 @@
+"""Test EventStore: view dạng dict, thống kê cộng dồn, freeze/copy"""
+
+import pytest
+
+from event_store import EVENT_MOUSE_MOVE, EventStore
+
+
+def test_sequence_view(events):
+    assert len(events) == 11
+    assert events[0] == {'type': 'mouse_move', 'timestamp': 0.0, 'x': 10, 'y': 20}
+    assert events[2] == {'type': 'mouse_click', 'timestamp': 0.012, 'x': 12, 'y': 24,
+                         'button': 'Button.left', 'pressed': True}
+    assert events[4]['dy'] == -3
+    assert events[-2] == {'type': 'key_press', 'timestamp': 0.07, 'key': None}
+    assert events[-1]['timestamp'] == pytest.approx(1.234567891)
+    with pytest.raises(IndexError):
+        events[len(events)]
+
+
+def test_dict_round_trip(events):
+    rebuilt = EventStore.from_events(events.to_list())
+    assert list(rebuilt.timestamps) == list(events.timestamps)
+    assert rebuilt.to_list() == events.to_list()
+
+
+def test_extend_matches_append(events):
+    appended = EventStore()
+    for event in events:
+        appended.append(event)
+    extended = EventStore()
+    extended.extend(events.to_list())
+    assert appended.to_list() == extended.to_list()
+    assert appended.stats.to_dict() == extended.stats.to_dict()
+
+
+def test_running_stats_match_full_pass(events):
+    stats = events.stats
+    delays = [b - a for a, b in zip(events.timestamps, events.timestamps[1:])]
+    assert stats.event_counts() == {'mouse_move': 3, 'mouse_click': 2, 'mouse_scroll': 1,
+                                    'key_press': 3, 'key_release': 2}
+    assert stats.duration == pytest.approx(1.234567891)
+    assert stats.min_delay == pytest.approx(min(delays) / 1e9)
+    assert stats.max_delay == pytest.approx(max(delays) / 1e9)
+    assert stats.average_delay == pytest.approx(sum(delays) / len(delays) / 1e9)
+
+
+def test_slice_and_take(events):
+    part = events[2:5]
+    assert part.to_list() == events.to_list()[2:5]
+    assert part.stats.count('mouse_click') == 2
+
+
+def test_freeze_is_read_only_and_copy_is_writable(events):
+    expected = events.to_list()
+    events.freeze()
+    assert events.read_only and events.frozen
+    with pytest.raises(TypeError):
+        events.types[0] = 1
+    with pytest.raises(TypeError):
+        events.clear()
+
+    copy = events.copy()
+    assert not copy.read_only
+    copy.append_move(2_000_000_000, 1, 1)
+    assert len(copy) == len(events) + 1
+    assert events.to_list() == expected
+    assert copy.types[-1] == EVENT_MOUSE_MOVE
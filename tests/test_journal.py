@@ -0,0 +1,45 @@
+"""Test journal ghi nối tiếp: không ghi đè journal khác, khôi phục từ journal dở dang"""
+
+from journal import JournalWriter, read_journal, recover_journal
+from macro_io import read_macro
+
+
+def _write_journal(path, events, **kwargs):
+    writer = JournalWriter(str(path), events, start_time=1.0, batch_size=4, **kwargs)
+    writer.start()
+    writer.close(end_time=2.0, duration_ns=events.timestamps[-1])
+    return writer
+
+
+def test_journal_round_trip(tmp_path, events):
+    writer = _write_journal(tmp_path / 'rec.journal', events)
+    header, restored, end_info = read_journal(writer.path)
+    assert header['start_time'] == 1.0
+    assert end_info == {'end_time': 2.0, 'duration_ns': events.timestamps[-1]}
+    assert restored.to_list() == events.to_list()
+    assert writer.batches == 3
+
+
+def test_same_name_does_not_truncate_other_journal(tmp_path, events):
+    path = tmp_path / 'rec.journal'
+    first = _write_journal(path, events)
+    second = _write_journal(path, events[:2])
+
+    assert first.path == str(path)
+    assert second.path == str(tmp_path / 'rec_1.journal')
+    assert len(read_journal(first.path)[1]) == len(events)
+    assert len(read_journal(second.path)[1]) == 2
+
+
+def test_recover_partial_journal(tmp_path, events):
+    writer = _write_journal(tmp_path / 'rec.journal', events)
+    with open(writer.path, encoding='utf-8') as f:
+        lines = f.readlines()
+    # Crash: no end marker and the last batch cut in half
+    with open(writer.path, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:-2])
+        f.write(lines[-2][:len(lines[-2]) // 2])
+
+    output = tmp_path / 'recovered.json'
+    assert recover_journal(writer.path, str(output)) == 8
+    assert read_macro(str(output))['events'].to_list() == events.to_list()[:8]
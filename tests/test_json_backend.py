@@ -0,0 +1,44 @@
+"""Test json_backend: mọi backend cài trên máy ghi/đọc giống nhau và raise ValueError khi JSON lỗi"""
+
+import pytest
+
+import json_backend
+from json_backend import available_backends, load_backend
+from macro_io import read_macro
+
+BACKENDS = available_backends()
+
+
+@pytest.fixture
+def use_backend(monkeypatch):
+    def use(name):
+        monkeypatch.setattr(json_backend, '_current', load_backend(name))
+    return use
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+@pytest.mark.parametrize('indent', [True, False])
+def test_round_trip(name, indent):
+    backend = load_backend(name)
+    obj = {'version': '2.0', 'events': [{'type': 'key_press', 'key': 'ă', 'time': 0.5}], 'none': None}
+    assert backend.loads(backend.dumps(obj, indent)) == obj
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_malformed_json_raises_value_error(name):
+    with pytest.raises(ValueError):
+        load_backend(name).loads(b'{"events": [')
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_read_macro_malformed_raises_value_error(tmp_path, use_backend, name):
+    use_backend(name)
+    path = tmp_path / 'macro.json'
+    path.write_bytes(b'{"version": "2.0", "events": [}')
+    with pytest.raises(ValueError):
+        read_macro(str(path))
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        load_backend('simdjson')
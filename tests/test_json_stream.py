@@ -0,0 +1,74 @@
+"""Test JsonMacroStream: kết quả giống json.load với mọi kích thước khối"""
+
+import json
+
+import pytest
+
+from benchmark_io import synthetic_events
+from macro_io import JsonMacroStream, build_macro_data, open_macro_stream, write_macro
+
+CHUNK_SIZES = [1, 2, 3, 5, 7, 11, 64, 1 << 20]
+
+# Header fields before and after the events array, escapes, unicode,
+# exponents and literals that can all be cut by a chunk boundary
+HANDWRITTEN = """ {
+  "version" : "2.0", "note": "d\\u00f2ng \\"trích\\" \\\\ 🖱️",
+  "recording_info": {"actual_duration": 1.5e0, "nested": [1, -2.25E-3, true, null, false]},
+  "events":[ {"type":"mouse_move","timestamp":0.0,"x":10,"y":-20},
+    {"type": "key_press", "timestamp": 12.000000001, "key": "Key.shift"} ,
+    {"type":"mouse_click","timestamp":1e-3,"x":1,"y":2,"button":"Button.left","pressed":false}
+  ] ,
+  "event_counts": {"mouse_move": 1}, "trailer": 123456789012345678901234567890
+}
+"""
+
+
+def _stream(path, chunk_size):
+    with JsonMacroStream(str(path), chunk_size=chunk_size) as reader:
+        events = list(reader.events())
+        return dict(reader.header, events=events)
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_handwritten_document(tmp_path, chunk_size):
+    path = tmp_path / 'macro.json'
+    path.write_text(HANDWRITTEN, encoding='utf-8')
+    with open(path, encoding='utf-8') as f:
+        expected = json.load(f)
+    assert _stream(path, chunk_size) == expected
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+@pytest.mark.parametrize('compact', [False, True])
+def test_saved_macro(tmp_path, chunk_size, compact):
+    path = tmp_path / 'macro.json'
+    write_macro(str(path), build_macro_data(synthetic_events(300, seed=1)), compact=compact)
+    with open(path, encoding='utf-8') as f:
+        expected = json.load(f)
+    assert _stream(path, chunk_size) == expected
+
+
+@pytest.mark.parametrize('document', ['{"version": "2.0", "events": []}', '{"version": "2.0"}', '{}'])
+def test_empty_or_missing_events(tmp_path, document):
+    path = tmp_path / 'macro.json'
+    path.write_text(document, encoding='utf-8')
+    expected = json.loads(document)
+    expected.setdefault('events', [])
+    assert _stream(path, 3) == expected
+
+
+def test_open_macro_stream_reads_header_first(tmp_path, events):
+    path = tmp_path / 'macro.json'
+    write_macro(str(path), build_macro_data(events))
+    header, stream = open_macro_stream(str(path))
+    assert header['version'] == '2.0'
+    assert header['event_counts'] == events.stats.event_counts()
+    assert list(stream) == events.to_list()
+
+
+@pytest.mark.parametrize('cut', [10, 200, -3])
+def test_truncated_document(tmp_path, cut):
+    path = tmp_path / 'macro.json'
+    path.write_text(HANDWRITTEN[:cut], encoding='utf-8')
+    with pytest.raises(ValueError):
+        _stream(path, 7)
@@ -0,0 +1,82 @@
+"""Test mã hóa nén .mrz: zigzag/varint, round trip, đọc theo luồng qua ranh giới khối"""
+
+import pytest
+
+from benchmark_io import synthetic_events
+from macro_codec import (
+    CompressedMacroReader, _read_varint, _read_zigzag, _write_varint, _write_zigzag
+)
+from macro_io import build_macro_data, open_macro_stream, read_macro, write_macro
+
+VALUES = [0, 1, -1, 2, -2, 63, -64, 64, 127, 128, -129, 300, 2 ** 31 - 1, -2 ** 31,
+          2 ** 40 + 7, -(2 ** 62), 2 ** 63 - 1]
+
+
+def _rows(events):
+    return list(zip(events.types, events.timestamps, events.xs, events.ys, events.arg1, events.arg2))
+
+
+def test_varint_encoding():
+    out = bytearray()
+    _write_varint(out, 300)
+    assert bytes(out) == b'\xac\x02'
+    assert _read_varint(out, 0) == (300, 2)
+
+
+@pytest.mark.parametrize('value, encoded', [(0, 0), (-1, 1), (1, 2), (-2, 3), (2, 4)])
+def test_zigzag_mapping(value, encoded):
+    out = bytearray()
+    _write_zigzag(out, value)
+    assert _read_varint(out, 0)[0] == encoded
+
+
+def test_zigzag_round_trip():
+    out = bytearray()
+    for value in VALUES:
+        _write_zigzag(out, value)
+    pos = 0
+    decoded = []
+    for _ in VALUES:
+        value, pos = _read_zigzag(out, pos)
+        decoded.append(value)
+    assert decoded == VALUES
+    assert pos == len(out)
+
+
+@pytest.mark.parametrize('compression', ['none', 'zlib', 'lzma'])
+def test_compressed_round_trip(tmp_path, events, compression):
+    path = tmp_path / 'macro.mrz'
+    write_macro(str(path), build_macro_data(events, smooth_factor=0.5), compression=compression)
+
+    data = read_macro(str(path))
+    assert data['events'].to_list() == events.to_list()
+    assert data['events'].stats.to_dict() == events.stats.to_dict()
+    assert data['timing_stats']['smooth_factor'] == 0.5
+
+
+@pytest.mark.parametrize('compression', ['none', 'zlib', 'lzma'])
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_stream_across_chunk_boundaries(tmp_path, compression, chunk_size):
+    events = synthetic_events(3000, seed=3)
+    path = tmp_path / 'macro.mrz'
+    write_macro(str(path), build_macro_data(events), compression=compression)
+
+    with CompressedMacroReader(str(path), chunk_size=chunk_size) as reader:
+        assert reader.event_count == len(events)
+        assert list(reader.records()) == _rows(events)
+
+
+def test_stream_yields_event_dicts(tmp_path, events):
+    path = tmp_path / 'macro.mrz'
+    write_macro(str(path), build_macro_data(events))
+    header, stream = open_macro_stream(str(path))
+    assert header['event_count'] == len(events)
+    assert list(stream) == events.to_list()
+
+
+def test_truncated_file(tmp_path):
+    path = tmp_path / 'macro.mrz'
+    write_macro(str(path), build_macro_data(synthetic_events(500)), compression='none')
+    path.write_bytes(path.read_bytes()[:-20])
+    with pytest.raises(ValueError):
+        read_macro(str(path))
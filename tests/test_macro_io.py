@@ -0,0 +1,69 @@
+"""Test đọc/ghi file macro (JSON v2, nhị phân v3)"""
+
+import pytest
+
+from macro_cache import macro_cache
+from macro_io import build_macro_data, read_macro, write_macro
+
+
+def _assert_same_macro(data, events):
+    assert data['events'].to_list() == events.to_list()
+    assert list(data['events'].timestamps) == list(events.timestamps)
+    assert data['event_counts'] == events.stats.event_counts()
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_json_round_trip(tmp_path, events, compact):
+    path = tmp_path / 'macro.json'
+    write_macro(str(path), build_macro_data(events, smooth_factor=1.5), compact=compact)
+
+    data = read_macro(str(path))
+    _assert_same_macro(data, events)
+    assert data['version'] == '2.0'
+    assert data['timing_stats']['smooth_factor'] == 1.5
+    assert (path.read_text(encoding='utf-8').count('\n') <= 1) == compact
+
+
+def test_replay_options_are_saved(tmp_path, events):
+    path = tmp_path / 'macro.json'
+    write_macro(str(path), build_macro_data(events, replay_options={'typing': 'bulk'}))
+    assert read_macro(str(path))['replay_options'] == {'typing': 'bulk'}
+
+
+
+def test_binary_round_trip(tmp_path, events):
+    path = tmp_path / 'macro.mrb'
+    write_macro(str(path), build_macro_data(events))
+
+    data = read_macro(str(path))
+    _assert_same_macro(data, events)
+    assert data['version'] == '3.0'
+    assert data['events'].read_only
+    assert data['events'].stats.to_dict() == events.stats.to_dict()
+
+
+def test_overwrite_mapped_binary_file(tmp_path, events):
+    path = tmp_path / 'macro.mrb'
+    write_macro(str(path), build_macro_data(events))
+    loaded = read_macro(str(path))
+    cached = macro_cache.get(str(path)).events
+    mapping = loaded['events'].mapping
+    assert mapping is not None and cached.mapping is not None
+
+    # Saving over the loaded file detaches every store from the old mapping
+    write_macro(str(path), loaded)
+    assert mapping.buffer.closed
+    assert loaded['events'].mapping is None and cached.mapping is None
+    assert loaded['events'].to_list() == events.to_list()
+    assert cached.to_list() == events.to_list()
+    assert cached.frozen and cached.read_only
+    _assert_same_macro(read_macro(str(path)), events)
+    macro_cache.invalidate(str(path))
+
+
+def test_truncated_binary_file(tmp_path, events):
+    path = tmp_path / 'macro.mrb'
+    write_macro(str(path), build_macro_data(events))
+    path.write_bytes(path.read_bytes()[:-5])
+    with pytest.raises(ValueError):
+        read_macro(str(path))
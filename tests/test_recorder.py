@@ -0,0 +1,62 @@
+"""Test MacroRecorder (cần pyautogui/pynput và phiên desktop; tự bỏ qua nếu thiếu)"""
+
+import pytest
+
+try:
+    from macro_recorder import MacroRecorder
+except Exception as e:  # pyautogui/pynput fail to import without a display
+    pytest.skip(f"MacroRecorder không dùng được ở đây: {e}", allow_module_level=True)
+
+from event_store import EVENT_KEY_PRESS, EventStore
+from macro_io import read_macro
+
+MS = 1_000_000
+
+
+@pytest.fixture
+def recorder(events):
+    recorder = MacroRecorder()
+    recorder.set_input_backend('recording')
+    recorder.events = events
+    return recorder
+
+
+def test_save_macro(tmp_path, recorder, events):
+    path = tmp_path / 'macro.json'
+    job = recorder.save_macro(str(path))
+    assert job.ok
+    assert read_macro(str(path))['events'].to_list() == events.to_list()
+
+
+def test_failed_save_reports_once(tmp_path, recorder, capsys):
+    assert recorder.save_macro(str(tmp_path / 'missing' / 'macro.json')) is False
+    assert capsys.readouterr().out.count('❌') == 1
+
+
+def test_unknown_backend_falls_back_to_pyautogui(monkeypatch, capsys):
+    monkeypatch.setenv('MACRO_INPUT_BACKEND', 'bogus')
+    recorder = MacroRecorder()
+    assert recorder.input_backend.name == 'pyautogui'
+    out = capsys.readouterr().out
+    assert "⚠️ Không dùng được backend nhập liệu 'bogus' (ValueError: " in out
+
+
+def test_start_index_skips_events_sharing_its_timestamp(recorder):
+    events = EventStore()
+    for timestamp, key in ((0, 'a'), (MS, 'b'), (MS, 'c'), (MS, 'd'), (2 * MS, 'e')):
+        events.append_key(EVENT_KEY_PRESS, timestamp, key)
+    recorder.events = events
+    recorder.min_delay = 0
+    assert recorder.replay_macro(enable_hotkey_stop=False, start_index=2)
+    assert recorder.input_backend.calls == [('press', 'c'), ('press', 'd'), ('press', 'e')]
+
+
+def test_start_index_with_end_time(recorder):
+    events = EventStore()
+    for timestamp, key in ((0, 'a'), (MS, 'b'), (MS, 'c'), (3 * MS, 'd')):
+        events.append_key(EVENT_KEY_PRESS, timestamp, key)
+    recorder.events = events
+    recorder.min_delay = 0
+    assert recorder.replay_macro(enable_hotkey_stop=False, start_index=2, end_time=0.002)
+    assert recorder.input_backend.calls == [('press', 'c')]
+    assert recorder.replay_macro(enable_hotkey_stop=False, start_index=3, end_time=0.002) is False
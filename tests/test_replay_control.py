@@ -0,0 +1,173 @@
+"""Test ReplayController: chuyển trạng thái dừng/tạm dừng/tiếp tục và dời lịch khi tạm dừng"""
+
+import threading
+import time
+
+from replay_control import IDLE, PAUSED, RUNNING, STOPPING, ReplayController
+from replay_scheduler import DeadlineScheduler
+
+MS = 1_000_000
+
+
+class FakeClock:
+    def __init__(self, start=1_000 * MS):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+class FakeTimer:
+    """Timer giả: 'ngủ' bằng cách đẩy clock tới deadline; `before_sleep` chạy trước lần ngủ đầu"""
+
+    def __init__(self, clock, before_sleep=None):
+        self.clock = clock
+        self.before_sleep = before_sleep
+        self.targets = []
+
+    def sleep_until(self, deadline_ns):
+        self.targets.append(deadline_ns)
+        if self.before_sleep is not None:
+            hook, self.before_sleep = self.before_sleep, None
+            hook()
+            return self.clock.now
+        self.clock.now = max(self.clock.now, deadline_ns)
+        return self.clock.now
+
+    def stats(self):
+        return {}
+
+
+def _in_thread(func):
+    """Chạy func trong thread; trả về (thread, list nhận kết quả)"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()), daemon=True)
+    thread.start()
+    return thread, result
+
+
+def test_transitions():
+    clock = FakeClock()
+    control = ReplayController(clock)
+    assert control.state == IDLE and not control.active
+    assert not control.pause() and not control.resume() and not control.stop()
+
+    control.start()
+    assert control.state == RUNNING and control.active and control.is_running()
+    assert not control.interrupt.is_set()
+    assert not control.resume()
+
+    assert control.pause() and control.state == PAUSED and control.active
+    assert control.interrupt.is_set()
+    assert not control.pause()
+    clock.now += 40 * MS
+    assert control.resume() and control.state == RUNNING
+    assert control.paused_ns == 40 * MS and not control.interrupt.is_set()
+
+    assert control.stop() and control.state == STOPPING and not control.active
+    assert control.interrupt.is_set()
+    assert not control.stop() and not control.pause()
+    clock.now += 3 * MS
+    assert not control.is_running()
+    assert control.last_stop_latency_ns == 3 * MS
+
+    control.finish()
+    assert control.state == IDLE
+
+
+def test_paused_time_accumulates_and_resets_on_start():
+    clock = FakeClock()
+    control = ReplayController(clock)
+    control.start()
+    for paused in (10 * MS, 25 * MS):
+        control.pause()
+        clock.now += paused
+        control.resume()
+    assert control.paused_ns == 35 * MS
+    control.finish()
+    control.start()
+    assert control.paused_ns == 0
+
+
+def test_stop_while_paused():
+    control = ReplayController()
+    control.start()
+    control.pause()
+    assert control.stop()
+    assert not control.is_running()
+
+
+def test_is_running_waits_out_a_pause():
+    control = ReplayController()
+    control.start()
+    control.pause()
+    thread, result = _in_thread(control.is_running)
+    time.sleep(0.05)
+    assert thread.is_alive()  # blocked while paused
+    control.resume()
+    thread.join(1)
+    assert result == [True]
+
+
+def test_sleep_wakes_on_stop():
+    control = ReplayController()
+    control.start()
+    started = time.perf_counter()
+    thread, result = _in_thread(lambda: control.sleep(10))
+    time.sleep(0.02)
+    control.stop()
+    thread.join(1)
+    assert result == [False]
+    assert time.perf_counter() - started < 1
+    assert control.last_stop_latency_ns is not None
+
+
+def test_sleep_completes_when_running():
+    control = ReplayController()
+    control.start()
+    assert control.sleep(0.01)
+
+
+def test_scheduler_shifts_deadlines_by_pause():
+    clock = FakeClock()
+    control = ReplayController(clock)
+    control.start()
+    scheduler = DeadlineScheduler(timer=FakeTimer(clock), control=control)
+    origin = clock.now
+    scheduler.wait(0)
+
+    control.pause()
+    clock.now += 50 * MS
+    control.resume()
+    assert scheduler.wait(10 * MS) == 0
+    assert scheduler.timer.targets == [origin + 60 * MS]
+    assert scheduler.scheduled_duration() == 0.010
+
+
+def test_scheduler_pause_during_wait():
+    clock = FakeClock()
+    control = ReplayController(clock)
+    control.start()
+
+    def pause_for_30ms():
+        control.pause()
+        clock.now += 30 * MS
+        control.resume()
+
+    scheduler = DeadlineScheduler(timer=FakeTimer(clock, pause_for_30ms), control=control)
+    origin = clock.now
+    scheduler.wait(0)
+    # Woken early by the pause: waits again for the shifted deadline, not late
+    assert scheduler.wait(10 * MS) == 0
+    assert scheduler.timer.targets == [origin + 10 * MS, origin + 40 * MS]
+
+
+def test_scheduler_returns_on_stop():
+    clock = FakeClock()
+    control = ReplayController(clock)
+    control.start()
+    scheduler = DeadlineScheduler(timer=FakeTimer(clock, control.stop), control=control)
+    scheduler.wait(0)
+    assert scheduler.wait(10 * MS) == 0
+    assert not control.is_running()
+    assert len(scheduler.lateness) == 1
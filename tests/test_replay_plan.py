@@ -0,0 +1,136 @@
+"""Test replay plan: gọi backend giống cách thông dịch cũ, trạng thái modifier, cache plan, gộp gõ phím, tra timeline"""
+
+import pytest
+
+from benchmark_dispatch import _with_modifiers, legacy_replay, plan_replay
+from benchmark_io import synthetic_events
+from event_store import EVENT_KEY_PRESS, EVENT_KEY_RELEASE, EventStore
+from input_backends import RecordingBackend
+from replay_plan import TimelineIndex, TypingCoalescer, compile_plan, get_plan, iter_plan, steps_in_span
+
+MS = 1_000_000
+
+
+def _keys(*names):
+    """Macro chỉ gồm phím; tên bắt đầu bằng '-' là nhả phím"""
+    events = EventStore()
+    for i, name in enumerate(names):
+        code = EVENT_KEY_RELEASE if name.startswith('-') else EVENT_KEY_PRESS
+        events.append_key(code, i * MS, name.lstrip('-') if len(name) > 1 else name)
+    return events
+
+
+def _run(steps):
+    for _, func, args in steps:
+        if func is not None:
+            func(*args)
+
+
+def test_matches_legacy_interpreter():
+    events = _with_modifiers(synthetic_events(2000, seed=5))
+    legacy, compiled = RecordingBackend(), RecordingBackend()
+    legacy_replay(events, legacy)
+    assert plan_replay(compile_plan(events, compiled)) == len(events)
+    assert compiled.calls == legacy.calls
+
+
+def test_one_step_per_event_with_source_timestamps(events):
+    plan = compile_plan(events, RecordingBackend())
+    assert len(plan) == len(events)
+    assert [step[0] for step in plan.steps] == list(events.timestamps)
+
+
+def test_modifier_state():
+    backend = RecordingBackend()
+    events = _keys('Key.ctrl_l', 'c', '-c', 'v', '-v', 'q', '-Key.ctrl_l',
+                   'Key.shift', 'a', '-Key.shift', 'Key.alt_l', 'x', '-Key.alt_l', 'b', 'Key.enter')
+    _run(compile_plan(events, backend).steps)
+    assert backend.calls == [
+        ('hotkey', 'ctrl', 'c'),
+        # Ctrl+V is skipped, like the original interpreter did
+        ('press', 'q'),
+        ('hotkey', 'shift', 'a'),
+        ('hotkey', 'alt', 'x'),
+        ('press', 'b'),
+        ('press', 'enter'),
+    ]
+
+
+def test_stream_plan_matches_store_plan(events):
+    stored, streamed = RecordingBackend(), RecordingBackend()
+    _run(compile_plan(events, stored).steps)
+    steps = list(iter_plan(iter(events.to_list()), streamed))
+    _run(steps)
+    assert streamed.calls == stored.calls
+    assert [step[0] for step in steps] == list(events.timestamps)
+
+
+def test_get_plan_is_cached_until_store_changes(events):
+    backend = RecordingBackend()
+    plan = get_plan(events, backend)
+    assert get_plan(events, backend) is plan
+    assert get_plan(events, RecordingBackend()) is not plan
+
+    events.append_move(2_000_000_000, 0, 0)
+    replanned = get_plan(events, backend)
+    assert replanned is not plan and len(replanned) == len(events)
+
+
+
+def _typed(names, mode='bulk', chunk=8):
+    """Chạy plan của các phím qua TypingCoalescer; trả về (backend, bước đã lọc, coalescer)"""
+    backend = RecordingBackend()
+    steps = compile_plan(_keys(*names), backend).steps
+    coalescer = TypingCoalescer(backend, mode, chunk)
+    filtered = list(coalescer.filter(steps))
+    _run(filtered)
+    return backend, filtered, coalescer, steps
+
+
+def test_typing_bulk_keeps_other_keys_in_order():
+    backend, filtered, coalescer, steps = _typed(
+        ['h', '-h', 'i', '-i', 'space', '-space', 'Key.enter', '-Key.enter', 'o', '-o', 'k', '-k'])
+    assert backend.calls == [('write', 'hi '), ('press', 'enter'), ('write', 'ok')]
+    # Writes fire at the first character's time; the steps after a run keep theirs
+    assert filtered[0][0] == 0 and filtered[1:4] == steps[5:8]
+    assert len(filtered) + coalescer.coalesced == len(steps)
+    assert (coalescer.runs, coalescer.chars) == (2, 5)
+
+
+def test_typing_paced_writes_chunks_at_source_times():
+    backend, filtered, coalescer, _ = _typed(['a', 'b', 'c', 'd', 'e'], mode='paced', chunk=2)
+    assert backend.calls == [('write', 'ab'), ('write', 'cd'), ('write', 'e')]
+    assert [step[0] for step in filtered] == [0, 2 * MS, 4 * MS]
+    assert coalescer.coalesced == 2
+
+
+def test_typing_leaves_single_chars_and_hotkeys():
+    backend, _, coalescer, _ = _typed(
+        ['a', '-a', 'Key.enter', 'Key.shift', 'b', '-Key.shift', 'c', 'Key.ctrl_l', 'x', '-Key.ctrl_l', 'd'])
+    assert backend.calls == [('press', 'a'), ('press', 'enter'), ('hotkey', 'shift', 'b'),
+                             ('press', 'c'), ('hotkey', 'ctrl', 'x'), ('press', 'd')]
+    assert coalescer.runs == 0 and coalescer.coalesced == 0
+
+
+def test_typing_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        TypingCoalescer(RecordingBackend(), 'fast')
+
+
+def test_timeline_span_includes_ties_at_both_ends():
+    index = TimelineIndex([0, MS, MS, MS, 2 * MS, 3 * MS])
+    assert index.index_at(MS) == 1
+    assert index.span(MS, 2 * MS) == (1, 5)
+    assert index.span() == (0, 6)
+    assert index.span(None, MS) == (0, 4)
+    assert index.span(4 * MS) == (6, 6)
+    assert index.span(2 * MS, MS) == (4, 4)
+
+
+def test_steps_in_span_matches_timeline_slice():
+    backend = RecordingBackend()
+    events = synthetic_events(500, seed=3)
+    steps = compile_plan(events, backend).steps
+    start_ns, end_ns = events.timestamps[100], events.timestamps[400]
+    first, last = TimelineIndex(events.timestamps).span(start_ns, end_ns)
+    assert list(steps_in_span(iter(steps), start_ns, end_ns)) == steps[first:last]
@@ -0,0 +1,191 @@
+"""Test DeadlineScheduler, PreciseTimer và MoveCoalescer với clock giả (không ngủ thật)"""
+
+import threading
+
+from precise_timer import DelayStats, PreciseTimer
+from replay_scheduler import DeadlineScheduler, MoveCoalescer
+
+MS = 1_000_000
+
+
+class FakeClock:
+    """Clock giả: mỗi lần đọc tăng thêm `step` ns"""
+
+    def __init__(self, start=1_000 * MS, step=0):
+        self.now = start
+        self.step = step
+
+    def __call__(self):
+        now = self.now
+        self.now += self.step
+        return now
+
+
+class FakeTimer:
+    """Timer giả: 'ngủ' bằng cách đẩy clock tới deadline (+ overshoot)"""
+
+    def __init__(self, clock, overshoot=0):
+        self.clock = clock
+        self.overshoot = overshoot
+        self.targets = []
+
+    def sleep_until(self, deadline_ns):
+        self.targets.append(deadline_ns)
+        self.clock.now = max(self.clock.now, deadline_ns + self.overshoot)
+        return self.clock.now
+
+    def stats(self):
+        return {}
+
+
+def _scheduler(**kwargs):
+    clock = FakeClock()
+    return DeadlineScheduler(timer=FakeTimer(clock), **kwargs), clock
+
+
+def test_deadlines_are_absolute_from_origin():
+    scheduler, clock = _scheduler()
+    origin = clock.now
+    for ts in (0, 5 * MS, 12 * MS, 40 * MS):
+        assert scheduler.wait(ts) == 0
+    assert scheduler.timer.targets == [origin + 5 * MS, origin + 12 * MS, origin + 40 * MS]
+    assert scheduler.scheduled_duration() == 0.040
+
+
+def test_lateness_does_not_accumulate():
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(timer=FakeTimer(clock, overshoot=MS // 2))
+    origin = clock.now
+    for ts in range(0, 100 * MS, 10 * MS):
+        scheduler.wait(ts)
+    # Every wait is 0.5ms late against its own deadline, never the sum of them
+    assert scheduler.timer.targets[-1] == origin + 90 * MS
+    assert scheduler.lateness.max_ns == MS // 2
+
+
+def test_late_event_fires_immediately():
+    scheduler, clock = _scheduler()
+    scheduler.wait(0)
+    clock.now += 30 * MS  # e.g. a slow backend call
+    assert scheduler.wait(10 * MS) == 20 * MS
+    assert scheduler.timer.targets == []
+
+
+def test_scale_divides_offsets():
+    scheduler, clock = _scheduler(scale=0.5)
+    origin = clock.now
+    scheduler.wait(0)
+    scheduler.wait(100 * MS)
+    assert scheduler.timer.targets == [origin + 50 * MS]
+
+
+def test_base_ns_starts_schedule_at_first_event():
+    scheduler, clock = _scheduler(base_ns=7_000 * MS)
+    origin = clock.now
+    scheduler.wait(7_000 * MS)
+    scheduler.wait(7_020 * MS)
+    assert scheduler.timer.targets == [origin + 20 * MS]
+
+
+def test_min_gap_spaces_events_after_fire_time():
+    scheduler, clock = _scheduler(min_gap=0.005)
+    origin = clock.now
+    for ts in (0, 0, 1 * MS, 20 * MS):
+        scheduler.wait(ts)
+    assert scheduler.timer.targets == [origin + 5 * MS, origin + 10 * MS, origin + 20 * MS]
+
+
+def test_min_gap_does_not_count_as_lateness():
+    scheduler, _ = _scheduler(min_gap=0.005)
+    scheduler.wait(0)
+    # Held back 5ms by min_gap: reported lateness is against the deadline
+    assert scheduler.wait(0) == 5 * MS
+    assert scheduler.last_deadline_ns == scheduler.origin_ns
+
+
+def test_precise_timer_spins_to_deadline():
+    clock = FakeClock(start=0, step=1_000)
+    timer = PreciseTimer(spin_budget=10, yield_window=10, clock=clock)
+    woke = timer.sleep_until(50_500)
+    assert 50_500 <= woke < 52_000
+    assert timer.overshoot.samples.tolist() == [woke - 50_500]
+    assert timer.spin_ns > 0
+
+
+def test_precise_timer_past_deadline_returns_at_once():
+    clock = FakeClock(start=10 * MS, step=1_000)
+    timer = PreciseTimer(spin_budget=10, clock=clock)
+    assert timer.sleep_until(MS) == 10 * MS
+    assert timer.overshoot.samples.tolist() == [9 * MS]
+
+
+def test_precise_timer_stops_on_interrupt():
+    interrupt = threading.Event()
+    interrupt.set()
+    clock = FakeClock(start=0, step=1_000)
+    timer = PreciseTimer(spin_budget=10, clock=clock, interrupt=interrupt)
+    assert timer.sleep_until(10 * MS) < 10 * MS
+    assert len(timer.overshoot) == 0
+
+
+def test_delay_stats_percentiles():
+    stats = DelayStats()
+    for delay in range(1, 101):
+        stats.add(delay * MS // 10)
+    assert stats.max_ns == 10 * MS
+    assert stats.percentile(50) == 5_100_000
+    assert stats.late_count() == 90
+
+
+def move(x, y):
+    pass
+
+
+def click(x, y, button):
+    pass
+
+
+def _path(count, every_ns, start_ns=0):
+    return [(start_ns + i * every_ns, move, (i, i)) for i in range(count)]
+
+
+def test_coalescer_keeps_moves_when_on_time():
+    scheduler, _ = _scheduler()
+    steps = _path(10, MS) + [(10 * MS, click, (9, 9, 'left'))]
+    coalescer = MoveCoalescer(move)
+    assert list(coalescer.filter(steps, scheduler)) == steps
+    assert (coalescer.moves, coalescer.coalesced) == (10, 0)
+
+
+def test_coalescer_drops_only_moves_when_behind():
+    scheduler, clock = _scheduler()
+    steps = (_path(5, MS) + [(5 * MS, click, (4, 4, 'left')), (6 * MS, None, ())]
+             + _path(5, MS, start_ns=7 * MS) + [(12 * MS, click, (4, 4, 'right'))])
+    scheduler.start()
+    clock.now += 100 * MS  # every step is already overdue
+    coalescer = MoveCoalescer(move)
+    kept = list(coalescer.filter(steps, scheduler))
+
+    # Non-move steps survive in order, each preceded by the last move before it
+    assert [step for step in kept if step[1] is not move] == [step for step in steps if step[1] is not move]
+    assert kept == [steps[4], steps[5], steps[6], steps[11], steps[12]]
+    assert (coalescer.moves, coalescer.coalesced) == (10, 8)
+
+
+def test_coalescer_rate_limit_keeps_last_move_per_frame():
+    scheduler, _ = _scheduler()
+    steps = _path(20, 2 * MS) + [(40 * MS, click, (19, 19, 'left'))]
+    coalescer = MoveCoalescer(move, max_rate=100)  # 10ms frames
+    kept = list(coalescer.filter(steps, scheduler))
+    assert [step[0] // MS for step in kept] == [8, 18, 28, 38, 40]
+    assert kept[-1] == steps[-1]
+    assert coalescer.coalesced == 16
+
+
+def test_coalescer_keeps_trailing_move():
+    scheduler, clock = _scheduler()
+    steps = _path(3, MS)
+    scheduler.start()
+    clock.now += 100 * MS
+    assert list(MoveCoalescer(move).filter(steps, scheduler)) == [steps[-1]]
+    assert list(MoveCoalescer(move).filter([], scheduler)) == []